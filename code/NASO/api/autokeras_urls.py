@@ -45,6 +45,8 @@ urlpatterns = [
         autokeras.get_metrics_for_run,
         name="get_metrics_for_run",
     ),
+    # downsampled power series, optional GET parameters start, end and points
+    path("<int:pk>/power/", autokeras.get_power_measurements, name="power"),
     path("<int:pk>/hardelete/", autokeras.hard_delete, name="delete_run"),
     path("<int:pk>/undelete/", autokeras.undelete, name="undelete_run"),
     path("<int:pk>/rate/", autokeras.rate_autokeras_run, name="rate_run"),
@@ -1,5 +1,10 @@
+import math
+
+from django.http import JsonResponse
 from rest_framework.response import Response
 
+from naso.settings import POWER_WINDOW_MAX_POINTS
+
 
 def rate_run(request, run):
     rate = request.data.get("rate")
@@ -9,3 +14,39 @@ def rate_run(request, run):
         run.rate = 0
     run.save()
     return Response({"success": True})
+
+
+def _parse_seconds(value):
+    """
+    Parses an optional window bound in seconds, raises ValueError if it is no finite number.
+    """
+    if not value:
+        return None
+    seconds = float(value)
+    if not math.isfinite(seconds):
+        raise ValueError(f"{value} is no finite number")
+    return seconds
+
+
+def get_power_window(request, run):
+    """
+    Returns the downsampled power series of a run. The optional GET parameters `start` and `end`
+    select a window in seconds after the first reading, `points` the maximum number of values.
+    `points` is clamped to POWER_WINDOW_MAX_POINTS, invalid parameters are answered with 400.
+    """
+    try:
+        start = _parse_seconds(request.GET.get("start"))
+        end = _parse_seconds(request.GET.get("end"))
+        points = int(request.GET.get("points", 500))
+    except ValueError as exc:
+        return JsonResponse({"success": False, "error": str(exc)}, status=400)
+    if points <= 0:
+        return JsonResponse(
+            {"success": False, "error": "points must be positive"}, status=400
+        )
+    if start is not None and end is not None and start > end:
+        return JsonResponse(
+            {"success": False, "error": "start must not be after end"}, status=400
+        )
+    points = min(points, POWER_WINDOW_MAX_POINTS)
+    return JsonResponse(run.get_power_window(start, end, points))
@@ -6,4 +6,6 @@ from .views.metrics import MetricsAPIView
 urlpatterns = [
     path("run_from_id", inference.run_from_id, name="run_from_id"),
     path("<int:pk>/metrics/", MetricsAPIView.as_view(), name="metrics"),
+    path("serve/<str:run_type>/<int:pk>/", inference.serve, name="serve"),
+    path("serve/stats/", inference.serving_stats, name="serving_stats"),
 ]
@@ -12,7 +12,10 @@ from api.serializers.types import (
     OptimizerTypeSerializer,
 )
 from neural_architecture.models.architecture import NetworkConfiguration, NetworkLayer
-from neural_architecture.models.model_optimization import ClusterableNetwork
+from neural_architecture.models.model_optimization import (
+    ClusterableNetwork,
+    QuantizableNetwork,
+)
 from runs.models.training import CallbackFunction, LossFunction, Optimizer
 
 
@@ -38,6 +41,12 @@ class ClusterableNetworkSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+class QuantizableNetworkSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = QuantizableNetwork
+        fields = "__all__"
+
+
 class OptimizerSerializer(serializers.ModelSerializer):
     instance_type = OptimizerTypeSerializer()
 
@@ -56,6 +65,7 @@ class NetworkLayerSerializer(serializers.ModelSerializer):
 
 class NetworkConfigurationSerializer(serializers.ModelSerializer):
     clustering_options = ClusterableNetworkSerializer()
+    quantization_options = QuantizableNetworkSerializer()
     layers = NetworkLayerSerializer(many=True)
     pruning_method = PruningMethodSerializer()
     pruning_schedule = PruningScheduleSerializer()
@@ -4,6 +4,7 @@ from api.serializers.architecture import (
     CallbackFunctionSerializer,
     ClusterableNetworkSerializer,
     LossFunctionSerializer,
+    QuantizableNetworkSerializer,
 )
 from api.serializers.training import DatasetSerializer
 from api.serializers.types import (
@@ -38,6 +39,7 @@ class AutoKerasModelSerializer(serializers.ModelSerializer):
     tuner = AutoKerasTunerSerializer()
     blocks = AutoKerasNodeSerializer(many=True)
     clustering_options = ClusterableNetworkSerializer()
+    quantization_options = QuantizableNetworkSerializer()
     loss = LossFunctionSerializer()
     callbacks = CallbackFunctionSerializer(many=True)
 
@@ -59,6 +61,7 @@ class AutoKerasModelSerializer(serializers.ModelSerializer):
             "callbacks",
             "loss",
             "clustering_options",
+            "quantization_options",
         ]
 
 
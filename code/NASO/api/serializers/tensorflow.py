@@ -5,6 +5,7 @@ from api.serializers.architecture import (
     LossFunctionSerializer,
     NetworkConfigurationSerializer,
     OptimizerSerializer,
+    QuantizableNetworkSerializer,
 )
 from api.serializers.model_optimization import (
     PruningMethodSerializer,
@@ -27,6 +28,7 @@ from runs.models.training import (
 class TensorFlowModelSerializer(serializers.ModelSerializer):
     instance_type = TensorFlowModelTypeSerializer()
     clustering_options = ClusterableNetworkSerializer()
+    quantization_options = QuantizableNetworkSerializer()
     pruning_method = PruningMethodSerializer()
     pruning_schedule = PruningScheduleSerializer()
     pruning_policy = PruningPolicySerializer()
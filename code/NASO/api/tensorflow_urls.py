@@ -18,5 +18,6 @@ urlpatterns = [
         TensorflowMetricAPIView.as_view(),
         name="metrics",
     ),
+    path("<int:pk>/power/", tensorflow.get_power_measurements, name="power"),
     path("<int:pk>/configuration/", tensorflow.get_configuration, name="configuration"),
 ]
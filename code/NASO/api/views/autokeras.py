@@ -8,7 +8,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from api.helper_scripts.run import rate_run
+from api.helper_scripts.run import get_power_window, rate_run
 from api.serializers.autokeras import AutoKerasRunSerializer
 from api.serializers.training import TrainingMetricSerializer
 from neural_architecture.models.autokeras import AutoKerasRun
@@ -42,6 +42,21 @@ def rate_autokeras_run(request, pk):
     return rate_run(request, run)
 
 
+def get_power_measurements(request, pk):
+    """
+    This view returns the downsampled power series of the run for charts.
+
+    Args:
+        request (Request): The request object, optionally with the GET parameters start, end and points.
+        pk (int): The primary key of the run.
+
+    Returns:
+        JsonResponse: Lists time, power, min and max of the downsampled series
+    """
+    run = AutoKerasRun.objects.get(pk=pk)
+    return get_power_window(request, run)
+
+
 def get_metrics(pk, trial_id):
     """
     This view returns the metrics for a specific trial of the run.
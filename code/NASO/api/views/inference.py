@@ -1,11 +1,20 @@
+import concurrent.futures
+import time
+
+import tensorflow as tf
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 from inference.celery.run_inference import run_inference
+from inference.helper_scripts.benchmark import parse_batch_sizes
+from inference.helper_scripts.serving import get_batcher, get_serving_stats
 from inference.models.inference import Inference
 from runs.models.training import NetworkTraining
 
+# seconds a request waits for its micro batch
+SERVING_TIMEOUT = 30
+
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
@@ -28,6 +37,12 @@ def run_from_id(request):
         run = NetworkTraining.objects.get(pk=run_id)
         queue, gpu = request.data.get("gpu").split("|")
         batch_size = request.data.get("batch_size")
+        try:
+            sweep_batch_sizes = parse_batch_sizes(
+                request.data.get("sweep_batch_sizes", "")
+            )
+        except ValueError:
+            return Response({"success": False})
         inference = Inference(
             description=run.description,
             name=run.model_name + "_" + request.data.get("gpu_name"),
@@ -37,6 +52,8 @@ def run_from_id(request):
             network_training=run,
             batch_size=batch_size,
             model_file=run.model_file,
+            sweep_batch_sizes=sweep_batch_sizes,
+            latency_slo=float(request.data.get("latency_slo") or 0),
         )
         inference.save()
         inference.callbacks.set(run.evaluation_parameters.callbacks.all())
@@ -46,3 +63,65 @@ def run_from_id(request):
         return Response({"success": True})
     print("fehler not tensrofow")
     return Response({"success": False})
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def serve(request, run_type, pk):
+    """
+    Runs the model of an inference or tensorflow run on the posted inputs. Concurrent requests
+    for the same model are combined into micro batches, the model stays loaded between requests.
+
+    Args:
+        request (Request): The request object with `inputs`, a list of samples.
+        run_type (str): `inference` or `tensorflow`.
+        pk (int): The primary key of the run.
+
+    Returns:
+        Response: The `outputs` per sample, the `queue_time [ms]` of the request, the
+            `compute_time [ms]` and `batch_size` of its micro batch and the `total_time [ms]`.
+    """
+    start = time.perf_counter()
+    if run_type == "inference":
+        model_file = Inference.objects.get(pk=pk).model_file
+    elif run_type == "tensorflow":
+        model_file = NetworkTraining.objects.get(pk=pk).model_file
+    else:
+        return Response({"success": False, "error": "unknown run type"}, status=400)
+    if "inputs" not in request.data:
+        return Response({"success": False, "error": "no inputs"}, status=400)
+    try:
+        future = get_batcher(model_file).submit(request.data["inputs"])
+        result = future.result(timeout=SERVING_TIMEOUT)
+    except (ValueError, tf.errors.OpError) as exc:
+        return Response({"success": False, "error": str(exc)}, status=400)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        return Response(
+            {
+                "success": False,
+                "error": f"no result within {SERVING_TIMEOUT} seconds",
+            },
+            status=504,
+        )
+    return Response(
+        {
+            "success": True,
+            "outputs": tf.nest.map_structure(
+                lambda output: output.tolist(), result["outputs"]
+            ),
+            "queue_time [ms]": result["queue_time"] * 1e3,
+            "compute_time [ms]": result["compute_time"] * 1e3,
+            "batch_size": result["batch_size"],
+            "total_time [ms]": (time.perf_counter() - start) * 1e3,
+        }
+    )
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def serving_stats(request):
+    """
+    Returns the request, batch and timing statistics of all served models of this process.
+    """
+    return Response(get_serving_stats())
@@ -2,7 +2,7 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from api.helper_scripts.run import rate_run
+from api.helper_scripts.run import get_power_window, rate_run
 from api.serializers.tensorflow import NetworkTrainingSerializer
 from runs.models.training import NetworkTraining
 from runs.views.softdelete import harddelete_run, undelete_run
@@ -25,6 +25,21 @@ def rate_tensorflow_run(request, pk):
     return rate_run(request, run)
 
 
+def get_power_measurements(request, pk):
+    """
+    This view returns the downsampled power series of the run for charts.
+
+    Args:
+        request (Request): The request object, optionally with the GET parameters start, end and points.
+        pk (int): The primary key of the run.
+
+    Returns:
+        JsonResponse: Lists time, power, min and max of the downsampled series
+    """
+    run = NetworkTraining.objects.get(pk=pk)
+    return get_power_window(request, run)
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def get_configuration(request, pk):
@@ -25,8 +25,13 @@ def get_inference_details(run_id):
     run = Inference.objects.filter(pk=run_id).first()
     if not run:
         return {}, None
-    if run.prediction_metrics.last():
-        metrics = run.prediction_metrics.last().metrics[0]["metrics"]
+    prediction_metric = run.get_prediction_metric()
+    if prediction_metric:
+        metrics = prediction_metric.metrics[0]["metrics"]
+    benchmark_metric = run.get_benchmark_metric()
+    sweep_metric = run.get_sweep_metric()
+    tflite_metric = run.get_tflite_metric()
+    sparse_metric = run.get_sparse_metric()
 
     loss = metrics.get("loss", "-")
     val_loss = metrics.get("val_loss", "-")
@@ -45,6 +50,14 @@ def get_inference_details(run_id):
         "pruning_policy": "-",
         "optimizer": "-",
         "prediction_metrics": run.prediction_metrics,
+        "benchmark_metrics": {
+            **(benchmark_metric.metrics[0]["metrics"] if benchmark_metric else {}),
+            **(sweep_metric.metrics[0]["metrics"] if sweep_metric else {}),
+            **(tflite_metric.metrics[0]["metrics"] if tflite_metric else {}),
+            **(sparse_metric.metrics[0]["metrics"] if sparse_metric else {}),
+        },
+        "sweep": sweep_metric.metrics[0]["points"] if sweep_metric else [],
+        "sweep_id": f"sweep_{run_id}",
         "loss": loss,
         "val_loss": val_loss,
         "sparsity": sparsity,
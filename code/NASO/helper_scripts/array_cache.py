@@ -0,0 +1,150 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import scipy.sparse
+import tensorflow as tf
+
+# written last, a directory without it holds no complete arrays
+METADATA_FILE = "metadata.json"
+# rows that are read from the memory map at once
+CHUNK_SIZE = 1024
+SPARSE_PARTS = ["data", "indices", "indptr"]
+
+
+def is_numeric_array(array) -> bool:
+    """
+    Returns whether an array can be memory mapped, i.e. it is a numeric NumPy array or a sparse
+    matrix. Texts or object arrays are not.
+    """
+    if scipy.sparse.issparse(array):
+        return True
+    return isinstance(array, np.ndarray) and array.dtype.kind in "biuf"
+
+
+def save_arrays(directory: str, arrays: dict, metadata: dict = None) -> dict:
+    """
+    Saves arrays as `.npy` files, sparse matrices as their CSR parts, and a metadata sidecar
+    with their shapes and dtypes. The files are written into a temporary directory first, so
+    readers never see incomplete arrays.
+
+    Args:
+        directory (str): The directory of the arrays.
+        arrays (dict): The arrays by name.
+        metadata (dict): Additional metadata, e.g. the description of the dataset.
+
+    Returns:
+        dict: The metadata as written to the sidecar.
+    """
+    temporary_directory = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(temporary_directory, ignore_errors=True)
+    os.makedirs(temporary_directory)
+    metadata = {**(metadata or {}), "arrays": {}}
+    for name, array in arrays.items():
+        sparse = scipy.sparse.issparse(array)
+        if sparse:
+            array = scipy.sparse.csr_matrix(array)
+            for part in SPARSE_PARTS:
+                np.save(
+                    os.path.join(temporary_directory, f"{name}.{part}.npy"),
+                    getattr(array, part),
+                )
+        else:
+            np.save(
+                os.path.join(temporary_directory, f"{name}.npy"),
+                np.ascontiguousarray(array),
+            )
+        metadata["arrays"][name] = {
+            "shape": list(array.shape),
+            "dtype": array.dtype.str,
+            "sparse": sparse,
+        }
+    with open(
+        os.path.join(temporary_directory, METADATA_FILE), "w", encoding="utf-8"
+    ) as file:
+        json.dump(metadata, file)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(temporary_directory, directory)
+    return metadata
+
+
+def read_array_metadata(directory: str) -> dict | None:
+    try:
+        with open(os.path.join(directory, METADATA_FILE), encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def load_arrays(directory: str) -> dict:
+    """
+    Returns the arrays saved by `save_arrays`, memory mapped read only. Sparse matrices are CSR
+    matrices over the memory mapped parts.
+    """
+    arrays = {}
+    for name, array_metadata in read_array_metadata(directory)["arrays"].items():
+        if array_metadata["sparse"]:
+            parts = [
+                np.load(os.path.join(directory, f"{name}.{part}.npy"), mmap_mode="r")
+                for part in SPARSE_PARTS
+            ]
+            arrays[name] = scipy.sparse.csr_matrix(
+                tuple(parts), shape=tuple(array_metadata["shape"]), copy=False
+            )
+        else:
+            arrays[name] = np.load(
+                os.path.join(directory, f"{name}.npy"), mmap_mode="r"
+            )
+    return arrays
+
+
+def _read_rows(array, start: int, stop: int) -> np.ndarray:
+    rows = array[start:stop]
+    if scipy.sparse.issparse(rows):
+        return rows.toarray()
+    return np.asarray(rows)
+
+
+def array_dataset(
+    arrays: tuple, start: int, stop: int, chunk_size: int = CHUNK_SIZE
+) -> tf.data.Dataset:
+    """
+    Builds a dataset of the rows `start` to `stop` of memory mapped arrays. The rows are read in
+    chunks when the dataset is iterated, so neither the process nor the graph holds a copy of
+    the arrays, as `from_tensor_slices` would.
+
+    Args:
+        arrays (tuple): Arrays or sparse matrices with the same number of rows, e.g. data and
+            target. Every element of the dataset is a tuple of one row of each.
+        start (int): The first row.
+        stop (int): The row after the last one.
+        chunk_size (int): Rows read at once.
+
+    Returns:
+        tf.data.Dataset: The unbatched rows.
+    """
+    specs = tuple(
+        tf.TensorSpec((None,) + tuple(array.shape[1:]), tf.as_dtype(array.dtype))
+        for array in arrays
+    )
+
+    def read(chunk_start):
+        chunk_stop = min(int(chunk_start) + chunk_size, stop)
+        return tuple(
+            _read_rows(array, int(chunk_start), chunk_stop) for array in arrays
+        )
+
+    def read_chunk(chunk_start):
+        chunk = tf.numpy_function(
+            read, [chunk_start], [spec.dtype for spec in specs], stateful=False
+        )
+        return tuple(
+            tf.ensure_shape(values, spec.shape) for values, spec in zip(chunk, specs)
+        )
+
+    return (
+        tf.data.Dataset.range(start, stop, chunk_size)
+        .map(read_chunk, num_parallel_calls=tf.data.AUTOTUNE)
+        .unbatch()
+    )
@@ -0,0 +1,229 @@
+import json
+import math
+import struct
+
+import keras
+import numpy as np
+
+# file layout: magic, little endian uint32 length of the json header, header, data segments
+CODEBOOK_MAGIC = b"NASOCB\x01"
+CODEBOOK_EXTENSION = ".nasocb"
+# tensors with more unique values are stored as they are
+MAX_CODEBOOK_SIZE = 256
+
+
+def pack_bits(values, bits: int) -> bytes:
+    """
+    Packs unsigned integers below 2**bits into a bit stream, least significant bit first.
+    """
+    values = np.asarray(values, dtype=np.uint32).reshape(-1)
+    bit_matrix = (values[:, None] >> np.arange(bits, dtype=np.uint32)) & 1
+    return np.packbits(
+        bit_matrix.astype(np.uint8).reshape(-1), bitorder="little"
+    ).tobytes()
+
+
+def unpack_bits(data: bytes, bits: int, count: int) -> np.ndarray:
+    """
+    Reverses `pack_bits` for `count` values.
+    """
+    bit_matrix = np.unpackbits(
+        np.frombuffer(data, dtype=np.uint8), count=count * bits, bitorder="little"
+    ).reshape(count, bits)
+    return (bit_matrix.astype(np.uint32) << np.arange(bits, dtype=np.uint32)).sum(
+        axis=1, dtype=np.uint32
+    )
+
+
+def encode_varints(values) -> bytes:
+    """
+    Encodes unsigned integers as LEB128 varints, 7 bits per byte, so short runs take one byte.
+    """
+    values = np.asarray(values, dtype=np.uint64).reshape(-1)
+    if len(values) == 0:
+        return b""
+    lengths = np.maximum(
+        1, (np.floor(np.log2(np.maximum(values, 1))).astype(np.int64) // 7) + 1
+    )
+    positions = np.arange(lengths.max())
+    groups = (values[:, None] >> (7 * positions).astype(np.uint64)) & np.uint64(0x7F)
+    continued = positions[None, :] < lengths[:, None] - 1
+    groups |= continued.astype(np.uint64) << np.uint64(7)
+    return groups[positions[None, :] < lengths[:, None]].astype(np.uint8).tobytes()
+
+
+def decode_varints(data: bytes) -> np.ndarray:
+    data = np.frombuffer(data, dtype=np.uint8)
+    if len(data) == 0:
+        return np.zeros(0, dtype=np.uint64)
+    ends = np.flatnonzero(data < 0x80)
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    value_of_byte = np.repeat(np.arange(len(ends)), ends - starts + 1)
+    shifts = (np.arange(len(data)) - starts[value_of_byte]) * 7
+    parts = (data & 0x7F).astype(np.uint64) << shifts.astype(np.uint64)
+    return np.add.reduceat(parts, starts)
+
+
+def run_length_encode(mask) -> bytes:
+    """
+    Returns the lengths of the alternating runs of a boolean mask as varints. The first run is
+    False, so it is empty if the mask starts with True.
+    """
+    mask = np.asarray(mask, dtype=bool).reshape(-1)
+    changes = np.flatnonzero(mask[1:] != mask[:-1]) + 1
+    runs = np.diff(np.concatenate([[0], changes, [len(mask)]]))
+    if len(mask) and mask[0]:
+        runs = np.concatenate([[0], runs])
+    return encode_varints(runs)
+
+
+def run_length_decode(data: bytes) -> np.ndarray:
+    runs = decode_varints(data).astype(np.int64)
+    return np.repeat(np.arange(len(runs)) % 2 == 1, runs)
+
+
+def _index_bits(codebook_size: int) -> int:
+    return max(1, math.ceil(math.log2(max(codebook_size, 1))))
+
+
+def encode_tensor(values: np.ndarray, max_codebook_size: int = MAX_CODEBOOK_SIZE):
+    """
+    Chooses the smallest encoding of a weight tensor:
+
+    - `raw`: the values as they are.
+    - `codebook`: the unique values and the bit packed index of every value into them.
+    - `masked_codebook`: the run length encoded mask of the zeros, e.g. of pruned weights, and
+      the codebook and bit packed indices of the other values only. This pays off for masks
+      with long runs, like pruned units or filters; for scattered zeros, zero simply becomes
+      one more value of the codebook.
+
+    Returns:
+        tuple: The metadata of the encoding and its data segments by name.
+    """
+    values = np.asarray(values)
+    flat = values.reshape(-1)
+    metadata = {
+        "shape": list(values.shape),
+        "dtype": values.dtype.str,
+        "encoding": "raw",
+    }
+    candidates = [(flat.nbytes, metadata, {"raw": flat.tobytes()})]
+    if np.issubdtype(values.dtype, np.floating) and flat.size:
+        codebook, indices = np.unique(flat, return_inverse=True)
+        if len(codebook) <= max_codebook_size:
+            bits = _index_bits(len(codebook))
+            segments = {
+                "codebook": codebook.tobytes(),
+                "indices": pack_bits(indices, bits),
+            }
+            candidates.append(
+                (
+                    sum(len(segment) for segment in segments.values()),
+                    {**metadata, "encoding": "codebook", "bits": bits},
+                    segments,
+                )
+            )
+        zeros = flat == 0
+        if zeros.any():
+            nonzero_codebook, nonzero_indices = np.unique(
+                flat[~zeros], return_inverse=True
+            )
+            if len(nonzero_codebook) <= max_codebook_size:
+                bits = _index_bits(len(nonzero_codebook))
+                segments = {
+                    "mask": run_length_encode(zeros),
+                    "codebook": nonzero_codebook.tobytes(),
+                    "indices": pack_bits(nonzero_indices, bits),
+                }
+                candidates.append(
+                    (
+                        sum(len(segment) for segment in segments.values()),
+                        {**metadata, "encoding": "masked_codebook", "bits": bits},
+                        segments,
+                    )
+                )
+    _, metadata, segments = min(candidates, key=lambda candidate: candidate[0])
+    return metadata, segments
+
+
+def decode_tensor(metadata: dict, segments: dict) -> np.ndarray:
+    dtype = np.dtype(metadata["dtype"])
+    shape = metadata["shape"]
+    size = int(np.prod(shape))
+    if metadata["encoding"] == "raw":
+        return np.frombuffer(segments["raw"], dtype=dtype).reshape(shape).copy()
+    codebook = np.frombuffer(segments["codebook"], dtype=dtype)
+    if metadata["encoding"] == "codebook":
+        indices = unpack_bits(segments["indices"], metadata["bits"], size)
+        return codebook[indices].reshape(shape)
+    zeros = run_length_decode(segments["mask"])
+    values = np.zeros(size, dtype=dtype)
+    indices = unpack_bits(segments["indices"], metadata["bits"], size - zeros.sum())
+    values[~zeros] = codebook[indices]
+    return values.reshape(shape)
+
+
+def save_codebook_model(
+    model, file_path: str, max_codebook_size: int = MAX_CODEBOOK_SIZE
+) -> int:
+    """
+    Saves the architecture and weights of a model in the codebook format. Clustered layers only
+    have a few unique values per weight, e.g. 16 clusters are stored as 4 bit indices. Optimizer
+    state is not stored, the file is meant for inference.
+
+    Args:
+        model (keras.Model): A functional or sequential model without clustering wrappers.
+        file_path (str): The file to write.
+        max_codebook_size (int): Tensors with more unique values are stored as they are.
+
+    Returns:
+        int: The size of the file in bytes.
+    """
+    tensors = []
+    data = []
+    offset = 0
+    for weight, values in zip(model.weights, model.get_weights()):
+        metadata, segments = encode_tensor(values, max_codebook_size)
+        metadata["name"] = weight.name
+        metadata["segments"] = {}
+        for name, segment in segments.items():
+            metadata["segments"][name] = [offset, len(segment)]
+            data.append(segment)
+            offset += len(segment)
+        tensors.append(metadata)
+    header = json.dumps(
+        {"model": json.loads(model.to_json()), "tensors": tensors}
+    ).encode("utf-8")
+    with open(file_path, "wb") as file:
+        file.write(CODEBOOK_MAGIC)
+        file.write(struct.pack("<I", len(header)))
+        file.write(header)
+        for segment in data:
+            file.write(segment)
+    return len(CODEBOOK_MAGIC) + 4 + len(header) + offset
+
+
+def load_codebook_model(file_path: str):
+    """
+    Reconstructs the Keras model of a file written by `save_codebook_model`.
+    """
+    with open(file_path, "rb") as file:
+        content = file.read()
+    if not content.startswith(CODEBOOK_MAGIC):
+        raise ValueError(f"{file_path} is not a codebook model file")
+    start = len(CODEBOOK_MAGIC)
+    (header_length,) = struct.unpack_from("<I", content, start)
+    start += 4
+    header = json.loads(content[start : start + header_length].decode("utf-8"))
+    data = memoryview(content)[start + header_length :]
+
+    model = keras.models.model_from_json(json.dumps(header["model"]))
+    weights = []
+    for metadata in header["tensors"]:
+        segments = {
+            name: data[offset : offset + length]
+            for name, (offset, length) in metadata["segments"].items()
+        }
+        weights.append(decode_tensor(metadata, segments))
+    model.set_weights(weights)
+    return model
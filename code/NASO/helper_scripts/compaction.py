@@ -0,0 +1,442 @@
+import keras
+import numpy as np
+import tensorflow as tf
+from loguru import logger
+
+from inference.helper_scripts.benchmark import LatencyBenchmark, build_predict_step
+from neural_architecture.helper_scripts.architecture import calculate_flops
+
+K = keras.backend
+
+# layers that process every channel of the last axis on its own and keep the channel order
+PASSTHROUGH_LAYERS = (
+    keras.layers.Dropout,
+    keras.layers.Activation,
+    keras.layers.ReLU,
+    keras.layers.LeakyReLU,
+    keras.layers.ELU,
+    keras.layers.MaxPooling1D,
+    keras.layers.MaxPooling2D,
+    keras.layers.MaxPooling3D,
+    keras.layers.AveragePooling1D,
+    keras.layers.AveragePooling2D,
+    keras.layers.AveragePooling3D,
+    keras.layers.GlobalMaxPooling1D,
+    keras.layers.GlobalMaxPooling2D,
+    keras.layers.GlobalMaxPooling3D,
+    keras.layers.GlobalAveragePooling1D,
+    keras.layers.GlobalAveragePooling2D,
+    keras.layers.GlobalAveragePooling3D,
+    keras.layers.ZeroPadding1D,
+    keras.layers.ZeroPadding2D,
+    keras.layers.ZeroPadding3D,
+    keras.layers.Cropping1D,
+    keras.layers.Cropping2D,
+    keras.layers.UpSampling1D,
+    keras.layers.UpSampling2D,
+)
+PRODUCER_LAYERS = (
+    keras.layers.Dense,
+    keras.layers.Conv1D,
+    keras.layers.Conv2D,
+    keras.layers.Conv3D,
+)
+ELEMENTWISE_MERGE_LAYERS = (
+    keras.layers.Add,
+    keras.layers.Subtract,
+    keras.layers.Average,
+    keras.layers.Maximum,
+    keras.layers.Minimum,
+    keras.layers.Multiply,
+)
+
+
+def _channels_last(layer) -> bool:
+    return layer.get_config().get("data_format") in (None, "channels_last")
+
+
+def _maps_zero_to_zero(function) -> bool:
+    return bool(np.all(np.asarray(function(tf.zeros((1, 1)))) == 0))
+
+
+def _layer_kind(layer, output_rank: int) -> str:
+    """
+    Classifies a layer by how zero channels of its inputs and outputs can be removed.
+    """
+    if isinstance(layer, PRODUCER_LAYERS):
+        if isinstance(layer, keras.layers.Conv2DTranspose) or isinstance(
+            layer, keras.layers.Conv3DTranspose
+        ):
+            return "other"
+        if not _channels_last(layer) or layer.get_config().get("groups", 1) != 1:
+            return "other"
+        return "producer"
+    if isinstance(layer, keras.layers.DepthwiseConv2D):
+        if _channels_last(layer) and layer.depth_multiplier == 1:
+            return "per_channel"
+        return "other"
+    if isinstance(layer, keras.layers.BatchNormalization):
+        axis = layer.axis if isinstance(layer.axis, (list, tuple)) else [layer.axis]
+        if len(axis) == 1 and axis[0] in (-1, output_rank - 1):
+            return "per_channel"
+        return "other"
+    if isinstance(layer, PASSTHROUGH_LAYERS):
+        return "passthrough" if _channels_last(layer) else "other"
+    if isinstance(layer, ELEMENTWISE_MERGE_LAYERS):
+        return "merge"
+    if isinstance(layer, keras.layers.Concatenate):
+        return "concat" if layer.axis in (-1, output_rank - 1) else "other"
+    if isinstance(layer, keras.layers.Flatten):
+        return "flatten" if _channels_last(layer) else "other"
+    return "other"
+
+
+class _GraphLayer:
+    """
+    A layer of the functional graph with the ids of its input and output tensors.
+    """
+
+    def __init__(self, layer, inputs, output):
+        self.layer = layer
+        self.inputs = [id(tensor) for tensor in inputs]
+        self.output = id(output)
+        self.input_shapes = [tensor.shape for tensor in inputs]
+        self.output_shape = output.shape
+        self.kind = _layer_kind(layer, len(output.shape))
+        if self.kind == "flatten" and (
+            len(self.inputs) != 1 or None in self.input_shapes[0][1:]
+        ):
+            self.kind = "other"
+
+
+def _graph_layers(model) -> list[_GraphLayer]:
+    if not getattr(model, "_is_graph_network", False):
+        raise ValueError("Only functional and sequential models can be compacted")
+    graph_layers = []
+    for layer in model.layers:
+        if isinstance(layer, keras.layers.InputLayer):
+            continue
+        nodes = [
+            node
+            for index, node in enumerate(layer._inbound_nodes)
+            if f"{layer.name}_ib-{index}" in model._network_nodes
+        ]
+        if len(nodes) != 1:
+            raise ValueError(f"Layer {layer.name} is shared, it can not be compacted")
+        outputs = tf.nest.flatten(nodes[0].outputs)
+        if len(outputs) != 1:
+            raise ValueError(f"Layer {layer.name} has several outputs")
+        graph_layers.append(
+            _GraphLayer(layer, tf.nest.flatten(nodes[0].keras_inputs), outputs[0])
+        )
+    return graph_layers
+
+
+def _zero_channels(graph_layer: _GraphLayer, zero_inputs: list) -> np.ndarray:
+    """
+    Returns which channels of the output of a layer are zero for every input, given which
+    channels of its inputs are.
+    """
+    layer = graph_layer.layer
+    channels = graph_layer.output_shape[-1]
+    kind = graph_layer.kind
+    if kind == "producer":
+        kernel = layer.kernel.numpy()
+        # zero input channels do not contribute, whatever their weights are
+        alive_kernel = kernel[..., ~zero_inputs[0], :]
+        zero = np.all(alive_kernel.reshape(-1, channels) == 0, axis=0)
+        if layer.use_bias:
+            zero &= layer.bias.numpy() == 0
+        return zero & _maps_zero_to_zero(layer.activation)
+    if isinstance(layer, keras.layers.DepthwiseConv2D):
+        kernel = layer.depthwise_kernel.numpy()[..., 0]
+        zero = zero_inputs[0] | np.all(kernel.reshape(-1, channels) == 0, axis=0)
+        if layer.use_bias:
+            zero &= layer.bias.numpy() == 0
+        return zero & _maps_zero_to_zero(layer.activation)
+    if isinstance(layer, keras.layers.BatchNormalization):
+        # the normalization maps a zero channel to beta - gamma * mean / sqrt(var + eps)
+        constant = -layer.moving_mean.numpy() / np.sqrt(
+            layer.moving_variance.numpy() + layer.epsilon
+        )
+        if layer.scale:
+            constant = constant * layer.gamma.numpy()
+        if layer.center:
+            constant = constant + layer.beta.numpy()
+        return zero_inputs[0] & (constant == 0)
+    if kind == "passthrough":
+        if isinstance(
+            layer,
+            (
+                keras.layers.Activation,
+                keras.layers.ReLU,
+                keras.layers.LeakyReLU,
+                keras.layers.ELU,
+            ),
+        ) and not _maps_zero_to_zero(layer):
+            return np.zeros(channels, dtype=bool)
+        return zero_inputs[0].copy()
+    if kind == "merge":
+        if isinstance(layer, keras.layers.Multiply):
+            return np.any(zero_inputs, axis=0)
+        return np.all(zero_inputs, axis=0)
+    if kind == "concat":
+        return np.concatenate(zero_inputs)
+    if kind == "flatten":
+        return np.tile(zero_inputs[0], int(np.prod(graph_layer.input_shapes[0][1:-1])))
+    return np.zeros(channels, dtype=bool)
+
+
+def find_removable_channels(model) -> tuple[list[_GraphLayer], dict]:
+    """
+    Determines the channels of every tensor of the model that can be removed. A channel is
+    removable if it is zero for every input, e.g. the output of a Dense unit or Conv filter
+    whose weights were all pruned, and if every layer consuming the tensor can drop it as well:
+    layers with weights drop the corresponding input slice, channel wise layers and merge nodes
+    drop the same channels on all their inputs and their output.
+
+    Returns:
+        tuple: The layers of the graph and a dict from tensor id to a boolean array of the
+            removable channels of the tensor.
+    """
+    graph_layers = _graph_layers(model)
+    zero = {
+        id(tensor): np.zeros(tensor.shape[-1], dtype=bool) for tensor in model.inputs
+    }
+    for graph_layer in graph_layers:
+        zero[graph_layer.output] = _zero_channels(
+            graph_layer, [zero[key] for key in graph_layer.inputs]
+        )
+
+    removable = {key: value.copy() for key, value in zero.items()}
+    for tensor in model.inputs + model.outputs:
+        removable[id(tensor)][:] = False
+    for graph_layer in graph_layers:
+        if graph_layer.kind == "other":
+            for key in graph_layer.inputs:
+                removable[key][:] = False
+    for value in removable.values():
+        if value.all():
+            # a tensor needs at least one channel
+            value[0] = False
+
+    changed = True
+    while changed:
+        changed = False
+        for graph_layer in graph_layers:
+            inputs = [removable[key] for key in graph_layer.inputs]
+            output = removable[graph_layer.output]
+            before = [value.copy() for value in inputs + [output]]
+            if graph_layer.kind in ("passthrough", "per_channel", "merge"):
+                common = np.logical_and.reduce(inputs + [output])
+                for value in inputs + [output]:
+                    value &= common
+            elif graph_layer.kind == "concat":
+                offsets = np.cumsum([len(value) for value in inputs])[:-1]
+                for value, part in zip(inputs, np.split(output, offsets)):
+                    value &= part
+                output &= np.concatenate(inputs)
+            elif graph_layer.kind == "flatten":
+                channels = len(inputs[0])
+                output &= np.tile(inputs[0], len(output) // channels)
+                inputs[0] &= output.reshape(-1, channels).all(axis=0)
+            changed |= any(
+                not np.array_equal(old, new)
+                for old, new in zip(before, inputs + [output])
+            )
+    return graph_layers, removable
+
+
+def outputs_match(model, other, tolerance: float = 1e-4) -> bool:
+    """
+    Returns whether two models with the same inputs compute the same outputs on random inputs,
+    up to the absolute and relative tolerance.
+    """
+    samples = [
+        np.random.default_rng(0)
+        .standard_normal([2] + [dim or 1 for dim in tensor.shape[1:]])
+        .astype(tensor.dtype.as_numpy_dtype)
+        for tensor in model.inputs
+    ]
+    return all(
+        np.allclose(original, new, atol=tolerance, rtol=tolerance)
+        for original, new in zip(
+            tf.nest.flatten(model(samples, training=False)),
+            tf.nest.flatten(other(samples, training=False)),
+        )
+    )
+
+
+def _compacted_layer(graph_layer: _GraphLayer, keep_inputs: list, keep: np.ndarray):
+    """
+    Builds the layer without the removed channels and returns it with its weights.
+    """
+    layer = graph_layer.layer
+    config = layer.get_config()
+    weights = layer.get_weights()
+    if graph_layer.kind == "producer":
+        config["units" if isinstance(layer, keras.layers.Dense) else "filters"] = int(
+            keep.sum()
+        )
+        kernel = layer.kernel.numpy()[..., keep_inputs[0], :][..., keep]
+        weights = [kernel] + ([layer.bias.numpy()[keep]] if layer.use_bias else [])
+    elif graph_layer.kind == "per_channel":
+        if isinstance(layer, keras.layers.DepthwiseConv2D):
+            weights = [layer.depthwise_kernel.numpy()[..., keep, :]] + (
+                [layer.bias.numpy()[keep]] if layer.use_bias else []
+            )
+        else:
+            weights = [weight[keep] for weight in weights]
+    return layer.__class__.from_config(config), weights
+
+
+def compact_model(model, tolerance: float = 1e-4):
+    """
+    Removes all channels of a model that are zero for every input: Dense units and Conv filters
+    whose weights and bias were pruned to zero, together with the matching input slices of all
+    downstream layers, also across Flatten, Concatenate and elementwise merge layers. Unlike the
+    pruned model, the compacted one has smaller weight tensors and therefore less work to do.
+
+    Args:
+        model (keras.Model): A functional or sequential model without pruning wrappers.
+        tolerance (float): Maximum absolute difference of the outputs of both models on random
+            inputs, the compaction is rejected if it is exceeded.
+
+    Returns:
+        tuple: The compacted model and the number of removed channels by layer name.
+
+    Raises:
+        ValueError: If the model can not be compacted, e.g. because of shared layers.
+    """
+    graph_layers, removable = find_removable_channels(model)
+    tensors = {}
+    inputs = []
+    for tensor in model.inputs:
+        new_input = keras.Input(
+            shape=tensor.shape[1:],
+            dtype=tensor.dtype,
+            name=tensor._keras_history.layer.name,
+        )
+        tensors[id(tensor)] = new_input
+        inputs.append(new_input)
+
+    removed = {}
+    for graph_layer in graph_layers:
+        keep_inputs = [~removable[key] for key in graph_layer.inputs]
+        keep = ~removable[graph_layer.output]
+        new_layer, weights = _compacted_layer(graph_layer, keep_inputs, keep)
+        layer_inputs = [tensors[key] for key in graph_layer.inputs]
+        tensors[graph_layer.output] = new_layer(
+            layer_inputs[0] if len(layer_inputs) == 1 else layer_inputs
+        )
+        if weights:
+            new_layer.set_weights(weights)
+        if graph_layer.kind == "producer" and not keep.all():
+            removed[graph_layer.layer.name] = int((~keep).sum())
+
+    outputs = [tensors[id(tensor)] for tensor in model.outputs]
+    compacted = keras.Model(
+        inputs=inputs if len(inputs) > 1 else inputs[0],
+        outputs=outputs if len(outputs) > 1 else outputs[0],
+        name=model.name,
+    )
+
+    if not outputs_match(model, compacted, tolerance):
+        raise ValueError("The compacted model computes different outputs")
+    return compacted, removed
+
+
+def _latency(model, batch_size: int, **benchmark_options) -> float:
+    inputs = [
+        tf.random.normal([batch_size] + [dim or 1 for dim in tensor.shape[1:]])
+        for tensor in model.inputs
+    ]
+    dataset = tf.data.Dataset.from_tensors(
+        tuple(inputs) if len(inputs) > 1 else inputs[0]
+    )
+    step, _ = build_predict_step(model, dataset)
+    return LatencyBenchmark(step, **benchmark_options).run()["metrics"][
+        "latency_p50 [ms]"
+    ]
+
+
+def compaction_report(original, compacted, removed: dict, batch_size: int = 1) -> dict:
+    """
+    Compares parameters and FLOPs of a model before and after the compaction, the latencies
+    are measured separately by `compaction_latency`.
+
+    Args:
+        original (keras.Model): The model before the compaction.
+        compacted (keras.Model): The compacted model.
+        removed (dict): Removed channels by layer name, as returned by `compact_model`.
+        batch_size (int): Batch size of the FLOPs.
+    """
+    report = {"removed_channels": removed}
+    for name, model in [("before", original), ("after", compacted)]:
+        report[f"params_{name}"] = int(
+            np.sum([K.count_params(weight) for weight in model.weights])
+        )
+        report[f"flops_{name}"] = int(calculate_flops(model, batch_size))
+    return report
+
+
+def compaction_latency(
+    original, compacted, batch_size: int = 1, **benchmark_options
+) -> dict:
+    """
+    Measures the median latency of a model before and after the compaction. It runs
+    benchmarks, so it must not be called while the inference of a run is measured.
+
+    Args:
+        original (keras.Model): The model before the compaction.
+        compacted (keras.Model): The compacted model.
+        batch_size (int): Batch size of the latency.
+        **benchmark_options: Arguments of the LatencyBenchmark.
+
+    Returns:
+        dict: The latencies and the speedup.
+    """
+    benchmark_options = {
+        "warmup": 3,
+        "iterations": 20,
+        "trials": 1,
+        **benchmark_options,
+    }
+    report = {}
+    for name, model in [("before", original), ("after", compacted)]:
+        report[f"latency_p50_{name} [ms]"] = _latency(
+            model, batch_size, **benchmark_options
+        )
+    report["speedup"] = (
+        report["latency_p50_before [ms]"] / report["latency_p50_after [ms]"]
+    )
+    return report
+
+
+def compact_pruned_model(model, batch_size: int = 1):
+    """
+    Compacts a model after its pruning wrappers were stripped. If the model can not be
+    compacted, it is returned unchanged and the report contains the reason.
+
+    Returns:
+        tuple: The compacted model and the report of `compaction_report`.
+    """
+    try:
+        compacted, removed = compact_model(model)
+    except (
+        ValueError,
+        TypeError,
+        KeyError,
+        AttributeError,
+        NotImplementedError,
+    ) as exc:
+        logger.warning(f"Could not compact the pruned model: {exc}")
+        return model, {"error": str(exc)}
+    if not removed:
+        return model, {"removed_channels": {}}
+    report = compaction_report(model, compacted, removed, batch_size)
+    logger.info(
+        f"Compacted pruned model from {report['params_before']} to {report['params_after']} "
+        "parameters"
+    )
+    return compacted, report
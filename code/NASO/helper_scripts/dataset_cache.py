@@ -0,0 +1,275 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import time
+import weakref
+from contextlib import contextmanager
+
+import tensorflow as tf
+from loguru import logger
+
+from helper_scripts.sharded_dataset import (
+    element_spec_from_json,
+    element_spec_to_json,
+    read_shards,
+    write_shards,
+)
+from naso.settings import DATASET_CACHE_PATH, DATASET_CACHE_SIZE
+
+SPLITS = ["train", "test", "eval"]
+# written last into an entry, an entry without it is incomplete
+METADATA_FILE = "metadata.json"
+
+
+def dataset_cache_key(*parts) -> str:
+    """
+    Returns the key of a cache entry for the parts that identify the preprocessed dataset,
+    e.g. loader module and class, dataset name, split spec, preprocessing version and
+    `as_supervised`.
+    """
+    description = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha1(description.encode("utf-8")).hexdigest()
+
+
+def directory_size(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(directory, file))
+        for directory, _, files in os.walk(path)
+        for file in files
+    )
+
+
+def merge_cache_statistics(statistics: dict, new_statistics: dict) -> dict:
+    """
+    Adds the statistics of a lookup in the dataset cache to those of the earlier lookups of a
+    run, e.g. AutoKeras loads the dataset several times.
+    """
+    return {
+        **new_statistics,
+        "hits": statistics.get("hits", 0) + new_statistics["hits"],
+        "misses": statistics.get("misses", 0) + new_statistics["misses"],
+        "load_time [s]": statistics.get("load_time [s]", 0)
+        + new_statistics["load_time [s]"],
+    }
+
+
+class DatasetCache:
+    """
+    Keeps the preprocessed splits of datasets on disk, saved with `tf.data.Dataset.save`, so
+    later tasks load them with `tf.data.Dataset.load` instead of fetching and preprocessing the
+    dataset again. Workers sharing the directory share the cache:
+
+    - An entry is written into a temporary directory and renamed when it is complete. A file
+      lock per key makes concurrent workers wait for the first one instead of building the
+      same entry.
+    - Readers hold a shared lock on the entry for as long as the loaded datasets are alive.
+    - When the entries exceed the maximum size, the least recently used ones are evicted.
+      Entries that are in use are skipped.
+
+    Args:
+        directory (str): The directory of the cache.
+        max_size (int): Maximum bytes of all entries.
+    """
+
+    def __init__(self, directory: str, max_size: int):
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _lock_path(self, key: str, kind: str) -> str:
+        return os.path.join(self.directory, f".{key}.{kind}.lock")
+
+    @contextmanager
+    def _build_lock(self, key: str):
+        with open(self._lock_path(key, "build"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def read_metadata(self, key: str) -> dict | None:
+        try:
+            with open(
+                os.path.join(self._entry_path(key), METADATA_FILE), encoding="utf-8"
+            ) as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def load(self, key: str):
+        """
+        Loads the splits of an entry and marks it as used.
+
+        Returns:
+            tuple: The datasets and the metadata of the entry, or None if there is no complete
+                entry for the key.
+        """
+        lock_file = open(self._lock_path(key, "use"), "a")
+        fcntl.flock(lock_file, fcntl.LOCK_SH)
+        metadata = self.read_metadata(key)
+        if metadata is None:
+            lock_file.close()
+            return None
+        os.utime(os.path.join(self._entry_path(key), METADATA_FILE))
+        if metadata.get("format") == "tfrecord":
+            element_spec = element_spec_from_json(metadata["element_spec"])
+            datasets = tuple(
+                read_shards(os.path.join(self._entry_path(key), split), element_spec)
+                for split in metadata["splits"]
+            )
+        else:
+            datasets = tuple(
+                tf.data.Dataset.load(os.path.join(self._entry_path(key), split))
+                for split in metadata["splits"]
+            )
+        # the shared lock is released once no split of the entry is used anymore
+        remaining = [len(datasets)]
+
+        def release():
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                lock_file.close()
+
+        for dataset in datasets:
+            weakref.finalize(dataset, release)
+        return datasets, metadata
+
+    def store(self, key: str, datasets, metadata: dict = None) -> dict:
+        """
+        Saves the splits of a dataset as a new entry. With `format` tfrecord in the metadata the
+        splits are written as TFRecord shards, see `helper_scripts.sharded_dataset`, otherwise
+        with `tf.data.Dataset.save`.
+
+        Returns:
+            dict: The metadata of the entry.
+        """
+        temporary_path = f"{self._entry_path(key)}.tmp-{os.getpid()}"
+        shutil.rmtree(temporary_path, ignore_errors=True)
+        metadata = metadata or {}
+        splits = SPLITS[: len(datasets)]
+        for split, dataset in zip(splits, datasets):
+            if metadata.get("format") == "tfrecord":
+                write_shards(os.path.join(temporary_path, split), dataset)
+            else:
+                dataset.save(os.path.join(temporary_path, split))
+        if metadata.get("format") == "tfrecord":
+            metadata["element_spec"] = element_spec_to_json(datasets[0].element_spec)
+        metadata = {
+            **metadata,
+            "splits": splits,
+            "size": directory_size(temporary_path),
+            "created": time.time(),
+        }
+        with open(
+            os.path.join(temporary_path, METADATA_FILE), "w", encoding="utf-8"
+        ) as file:
+            json.dump(metadata, file)
+        shutil.rmtree(self._entry_path(key), ignore_errors=True)
+        os.replace(temporary_path, self._entry_path(key))
+        return metadata
+
+    def get_or_build(self, key: str, build) -> tuple:
+        """
+        Loads the entry of the key or builds and stores it first.
+
+        Args:
+            key (str): The key of the entry, see `dataset_cache_key`.
+            build (callable): Returns the splits of the dataset and metadata that is stored
+                with them.
+
+        Returns:
+            tuple: The datasets, the stored metadata and the statistics of the lookup.
+        """
+        start = time.perf_counter()
+        hit = True
+        loaded = self.load(key)
+        if loaded is None:
+            with self._build_lock(key):
+                # another worker may have built the entry while this one waited
+                loaded = self.load(key)
+                if loaded is None:
+                    hit = False
+                    datasets, metadata = build()
+                    self.store(key, datasets, metadata)
+                    loaded = self.load(key)
+        datasets, metadata = loaded
+        self.evict()
+        statistics = {
+            "key": key,
+            "hits": int(hit),
+            "misses": int(not hit),
+            "size [B]": metadata["size"],
+            "load_time [s]": time.perf_counter() - start,
+        }
+        return datasets, metadata, statistics
+
+    def entries(self) -> list[dict]:
+        """
+        Returns key, size and time of the last use of all complete entries.
+        """
+        entries = []
+        for key in os.listdir(self.directory):
+            if key.startswith(".") or ".tmp-" in key:
+                continue
+            metadata = self.read_metadata(key)
+            if metadata is None:
+                continue
+            entries.append(
+                {
+                    "key": key,
+                    "size": metadata["size"],
+                    "last_used": os.path.getmtime(
+                        os.path.join(self._entry_path(key), METADATA_FILE)
+                    ),
+                }
+            )
+        return entries
+
+    def evict(self) -> list[str]:
+        """
+        Removes the least recently used entries, that are not in use, until all entries fit
+        into the maximum size.
+
+        Returns:
+            list[str]: The keys of the removed entries.
+        """
+        entries = sorted(self.entries(), key=lambda entry: entry["last_used"])
+        total_size = sum(entry["size"] for entry in entries)
+        evicted = []
+        for entry in entries:
+            if total_size <= self.max_size:
+                break
+            with open(self._lock_path(entry["key"], "use"), "a") as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                shutil.rmtree(self._entry_path(entry["key"]), ignore_errors=True)
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            total_size -= entry["size"]
+            evicted.append(entry["key"])
+            logger.info(f"Evicted dataset {entry['key']} from the dataset cache.")
+        return evicted
+
+
+_dataset_cache = None
+
+
+def get_dataset_cache() -> DatasetCache | None:
+    """
+    Returns the dataset cache, None if DATASET_CACHE_SIZE disables it.
+    """
+    global _dataset_cache
+    if DATASET_CACHE_SIZE <= 0:
+        return None
+    if _dataset_cache is None:
+        _dataset_cache = DatasetCache(
+            DATASET_CACHE_PATH, DATASET_CACHE_SIZE * 1024 * 1024
+        )
+    return _dataset_cache
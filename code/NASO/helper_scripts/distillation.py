@@ -0,0 +1,188 @@
+import os
+
+import keras
+import numpy as np
+import tensorflow as tf
+
+from helper_scripts.energy_attribution import energy_profiler
+from inference.helper_scripts.benchmark import LatencyBenchmark, build_predict_step
+from inference.helper_scripts.evaluation import StreamingClassificationMetrics
+
+
+def outputs_are_probabilities(model) -> bool:
+    """
+    Returns whether the model ends with a softmax, so its outputs are probabilities and not
+    logits.
+    """
+    last_layer = model.layers[-1]
+    if isinstance(last_layer, keras.layers.Softmax):
+        return True
+    return getattr(last_layer, "activation", None) is keras.activations.softmax
+
+
+def to_logits(outputs, probabilities: bool):
+    """
+    Returns logits for the outputs of a model. The log of probabilities are logits up to a
+    constant per sample, which does not change the softmax.
+    """
+    if probabilities:
+        return tf.math.log(tf.clip_by_value(outputs, 1e-7, 1.0))
+    return outputs
+
+
+def cache_teacher_logits(
+    teacher, dataset: tf.data.Dataset, file_path: str, batch_size: int = 256
+) -> np.ndarray:
+    """
+    Runs the teacher once over the dataset and stores its logits in a `.npy` file. If the file
+    already holds logits for every sample of the dataset, they are loaded instead, so the
+    teacher is not run again for later students.
+
+    Args:
+        teacher (keras.Model): The trained teacher.
+        dataset (tf.data.Dataset): The unbatched dataset, it must have the same order in every
+            iteration.
+        file_path (str): The cache file.
+        batch_size (int): Batch size of the teacher predictions.
+
+    Returns:
+        np.ndarray: The logits, memory mapped from the cache file.
+    """
+    if os.path.exists(file_path):
+        logits = np.load(file_path, mmap_mode="r")
+        samples = int(dataset.cardinality())
+        if samples < 0:
+            # e.g. memory mapped or streamed datasets, counting is cheaper than the teacher
+            samples = int(dataset.reduce(np.int64(0), lambda count, *_: count + 1))
+        if len(logits) == samples:
+            return logits
+    logits = []
+    probabilities = outputs_are_probabilities(teacher)
+    for batch in dataset.map(lambda *element: element[0]).batch(batch_size):
+        logits.append(to_logits(teacher(batch, training=False), probabilities).numpy())
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    np.save(file_path, np.concatenate(logits).astype(np.float32))
+    return np.load(file_path, mmap_mode="r")
+
+
+def with_teacher_logits(dataset: tf.data.Dataset, logits) -> tf.data.Dataset:
+    """
+    Zips the unbatched dataset of (inputs, labels) with the cached teacher logits, before any
+    shuffling, into elements of (inputs, (labels, logits)) for the Distiller.
+    """
+    return tf.data.Dataset.zip(
+        (dataset, tf.data.Dataset.from_tensor_slices(np.asarray(logits)))
+    ).map(lambda element, teacher_logits: (element[0], (element[1], teacher_logits)))
+
+
+class Distiller(keras.Model):
+    """
+    Trains a student on the compiled loss of the labels and the Kullback-Leibler divergence
+    between the softened outputs of the teacher and the student. The teacher is not part of the
+    model, its logits come with the training data, see `with_teacher_logits`. Evaluation and
+    prediction use the student alone.
+
+    Args:
+        student (keras.Model): The model to train.
+        temperature (float): Softens both distributions, higher values transfer more of the
+            similarities between classes.
+        alpha (float): Weight of the loss of the labels, the distillation loss gets 1 - alpha.
+    """
+
+    def __init__(self, student, temperature: float = 4.0, alpha: float = 0.1):
+        super().__init__()
+        self.student = student
+        self.temperature = temperature
+        self.alpha = alpha
+        self.student_probabilities = outputs_are_probabilities(student)
+        self.distillation_loss_tracker = keras.metrics.Mean(name="distillation_loss")
+
+    def call(self, inputs, training=None):
+        return self.student(inputs, training=training)
+
+    def distillation_loss(self, teacher_logits, student_outputs):
+        student_logits = to_logits(student_outputs, self.student_probabilities)
+        # scaled by T^2, so the gradients keep their magnitude for any temperature
+        return keras.losses.kl_divergence(
+            tf.nn.softmax(teacher_logits / self.temperature),
+            tf.nn.softmax(student_logits / self.temperature),
+        ) * (self.temperature**2)
+
+    def train_step(self, data):
+        inputs, (labels, teacher_logits) = data
+        with tf.GradientTape() as tape:
+            outputs = self.student(inputs, training=True)
+            student_loss = self.compute_loss(inputs, labels, outputs)
+            distillation_loss = tf.reduce_mean(
+                self.distillation_loss(teacher_logits, outputs)
+            )
+            loss = self.alpha * student_loss + (1 - self.alpha) * distillation_loss
+        self.optimizer.minimize(loss, self.student.trainable_variables, tape=tape)
+        self.distillation_loss_tracker.update_state(distillation_loss)
+        return {
+            **self.compute_metrics(inputs, labels, outputs, None),
+            "distillation_loss": self.distillation_loss_tracker.result(),
+        }
+
+    @property
+    def metrics(self):
+        return super().metrics + [self.distillation_loss_tracker]
+
+
+def compare_models(
+    models: dict,
+    dataset: tf.data.Dataset,
+    device: str,
+    batch_size: int = 32,
+    **benchmark_options,
+) -> dict:
+    """
+    Measures accuracy, latency and energy per sample of several models on the same batches.
+
+    Args:
+        models (dict[str, keras.Model]): The models by name, e.g. `teacher` and `student`.
+        dataset (tf.data.Dataset): The unbatched dataset with labels.
+        device (str): The device for the energy measurement, e.g. `GPU:0`.
+        batch_size (int): Batch size of the evaluation and the benchmark.
+        **benchmark_options: Arguments of the LatencyBenchmark.
+
+    Returns:
+        dict: Per model name the parameters, accuracy, median latency and energy per sample.
+    """
+    benchmark_options = {
+        "warmup": 5,
+        "iterations": 50,
+        "trials": 3,
+        **benchmark_options,
+    }
+    batched = dataset.batch(batch_size)
+    results = {}
+    with energy_profiler(device) as profiler:
+        for name, model in models.items():
+            metrics = StreamingClassificationMetrics()
+            try:
+                for inputs, labels in batched:
+                    metrics.update(labels, model.predict_on_batch(inputs))
+            except ValueError:
+                metrics.reset()
+            step, samples_per_step = build_predict_step(model, batched)
+            benchmark = LatencyBenchmark(step, **benchmark_options)
+            if profiler:
+                profiler.begin_phase(name)
+                profiler.begin_batch(name)
+            latency = benchmark.run()["metrics"]
+            result = {
+                "parameters": int(model.count_params()),
+                **metrics.result(),
+                "latency_p50 [ms]": latency["latency_p50 [ms]"],
+            }
+            if profiler:
+                calls = latency["iterations"] + benchmark.warmup * benchmark.trials
+                profiler.end_batch(name, int(calls * samples_per_step))
+                energy = profiler.attribute(name)
+                if f"{name}_energy_per_sample [J]" in energy:
+                    result["energy_per_sample [J]"] = energy[
+                        f"{name}_energy_per_sample [J]"
+                    ]
+            results[name] = result
+    return results
@@ -0,0 +1,263 @@
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from loguru import logger
+
+from helper_scripts.energy_counter import RaplEnergyCounter, get_energy_counter
+from helper_scripts.power_sampler import (
+    POWER_SOURCES,
+    PowerSampler,
+    PowerSourceUnavailableError,
+    acquire_power_sampler,
+    release_power_sampler,
+)
+from naso.settings import IDLE_POWER_MEASUREMENT_DURATION, POWER_SAMPLING_INTERVAL
+
+
+def integrate_power(timestamps, power, starts, ends) -> np.ndarray:
+    """
+    Integrates a sampled power timeline over a set of intervals.
+    The power is linearly interpolated between two readings and held constant before the first
+    and after the last reading.
+
+    Args:
+        timestamps (array): Times of the readings in seconds, sorted.
+        power (array): The readings in watts.
+        starts (array): Begin of every interval in seconds.
+        ends (array): End of every interval in seconds.
+
+    Returns:
+        np.ndarray: The energy in joules of every interval, NaN if there are no readings.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    power = np.asarray(power, dtype=np.float64)
+    starts = np.asarray(starts, dtype=np.float64)
+    ends = np.asarray(ends, dtype=np.float64)
+    if len(timestamps) == 0:
+        return np.full(len(starts), np.nan)
+    if len(timestamps) == 1:
+        return power[0] * (ends - starts)
+
+    durations = np.diff(timestamps)
+    # energy from the first reading up to every reading, trapezoidal rule
+    cumulative = np.concatenate(
+        [[0.0], np.cumsum((power[:-1] + power[1:]) / 2 * durations)]
+    )
+    slopes = np.diff(power) / np.where(durations > 0, durations, 1)
+
+    def energy_until(moments):
+        index = np.clip(
+            np.searchsorted(timestamps, moments, side="right") - 1,
+            0,
+            len(timestamps) - 2,
+        )
+        offset = moments - timestamps[index]
+        energy = (
+            cumulative[index] + power[index] * offset + slopes[index] * offset**2 / 2
+        )
+        before = moments < timestamps[0]
+        energy[before] = (moments[before] - timestamps[0]) * power[0]
+        after = moments > timestamps[-1]
+        energy[after] = cumulative[-1] + (moments[after] - timestamps[-1]) * power[-1]
+        return energy
+
+    return energy_until(ends) - energy_until(starts)
+
+
+class EnergyProfiler:
+    """
+    Records the monotonic timestamps of every batch of the train, test and predict phases and
+    attributes the energy of the device to them. With an energy counter, the counter is read at
+    every batch boundary and the energy of a batch is the exact difference; otherwise the power
+    timeline of the sampler is integrated between the boundaries.
+
+    The idle power of the device is subtracted from all values reported as net energy, so they
+    only contain the energy the model needed on top of the idle device.
+
+    Args:
+        sampler (PowerSampler): Power timeline of the device, used without energy counter.
+        energy_counter (RaplEnergyCounter): Cumulative energy counter of the device.
+        idle_power (float): Power of the idle device in watts.
+    """
+
+    def __init__(
+        self,
+        sampler: PowerSampler = None,
+        energy_counter: RaplEnergyCounter = None,
+        idle_power: float = 0.0,
+    ):
+        self.sampler = sampler
+        self.energy_counter = energy_counter
+        self.idle_power = idle_power
+        self._phases = {}
+
+    def measure_idle_power(self, duration: float) -> float:
+        """
+        Measures the power of the device while nothing is executed and uses it as idle baseline.
+
+        Args:
+            duration (float): Seconds to wait.
+
+        Returns:
+            float: The idle power in watts.
+        """
+        if duration <= 0:
+            return self.idle_power
+        start = time.monotonic()
+        start_energy = self.energy_counter.read() if self.energy_counter else None
+        time.sleep(duration)
+        end = time.monotonic()
+        if self.energy_counter:
+            self.idle_power = (self.energy_counter.read() - start_energy) / (
+                end - start
+            )
+        elif self.sampler:
+            idle_power = self.sampler.average_power(start, end)
+            if not np.isnan(idle_power):
+                self.idle_power = idle_power
+                # baseline for the settle detection of following phases
+                self.sampler.idle_power = idle_power
+        return self.idle_power
+
+    def begin_phase(self, phase: str):
+        """
+        Starts recording a phase (`train`, `test` or `predict`) and discards its previous batches.
+        """
+        self._phases[phase] = {
+            "begin": self._boundary(),
+            "batch_begins": [],
+            "batch_ends": [],
+            "sizes": [],
+        }
+
+    def begin_batch(self, phase: str):
+        if phase not in self._phases:
+            self.begin_phase(phase)
+        self._phases[phase]["batch_begins"].append(self._boundary())
+
+    def end_batch(self, phase: str, size: int = None):
+        """
+        Records the end of the current batch of a phase.
+
+        Args:
+            phase (str): The phase of the batch.
+            size (int): Number of samples in the batch, if known.
+        """
+        records = self._phases.get(phase)
+        if not records or len(records["batch_ends"]) >= len(records["batch_begins"]):
+            return
+        records["batch_ends"].append(self._boundary())
+        records["sizes"].append(size)
+
+    def _boundary(self):
+        """
+        Returns the timestamp and, if available, the energy counter value of now.
+        """
+        energy = self.energy_counter.read() if self.energy_counter else np.nan
+        return time.monotonic(), energy
+
+    def _energy(self, starts, ends) -> np.ndarray:
+        if self.energy_counter:
+            return np.array([end[1] for end in ends]) - np.array(
+                [start[1] for start in starts]
+            )
+        start_times = np.array([start[0] for start in starts])
+        end_times = np.array([end[0] for end in ends])
+        if not self.sampler or len(start_times) == 0:
+            return np.full(len(start_times), np.nan)
+        # readings around the window are needed to interpolate at its borders
+        margin = max(2 * POWER_SAMPLING_INTERVAL, 0.5)
+        samples = self.sampler.get_samples(
+            start_times.min() - margin, end_times.max() + margin
+        )
+        return integrate_power(
+            [sample[0] for sample in samples],
+            [sample[1] for sample in samples],
+            start_times,
+            end_times,
+        )
+
+    def attribute(self, phase: str) -> dict:
+        """
+        Attributes the energy of a phase to its batches.
+
+        Returns:
+            dict: Metrics prefixed with the phase name, e.g. `predict_energy [J]` (whole phase),
+                `predict_energy_net [J]` (without idle power), `predict_batch_energy [J]` (mean net
+                energy per batch) and `predict_energy_per_sample [J]`, if the batch sizes are known.
+                Empty, if the phase recorded no batch.
+        """
+        records = self._phases.get(phase)
+        if not records or not records["batch_ends"]:
+            return {}
+        phase_end = self._boundary()
+        batch_count = len(records["batch_ends"])
+        energy = self._energy(
+            [records["begin"]] + records["batch_begins"][:batch_count],
+            [phase_end] + records["batch_ends"],
+        )
+        if np.isnan(energy).all():
+            return {}
+        begins = np.array([begin[0] for begin in records["batch_begins"][:batch_count]])
+        ends = np.array([end[0] for end in records["batch_ends"]])
+        phase_duration = phase_end[0] - records["begin"][0]
+        batch_energy = energy[1:] - self.idle_power * (ends - begins)
+
+        metrics = {
+            f"{phase}_energy [J]": float(energy[0]),
+            f"{phase}_energy_net [J]": float(
+                energy[0] - self.idle_power * phase_duration
+            ),
+            f"{phase}_batches_energy_net [J]": float(np.sum(batch_energy)),
+            f"{phase}_batch_energy [J]": float(np.mean(batch_energy)),
+            f"{phase}_batch_energy_min [J]": float(np.min(batch_energy)),
+            f"{phase}_batch_energy_max [J]": float(np.max(batch_energy)),
+            f"{phase}_batch_energy_var": float(np.var(batch_energy)),
+            "idle_power": float(self.idle_power),
+        }
+        if all(size is not None for size in records["sizes"]):
+            samples = sum(records["sizes"])
+            if samples > 0:
+                metrics[f"{phase}_energy_per_sample [J]"] = float(
+                    np.sum(batch_energy) / samples
+                )
+        return metrics
+
+
+@contextmanager
+def energy_profiler(device: str):
+    """
+    Provides an EnergyProfiler for a device with its idle power already measured. CPU devices with
+    RAPL counters use the counters, all other devices the shared power sampler, which is released
+    again when the context is left. Devices without any power source, or whose source can not
+    be started or gives no readings, get None.
+
+    Args:
+        device (str): The device name, e.g. `GPU:0`.
+    """
+    energy_counter = get_energy_counter(device)
+    sampler = None
+    if not energy_counter:
+        if not device.startswith(tuple(POWER_SOURCES)):
+            yield None
+            return
+        try:
+            sampler = acquire_power_sampler(device)
+        except PowerSourceUnavailableError as exc:
+            logger.warning(f"{exc}, the energy is not measured")
+            yield None
+            return
+    try:
+        if sampler and not sampler.wait_for_sample():
+            logger.warning(
+                f"No power readings for {device}, the energy is not measured"
+            )
+            yield None
+            return
+        profiler = EnergyProfiler(sampler, energy_counter)
+        profiler.measure_idle_power(IDLE_POWER_MEASUREMENT_DURATION)
+        yield profiler
+    finally:
+        if sampler:
+            release_power_sampler(device)
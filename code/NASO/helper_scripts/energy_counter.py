@@ -0,0 +1,102 @@
+import os
+import re
+
+from loguru import logger
+
+from naso.settings import RAPL_POWERCAP_ROOT
+
+# top level package domains, e.g. intel-rapl:0. Subdomains like intel-rapl:0:0 (core, uncore, dram)
+# are already contained in the package counter and would be counted twice.
+RAPL_PACKAGE_ZONE = re.compile(r"^intel-rapl:\d+$")
+
+
+class EnergyZone:
+    """
+    A single RAPL powercap zone with a cumulative energy counter in microjoules.
+
+    Args:
+        path (str): The sysfs directory of the zone, e.g. `/sys/class/powercap/intel-rapl:0`.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.max_energy_range = self._read_int("max_energy_range_uj")
+        self.last_value = self.read()
+
+    def _read_int(self, file_name: str) -> int:
+        with open(os.path.join(self.path, file_name), encoding="utf-8") as file:
+            return int(file.read().strip())
+
+    def read(self) -> int:
+        """
+        Returns the raw counter value in microjoules.
+        """
+        return self._read_int("energy_uj")
+
+    def consume(self) -> int:
+        """
+        Reads the counter and returns the energy in microjoules since the previous read.
+        The counter restarts at zero after `max_energy_range_uj`, a smaller value than the
+        previous one therefore means that it wrapped around once.
+        """
+        value = self.read()
+        delta = value - self.last_value
+        if delta < 0:
+            delta += self.max_energy_range + 1
+        self.last_value = value
+        return delta
+
+
+class RaplEnergyCounter:
+    """
+    Exact energy measurement from the cumulative RAPL energy counters of all CPU packages.
+    Reading the counters is a single file read per package, so no sampling loop is needed:
+    the energy of a phase is the difference of two readings.
+
+    The counters wrap around after `max_energy_range_uj`, which takes several minutes under
+    full load. Each call to `read` accounts for at most one wraparound per zone, so it must be
+    called more often than that, e.g. once per batch.
+
+    Args:
+        root (str): The powercap sysfs directory. Defaults to RAPL_POWERCAP_ROOT.
+    """
+
+    def __init__(self, root: str = None):
+        self.root = root or RAPL_POWERCAP_ROOT
+        self.zones = [
+            EnergyZone(os.path.join(self.root, name))
+            for name in sorted(os.listdir(self.root))
+            if RAPL_PACKAGE_ZONE.match(name)
+        ]
+        if not self.zones:
+            raise FileNotFoundError(f"No RAPL package zones found in {self.root}")
+        self._total = 0
+
+    def read(self) -> float:
+        """
+        Returns the energy in joules consumed by all packages since the counter was created.
+        The value is monotonic, so the energy of a phase is `read()` at its end minus `read()`
+        at its begin.
+        """
+        for zone in self.zones:
+            self._total += zone.consume()
+        return self._total / 1e6
+
+
+def get_energy_counter(device: str, root: str = None) -> RaplEnergyCounter | None:
+    """
+    Returns an energy counter for the device or None, if the device has no readable counters.
+    Only CPU devices are backed by RAPL.
+
+    Args:
+        device (str): The device name, e.g. `CPU:0`.
+        root (str): The powercap sysfs directory. Defaults to RAPL_POWERCAP_ROOT.
+    """
+    if not device.startswith("CPU"):
+        return None
+    try:
+        return RaplEnergyCounter(root)
+    except (OSError, ValueError) as exc:
+        logger.info(f"RAPL energy counters not available, falling back to power: {exc}")
+        return None
@@ -1,9 +1,17 @@
 import asyncio
+import time
 
 import keras
 import numpy as np
-
-from helper_scripts.power_management import get_cpu_power_usage, get_gpu_power_usage
+from loguru import logger
+
+from helper_scripts.power_sampler import (
+    PowerSourceUnavailableError,
+    acquire_power_sampler,
+    release_power_sampler,
+    wait_until_settled,
+)
+from helper_scripts.quantization import has_optimization_wrappers
 from neural_architecture.NetworkCallbacks.logging_callback import LoggingCallback
 from neural_architecture.NetworkCallbacks.timing_callback import TimingCallback
 from runs.models.training import Run, TrainingMetric
@@ -14,19 +22,48 @@ K = keras.backend
 def start_async_measuring(stop_event, run: Run, database_lock):
     task = asyncio.run(measure_power(stop_event, run))
     with database_lock:
-        run.power_measurements = ",".join([str(power) for power in task])
+        run.append_power_samples(task)
         run.save()
     return task
 
 
 async def measure_power(stop_event, run: Run):
+    """
+    Records the power readings of the run's device until the stop event is set.
+    The readings are collected every 2 seconds from the shared power sampler of the device,
+    so the run keeps all of them even if the sampler's ring buffer is smaller than the run.
+
+    Returns:
+        list[tuple[int, float]]: (unix timestamp in ns, watts) of every reading.
+    """
     power = []
-    while not stop_event.is_set():
-        if run.gpu.startswith("GPU"):
-            power.append(get_gpu_power_usage(run.gpu))
-        elif run.gpu.startswith("CPU"):
-            power.append(get_cpu_power_usage(run.gpu))
-        await asyncio.sleep(2)
+    if not run.gpu.startswith(("GPU", "CPU")):
+        return power
+    try:
+        sampler = acquire_power_sampler(run.gpu)
+    except PowerSourceUnavailableError as exc:
+        logger.warning(f"Power of run {run.id} is not recorded: {exc}")
+        return power
+    # the sampler uses the monotonic clock, the stored series unix timestamps
+    clock_offset = time.time_ns() - time.monotonic_ns()
+    try:
+        last_timestamp = time.monotonic()
+        while not stop_event.is_set():
+            await asyncio.sleep(2)
+            # get_samples includes both window bounds, skip the reading at last_timestamp
+            samples = [
+                sample
+                for sample in sampler.get_samples(last_timestamp)
+                if sample[0] > last_timestamp
+            ]
+            if samples:
+                last_timestamp = samples[-1][0]
+            power.extend(
+                (int(timestamp * 1e9) + clock_offset, value)
+                for timestamp, value in samples
+            )
+    finally:
+        release_power_sampler(run.gpu)
     return power
 
 
@@ -146,6 +183,7 @@ def custom_on_trial_end_decorator(original_on_trial_end, run, train_data, val_da
             [TimingCallback()] + run.model.get_callbacks(run) + [LoggingCallback()]
         )
 
+        settle_time = wait_until_settled(run.gpu)
         inference_model.evaluate(
             dataset,
             batch_size=batch_size,
@@ -159,6 +197,7 @@ def custom_on_trial_end_decorator(original_on_trial_end, run, train_data, val_da
         train_metrics = run.model.trial_model["metrics"][0]["metrics"]
 
         log_metrics = val_metrics
+        log_metrics["settle_time"] = settle_time
         for metric in train_metrics:
             if metric not in log_metrics:
                 log_metrics[metric] = train_metrics[metric]
@@ -263,6 +302,18 @@ def custom_hypermodel_build(original_build_fn, run):
                 model = run.model.clustering_options.build_clustered_model(
                     model, include_last_layer=False
                 )
+            if run.model.quantization_options:
+                if (
+                    run.model.quantization_options.use_quantization
+                    and has_optimization_wrappers(model)
+                ):
+                    logger.warning(
+                        "AutoKeras trials have no fine tuning stage, pruned or clustered "
+                        "models are not quantized"
+                    )
+                model = run.model.quantization_options.build_quantized_model(
+                    model, include_last_layer=False
+                )
             model.loss = loss
             model.optimizer = optimizer
             model.compile(optimizer, loss)
@@ -0,0 +1,347 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+
+from helper_scripts.dataset_cache import SPLITS
+from helper_scripts.sharded_dataset import (
+    ShardWriter,
+    element_spec_from_json,
+    element_spec_to_json,
+    read_shards,
+)
+
+# separators of the supported uploads by file extension
+SEPARATORS = {".csv": ",", ".tsv": "\t"}
+CHUNK_ROWS = 10000
+# fractions of the rows in the train, test and evaluation split
+SPLIT_FRACTIONS = (0.8, 0.1, 0.1)
+COMPRESSION = "GZIP"
+METADATA_FILE = "ingestion.json"
+# categorical columns with more distinct values, e.g. ids or free text, are no features
+MAX_CATEGORIES = 1000
+
+
+def read_chunks(path: str, chunk_rows: int = CHUNK_ROWS):
+    """
+    Reads a csv or tsv file in chunks of rows.
+
+    Yields:
+        tuple: The chunk as a DataFrame and the fraction of the file that is read.
+
+    Raises:
+        ValueError: If the file type is not supported or the file is empty.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in SEPARATORS:
+        raise ValueError(
+            f"Unsupported file type {extension}, supported are {', '.join(SEPARATORS)}"
+        )
+    size = os.path.getsize(path)
+    if size == 0:
+        raise ValueError("The uploaded file is empty")
+    with open(path, "rb") as file:
+        for chunk in pd.read_csv(file, sep=SEPARATORS[extension], chunksize=chunk_rows):
+            yield chunk, min(file.tell() / size, 1.0)
+
+
+def _merge_numeric_statistics(statistics: dict, values: np.ndarray) -> dict:
+    """
+    Adds the values of a chunk to the count, mean, sum of squared deviations, minimum and
+    maximum of a column, with the parallel update of Chan et al.
+    """
+    if len(values) == 0:
+        return statistics
+    count = statistics["count"] + len(values)
+    mean = float(values.mean())
+    delta = mean - statistics["mean"]
+    return {
+        **statistics,
+        "count": count,
+        "mean": statistics["mean"] + delta * len(values) / count,
+        "m2": statistics["m2"]
+        + float(((values - mean) ** 2).sum())
+        + delta**2 * statistics["count"] * len(values) / count,
+        "min": min(statistics["min"], float(values.min())),
+        "max": max(statistics["max"], float(values.max())),
+    }
+
+
+def infer_schema(path: str, label_column: str = "", progress=None) -> tuple:
+    """
+    Validates an upload and infers its schema in one pass over the file. Columns that are
+    numeric in the first chunk are numeric, all others categorical. Rows with missing values
+    are skipped. Categorical feature columns with more than MAX_CATEGORIES distinct values are
+    dropped and listed in `dropped_columns` of the schema.
+
+    Args:
+        path (str): The csv or tsv file.
+        label_column (str): The column of the labels, the last column if empty.
+        progress (callable): Is called with the fraction of the file that is read.
+
+    Returns:
+        tuple: The schema with the columns and the label, the statistics per column and the
+            number of rows.
+
+    Raises:
+        ValueError: If the upload is invalid, e.g. it has less than two columns, the label
+            column is missing or has more than MAX_CATEGORIES categories, a numeric column
+            holds other values or no feature column is left.
+    """
+    schema = None
+    statistics = {}
+    # the categories of every categorical column seen so far, dropped columns are removed
+    known = {}
+    dropped = []
+    rows = 0
+    for chunk, fraction in read_chunks(path):
+        if schema is None:
+            if len(chunk.columns) < 2:
+                raise ValueError(
+                    "The upload needs at least a feature and a label column"
+                )
+            label = label_column or chunk.columns[-1]
+            if label not in chunk.columns:
+                raise ValueError(f"The label column {label} is not in the upload")
+            schema = {
+                "columns": [
+                    {
+                        "name": column,
+                        "type": (
+                            "numeric"
+                            if pd.api.types.is_numeric_dtype(chunk[column])
+                            else "categorical"
+                        ),
+                    }
+                    for column in chunk.columns
+                ],
+                "label": label,
+            }
+            statistics = {
+                column["name"]: (
+                    {"count": 0, "mean": 0.0, "m2": 0.0, "min": np.inf, "max": -np.inf}
+                    if column["type"] == "numeric"
+                    else {"count": 0, "categories": []}
+                )
+                for column in schema["columns"]
+            }
+            for column in statistics.values():
+                column["missing"] = 0
+            known = {
+                column["name"]: set()
+                for column in schema["columns"]
+                if column["type"] == "categorical"
+            }
+        for column, missing in chunk.isna().sum().items():
+            statistics[column]["missing"] += int(missing)
+        chunk = chunk.dropna()
+        rows += len(chunk)
+        for column in schema["columns"]:
+            if column["name"] in dropped:
+                continue
+            values = chunk[column["name"]]
+            if column["type"] == "numeric":
+                try:
+                    values = pd.to_numeric(values).to_numpy(dtype=np.float64)
+                except (TypeError, ValueError) as error:
+                    raise ValueError(
+                        f"The numeric column {column['name']} holds other values: {error}"
+                    )
+                statistics[column["name"]] = _merge_numeric_statistics(
+                    statistics[column["name"]], values
+                )
+            else:
+                column_statistics = statistics[column["name"]]
+                column_statistics["count"] += len(values)
+                categories = known[column["name"]]
+                for category in pd.unique(values.astype(str)):
+                    if category not in categories:
+                        categories.add(category)
+                        column_statistics["categories"].append(category)
+                if len(categories) > MAX_CATEGORIES:
+                    if column["name"] == schema["label"]:
+                        raise ValueError(
+                            f"The label column {column['name']} has more than "
+                            f"{MAX_CATEGORIES} categories"
+                        )
+                    dropped.append(column["name"])
+                    del known[column["name"]]
+                    del statistics[column["name"]]
+        if progress:
+            progress(fraction)
+    if not rows:
+        raise ValueError("The upload has no complete rows")
+    if dropped:
+        schema["columns"] = [
+            column for column in schema["columns"] if column["name"] not in dropped
+        ]
+        schema["dropped_columns"] = dropped
+        if len(schema["columns"]) < 2:
+            raise ValueError(
+                f"No feature column is left, {', '.join(dropped)} have more than "
+                f"{MAX_CATEGORIES} categories"
+            )
+
+    for column in statistics.values():
+        if "m2" in column:
+            column["std"] = (column.pop("m2") / column["count"]) ** 0.5
+    return schema, statistics, rows
+
+
+def get_splits(rows: int) -> dict:
+    """
+    Returns the first and the last row after each split, see SPLIT_FRACTIONS.
+    """
+    train_end = int(rows * SPLIT_FRACTIONS[0])
+    test_end = int(rows * (SPLIT_FRACTIONS[0] + SPLIT_FRACTIONS[1]))
+    return {
+        "train": [0, train_end],
+        "test": [train_end, test_end],
+        "eval": [test_end, rows],
+    }
+
+
+def get_element_spec(schema: dict):
+    """
+    Returns the element spec of the converted upload, float32 features and float32 labels,
+    or int64 codes of categorical labels.
+    """
+    label = next(
+        column for column in schema["columns"] if column["name"] == schema["label"]
+    )
+    return (
+        tf.TensorSpec((len(schema["columns"]) - 1,), tf.float32),
+        tf.TensorSpec((), tf.float32 if label["type"] == "numeric" else tf.int64),
+    )
+
+
+def _encode(values: pd.Series, column: dict, statistics: dict) -> np.ndarray:
+    if column["type"] == "numeric":
+        return pd.to_numeric(values).to_numpy(dtype=np.float32)
+    codes = {
+        category: code
+        for code, category in enumerate(statistics[column["name"]]["categories"])
+    }
+    return values.astype(str).map(codes).to_numpy(dtype=np.int64)
+
+
+def convert(
+    path: str,
+    directory: str,
+    schema: dict,
+    statistics: dict,
+    splits: dict,
+    progress=None,
+):
+    """
+    Converts the rows of an upload into compressed TFRecord shards per split, categorical
+    columns are encoded by the order their categories appear in.
+    """
+    feature_columns = [
+        column for column in schema["columns"] if column["name"] != schema["label"]
+    ]
+    label_column = next(
+        column for column in schema["columns"] if column["name"] == schema["label"]
+    )
+    writers = {
+        split: ShardWriter(os.path.join(directory, split), compression=COMPRESSION)
+        for split in SPLITS
+    }
+    try:
+        row = 0
+        for chunk, fraction in read_chunks(path):
+            chunk = chunk.dropna()
+            features = np.stack(
+                [
+                    _encode(chunk[column["name"]], column, statistics).astype(
+                        np.float32
+                    )
+                    for column in feature_columns
+                ],
+                axis=1,
+            )
+            labels = _encode(chunk[label_column["name"]], label_column, statistics)
+            for split, (start, stop) in splits.items():
+                first, last = max(start - row, 0), min(stop - row, len(chunk))
+                if first < last:
+                    writers[split].write(
+                        tf.data.Dataset.from_tensor_slices(
+                            (features[first:last], labels[first:last])
+                        )
+                    )
+            row += len(chunk)
+            if progress:
+                progress(fraction)
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+
+def ingest(path: str, directory: str, label_column: str = "", progress=None) -> dict:
+    """
+    Validates an upload, infers its schema and statistics and converts it once into
+    compressed TFRecord shards of the train, test and evaluation split. The shards are
+    written into a temporary directory first and replace the directory when complete.
+
+    Args:
+        path (str): The uploaded csv or tsv file.
+        directory (str): The directory of the shards.
+        label_column (str): The column of the labels, the last column if empty.
+        progress (callable): Is called with the progress between 0 and 1, the first half is
+            the validation, the second the conversion.
+
+    Returns:
+        dict: The schema, statistics, number of rows, split boundaries and element spec, as
+            stored next to the shards.
+    """
+    schema, statistics, rows = infer_schema(
+        path,
+        label_column,
+        progress=(lambda fraction: progress(0.5 * fraction)) if progress else None,
+    )
+    splits = get_splits(rows)
+    temporary_directory = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(temporary_directory, ignore_errors=True)
+    convert(
+        path,
+        temporary_directory,
+        schema,
+        statistics,
+        splits,
+        progress=(lambda fraction: progress(0.5 + 0.5 * fraction))
+        if progress
+        else None,
+    )
+    metadata = {
+        "schema": schema,
+        "statistics": statistics,
+        "rows": rows,
+        "splits": splits,
+        "element_spec": element_spec_to_json(get_element_spec(schema)),
+        "compression": COMPRESSION,
+    }
+    with open(
+        os.path.join(temporary_directory, METADATA_FILE), "w", encoding="utf-8"
+    ) as file:
+        json.dump(metadata, file)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(temporary_directory, directory)
+    return metadata
+
+
+def read_ingested(directory: str) -> tuple:
+    """
+    Returns the train, test and evaluation datasets of an ingested upload.
+    """
+    with open(os.path.join(directory, METADATA_FILE), encoding="utf-8") as file:
+        metadata = json.load(file)
+    element_spec = element_spec_from_json(metadata["element_spec"])
+    return tuple(
+        read_shards(
+            os.path.join(directory, split), element_spec, metadata["compression"]
+        )
+        for split in SPLITS
+    )
@@ -0,0 +1,446 @@
+import bisect
+import shlex
+import subprocess
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from itertools import islice
+
+import numpy as np
+from decouple import UndefinedValueError, config
+from loguru import logger
+
+from naso.settings import (
+    POWER_SAMPLER_BUFFER_SIZE,
+    POWER_SAMPLING_INTERVAL,
+    SETTLE_TIMEOUT,
+    SETTLE_TOLERANCE,
+    SETTLE_WINDOW,
+)
+
+
+class PowerSourceUnavailableError(RuntimeError):
+    """
+    Raised if the power source of a device can not be started, e.g. the power tool is not
+    installed or not configured.
+    """
+
+
+class PowerSource(ABC):
+    """
+    A source of instantaneous power readings for a single device.
+
+    Sources are read by exactly one PowerSampler thread, so implementations do
+    not need to be thread safe. `read` may block until the next reading is
+    available; pull based sources can return immediately and rely on the
+    sampler to wait `poll_interval` seconds between two reads.
+    """
+
+    poll_interval = POWER_SAMPLING_INTERVAL
+
+    def open(self):
+        """
+        Acquires all resources the source needs, e.g. starts a subprocess.
+        """
+
+    @abstractmethod
+    def read(self) -> float | None:
+        """
+        Returns the current power draw in watts or None, if no reading is available.
+        """
+
+    def close(self):
+        """
+        Releases all resources acquired in `open`.
+        """
+
+
+class StreamingCommandPowerSource(PowerSource):
+    """
+    Starts a single long running command and parses one power value per line of its output.
+    Lines that are not a number (headers, empty lines) are skipped.
+
+    Args:
+        command (list[str]): The command to execute.
+    """
+
+    poll_interval = 0
+
+    def __init__(self, command: list[str]):
+        self.command = command
+        self._process = None
+
+    def open(self):
+        self._process = subprocess.Popen(
+            self.command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
+        )
+
+    def read(self) -> float | None:
+        if not self._process or not self._process.stdout:
+            return None
+        line = self._process.stdout.readline()
+        if not line:
+            # the command terminated, there will be no more readings
+            raise EOFError(f"Power command {self.command} terminated")
+        try:
+            return float(line.strip())
+        except ValueError:
+            return None
+
+    def close(self):
+        if self._process:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+            self._process = None
+
+
+class NvidiaSmiPowerSource(StreamingCommandPowerSource):
+    """
+    Reads the power draw of one GPU from a single `nvidia-smi` process running in loop mode.
+
+    Args:
+        device (str): The device name, e.g. `GPU:0`.
+    """
+
+    def __init__(self, device: str):
+        gpu_index = int(device.split(":")[-1])
+        super().__init__(
+            [
+                config("GPU_POWERTOOL_CMD"),
+                "-i",
+                str(gpu_index),
+                "--query-gpu=power.draw",
+                "--format=csv,noheader,nounits",
+                f"--loop-ms={max(int(POWER_SAMPLING_INTERVAL * 1000), 1)}",
+            ]
+        )
+
+
+class CpuPowerToolSource(StreamingCommandPowerSource):
+    """
+    Reads the CPU power from a long running power tool (turbostat by default).
+    The command is configured by CPU_POWERTOOL_STREAM_CMD and must print one value per line;
+    `{interval}` is replaced by the sampling interval in seconds.
+
+    Args:
+        device (str): The device name, e.g. `CPU:0`.
+    """
+
+    def __init__(self, device: str):
+        command = config(
+            "CPU_POWERTOOL_STREAM_CMD",
+            default="turbostat --show CorWatt --Summary --quiet --interval {interval}",
+        )
+        super().__init__(shlex.split(command.format(interval=POWER_SAMPLING_INTERVAL)))
+
+
+class FakePowerSource(PowerSource):
+    """
+    A power source without hardware, used for tests and development machines.
+
+    Args:
+        values (callable | list[float] | float): Either a function returning the next value,
+            a list of values that is cycled or one constant value.
+        poll_interval (float): Seconds between two readings.
+    """
+
+    def __init__(self, values=0.0, poll_interval=0.01):
+        self.poll_interval = poll_interval
+        if callable(values):
+            self._next_value = values
+        elif isinstance(values, (list, tuple)):
+            self._values = list(values)
+            self._index = 0
+            self._next_value = self._next_from_list
+        else:
+            self._next_value = lambda: float(values)
+
+    def _next_from_list(self):
+        value = self._values[self._index % len(self._values)]
+        self._index += 1
+        return value
+
+    def read(self) -> float | None:
+        return self._next_value()
+
+
+class PowerSampler:
+    """
+    Continuously reads a PowerSource in a background thread and keeps the readings in a
+    timestamped ring buffer. All timestamps are taken from `time.monotonic()`, so callers
+    query windows with the same clock.
+
+    Args:
+        device (str): The device name, e.g. `GPU:0` or `CPU:0`.
+        source (PowerSource): The source the readings come from.
+        buffer_size (int): The maximum number of readings kept in memory.
+    """
+
+    def __init__(
+        self, device: str, source: PowerSource, buffer_size=POWER_SAMPLER_BUFFER_SIZE
+    ):
+        self.device = device
+        self.source = source
+        self._buffer = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._references = 0
+        # power of the idle device in watts, set once it was measured
+        self.idle_power = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """
+        Starts the sampling thread, if it is not running yet.
+        """
+        if self.is_running:
+            return
+        self._stop_event.clear()
+        self.source.open()
+        self._thread = threading.Thread(
+            target=self._sample, name=f"power-sampler-{self.device}", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the sampling thread and closes the source.
+        """
+        self._stop_event.set()
+        # close first, streaming sources may be blocked in readline
+        self.source.close()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop_event.is_set():
+            try:
+                value = self.source.read()
+            except EOFError as exc:
+                logger.warning(f"Stopped sampling power of {self.device}: {exc}")
+                return
+            except Exception as exc:
+                logger.error(f"Reading power of {self.device} failed: {exc}")
+                self._stop_event.wait(POWER_SAMPLING_INTERVAL)
+                continue
+            if value is not None:
+                self.append(time.monotonic(), value)
+            if self.source.poll_interval:
+                self._stop_event.wait(self.source.poll_interval)
+
+    def append(self, timestamp: float, value: float):
+        with self._lock:
+            self._buffer.append((timestamp, float(value)))
+
+    def get_samples(self, start: float = None, end: float = None) -> list[tuple]:
+        """
+        Returns all readings in the window [start, end] as (timestamp, watts) tuples.
+
+        Args:
+            start (float): Begin of the window in `time.monotonic()` seconds, None for no limit.
+            end (float): End of the window in `time.monotonic()` seconds, None for no limit.
+        """
+        with self._lock:
+            # readings are appended in time order, so the window can be found by bisection
+            lower = 0
+            upper = len(self._buffer)
+            if start is not None:
+                lower = bisect.bisect_left(self._buffer, start, key=lambda s: s[0])
+            if end is not None:
+                upper = bisect.bisect_right(self._buffer, end, key=lambda s: s[0])
+            return list(islice(self._buffer, lower, upper))
+
+    def get_measurements(self, start: float = None, end: float = None) -> list[float]:
+        """
+        Returns the power readings in watts of the window [start, end].
+        If there is no reading inside the window, the latest reading before `end` is returned,
+        so short windows still get a value.
+        """
+        measurements = [value for _, value in self.get_samples(start, end)]
+        if not measurements:
+            latest = self.get_latest(end)
+            if latest is not None:
+                measurements = [latest]
+        return measurements
+
+    def get_latest(self, before: float = None) -> float | None:
+        """
+        Returns the latest reading, optionally the latest one not after `before`.
+        """
+        with self._lock:
+            for timestamp, value in reversed(self._buffer):
+                if before is None or timestamp <= before:
+                    return value
+        return None
+
+    def average_power(self, start: float = None, end: float = None) -> float:
+        """
+        Returns the average power in watts between start and end, NaN if there is no reading.
+        """
+        measurements = self.get_measurements(start, end)
+        if not measurements:
+            return float("nan")
+        return float(np.mean(measurements))
+
+    def is_settled(
+        self, window: float, tolerance: float, baseline: float = None
+    ) -> bool:
+        """
+        Checks whether the readings of the last `window` seconds are settled. With a baseline all
+        readings must be within `tolerance` (relative) of it, otherwise the readings must not
+        spread more than `tolerance` of their mean.
+        """
+        now = time.monotonic()
+        measurements = [value for _, value in self.get_samples(now - window, now)]
+        if not measurements:
+            return False
+        if baseline is not None:
+            return all(
+                abs(value - baseline) <= tolerance * abs(baseline)
+                for value in measurements
+            )
+        mean = np.mean(measurements)
+        return max(measurements) - min(measurements) <= tolerance * abs(mean)
+
+    def wait_until_settled(
+        self,
+        window: float = SETTLE_WINDOW,
+        tolerance: float = SETTLE_TOLERANCE,
+        timeout: float = SETTLE_TIMEOUT,
+    ) -> float:
+        """
+        Blocks until the power of the device settled, e.g. after a training, so that following
+        measurements are not biased by the previous load. The idle power is used as baseline,
+        if it is known.
+
+        Args:
+            window (float): Seconds the readings have to stay settled.
+            tolerance (float): Allowed relative deviation.
+            timeout (float): Maximum seconds to wait.
+
+        Returns:
+            float: The seconds it took to settle, `timeout` if it did not settle.
+        """
+        start = time.monotonic()
+        if not self.wait_for_sample(min(timeout, 2.0)):
+            return time.monotonic() - start
+        # the window has to be filled with readings taken after the start
+        time.sleep(min(window, timeout))
+        while time.monotonic() - start < timeout:
+            if self.is_settled(window, tolerance, self.idle_power):
+                break
+            time.sleep(max(self.source.poll_interval, 0.01))
+        return time.monotonic() - start
+
+    def wait_for_sample(self, timeout: float = 2.0) -> bool:
+        """
+        Blocks until the buffer contains at least one reading or the timeout is reached.
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if self._buffer:
+                    return True
+            time.sleep(0.005)
+        return False
+
+
+POWER_SOURCES = {"GPU": NvidiaSmiPowerSource, "CPU": CpuPowerToolSource}
+
+_samplers: dict[str, PowerSampler] = {}
+_samplers_lock = threading.Lock()
+
+
+def get_power_source(device: str) -> PowerSource:
+    """
+    Builds the power source for a device name like `GPU:0` from the POWER_SOURCES registry.
+    Setting POWER_SOURCE=fake in the environment replaces all hardware sources by a FakePowerSource.
+    """
+    if config("POWER_SOURCE", default="") == "fake":
+        return FakePowerSource(poll_interval=POWER_SAMPLING_INTERVAL)
+    for prefix, source_class in POWER_SOURCES.items():
+        if device.startswith(prefix):
+            return source_class(device)
+    raise ValueError(f"No power source available for device {device}")
+
+
+def acquire_power_sampler(device: str, source: PowerSource = None) -> PowerSampler:
+    """
+    Returns the running sampler for a device and registers one more user of it.
+    All runs in this process that measure the same device share one sampler.
+    Every call must be paired with `release_power_sampler`.
+
+    Args:
+        device (str): The device name, e.g. `GPU:0`.
+        source (PowerSource): Source used if the sampler has to be created. Defaults to `get_power_source`.
+
+    Raises:
+        PowerSourceUnavailableError: If the source of the device can not be started. No
+            sampler is registered then.
+    """
+    with _samplers_lock:
+        sampler = _samplers.get(device)
+        try:
+            if sampler is None:
+                sampler = PowerSampler(device, source or get_power_source(device))
+            sampler.start()
+        except (OSError, ValueError, UndefinedValueError) as exc:
+            raise PowerSourceUnavailableError(
+                f"No power source for {device}: {exc}"
+            ) from exc
+        _samplers[device] = sampler
+        sampler._references += 1
+        return sampler
+
+
+def release_power_sampler(device: str):
+    """
+    Unregisters one user of the sampler of a device and stops it after the last user left.
+    """
+    with _samplers_lock:
+        sampler = _samplers.get(device)
+        if sampler is None:
+            return
+        sampler._references -= 1
+        if sampler._references <= 0:
+            sampler.stop()
+            del _samplers[device]
+
+
+def wait_until_settled(device: str) -> float:
+    """
+    Waits until the power of a device settled, see `PowerSampler.wait_until_settled`.
+    Devices without power source do not wait, devices whose source can not be started wait
+    SETTLE_WINDOW seconds.
+
+    Args:
+        device (str): The device name, e.g. `GPU:0`.
+
+    Returns:
+        float: The seconds it took to settle.
+    """
+    if not device.startswith(tuple(POWER_SOURCES)):
+        return 0.0
+    try:
+        sampler = acquire_power_sampler(device)
+    except PowerSourceUnavailableError as exc:
+        logger.warning(f"{exc}, waiting {SETTLE_WINDOW} s instead of settling")
+        time.sleep(SETTLE_WINDOW)
+        return SETTLE_WINDOW
+    try:
+        return sampler.wait_until_settled()
+    finally:
+        release_power_sampler(device)
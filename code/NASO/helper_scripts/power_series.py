@@ -0,0 +1,102 @@
+import numpy as np
+
+# one record per power reading: unix timestamp in nanoseconds and the power in watts
+POWER_SAMPLE_DTYPE = np.dtype([("time", "<i8"), ("power", "<f4")])
+POWER_PERCENTILES = [50, 90, 99]
+
+
+def pack_power_samples(samples) -> bytes:
+    """
+    Packs (timestamp_ns, watts) tuples into the binary power series format.
+
+    Args:
+        samples (list[tuple[int, float]] | np.ndarray): The readings, sorted by time.
+
+    Returns:
+        bytes: The packed records, 12 bytes per reading.
+    """
+    return np.asarray(
+        [tuple(sample) for sample in samples], dtype=POWER_SAMPLE_DTYPE
+    ).tobytes()
+
+
+def unpack_power_samples(data) -> np.ndarray:
+    """
+    Returns the readings of a packed power series as structured array with the fields `time` and `power`.
+    The array is a read only view on the data, nothing is copied.
+    """
+    if not data:
+        return np.empty(0, dtype=POWER_SAMPLE_DTYPE)
+    return np.frombuffer(bytes(data), dtype=POWER_SAMPLE_DTYPE)
+
+
+def update_power_statistics(statistics: dict, new_power, power) -> dict:
+    """
+    Updates the aggregates of a power series after new readings were appended.
+    Count, sum, min and max only depend on the new readings, the percentiles are taken over
+    the whole series.
+
+    Args:
+        statistics (dict): The aggregates before the new readings were appended.
+        new_power (np.ndarray): The appended readings in watts.
+        power (np.ndarray): All readings of the series in watts, including the new ones.
+
+    Returns:
+        dict: The updated aggregates.
+    """
+    if len(new_power) == 0:
+        return statistics
+    count = statistics.get("count", 0)
+    statistics = {
+        "count": count + len(new_power),
+        "sum": statistics.get("sum", 0.0) + float(np.sum(new_power, dtype=np.float64)),
+        "min": float(min(np.min(new_power), statistics.get("min", np.inf))),
+        "max": float(max(np.max(new_power), statistics.get("max", -np.inf))),
+    }
+    for percentile, value in zip(
+        POWER_PERCENTILES, np.percentile(power, POWER_PERCENTILES)
+    ):
+        statistics[f"p{percentile}"] = float(value)
+    return statistics
+
+
+def downsample_power_samples(
+    samples: np.ndarray, start: float = None, end: float = None, points: int = 500
+) -> dict:
+    """
+    Reduces the readings inside a time window to at most `points` buckets of equal duration,
+    so charts of long runs do not have to load every reading.
+
+    Args:
+        samples (np.ndarray): The readings as returned by `unpack_power_samples`.
+        start (float): Begin of the window in seconds after the first reading, None for the beginning.
+        end (float): End of the window in seconds after the first reading, None for the end.
+        points (int): The maximum number of buckets.
+
+    Returns:
+        dict: Lists `time` (bucket begin in seconds after the first reading), `power` (mean),
+            `min` and `max` of all non empty buckets.
+    """
+    result = {"time": [], "power": [], "min": [], "max": []}
+    if len(samples) == 0 or points <= 0:
+        return result
+    origin = samples["time"][0]
+    times = (samples["time"] - origin) / 1e9
+    lower = 0 if start is None else np.searchsorted(times, start, side="left")
+    upper = len(times) if end is None else np.searchsorted(times, end, side="right")
+    times = times[lower:upper]
+    power = samples["power"][lower:upper].astype(np.float64)
+    if len(times) == 0:
+        return result
+
+    if len(times) <= points:
+        bucket_starts = np.arange(len(times))
+    else:
+        edges = np.linspace(times[0], times[-1], points + 1)[:-1]
+        bucket_starts = np.unique(np.searchsorted(times, edges, side="left"))
+    counts = np.diff(np.append(bucket_starts, len(times)))
+    result["time"] = times[bucket_starts].tolist()
+    result["power"] = (np.add.reduceat(power, bucket_starts) / counts).tolist()
+    result["min"] = np.minimum.reduceat(power, bucket_starts).tolist()
+    result["max"] = np.maximum.reduceat(power, bucket_starts).tolist()
+    return result
@@ -13,43 +13,113 @@ from plugins.interfaces.pruning_method import PruningInterface
 K = keras.backend
 
 
-def calculate_sparsity(model):
-    trainable_count = int(np.sum([K.count_params(p) for p in model.trainable_weights]))
-    params = []
-
-    tfmot_prunable_layers = pruning_wrapper.collect_prunable_layers(model)
-    other_prunable_layers = collect_prunable_layers(model)
-
-    for layer in tfmot_prunable_layers:
-        for _, mask, _ in layer.pruning_vars:
-            params.append(mask)
-
-    params.append(model.optimizer.iterations)
-
-    values = K.batch_get_value(params)
-    del values[-1]
-    del params[-1]
-
-    sparsity_values = []
-    if len(values[::2]) > 0:
-        sparsity_values = [
-            (1 - np.mean(mask_value))
-            * np.count_nonzero(np.isnan(mask_value))
-            / trainable_count
-            for mask_value in values[::2]
-        ]
+class PruningBookkeeping:
+    """
+    The end of epoch bookkeeping of a pruned model. Applying the masks of the plugin layers and
+    reducing the masks of the tfmot layers to their sparsity is compiled into one tf.function
+    that runs on the training device, so only one scalar per layer is copied to the host instead
+    of every mask.
+
+    The mask updates of plugin layers stay in Python, they decide on the host what to prune,
+    e.g. by comparing filters with NumPy, and count epochs in Python attributes.
+
+    Args:
+        model (keras.Model): The model with pruning wrappers.
+    """
 
-    for layer in other_prunable_layers:
-        if layer not in tfmot_prunable_layers:
-            sparsity_values.append(
-                layer.sparsity * layer.count_params() / trainable_count
+    def __init__(self, model):
+        self.plugin_layers = collect_prunable_layers(model)
+        # tfmot also wraps layers without weights, e.g. Flatten or pooling, they have no masks
+        self.tfmot_layers = [
+            layer
+            for layer in pruning_wrapper.collect_prunable_layers(model)
+            if layer.pruning_vars
+        ]
+        self.trainable_count = int(
+            np.sum([K.count_params(p) for p in model.trainable_weights])
+        )
+        self._mask_sizes = [
+            sum(int(np.prod(mask.shape)) for _, mask, _ in layer.pruning_vars)
+            for layer in self.tfmot_layers
+        ]
+        self._apply_masks_and_reduce = tf.function(self._masks_and_sparsities)
+
+    def _masks_and_sparsities(self):
+        for layer in self.plugin_layers:
+            layer.weight_mask_op()
+        sparsities = [
+            1
+            - tf.add_n(
+                [
+                    tf.reduce_sum(tf.cast(mask, tf.float32))
+                    for _, mask, _ in layer.pruning_vars
+                ]
             )
-    return np.sum(sparsity_values)
+            / size
+            for layer, size in zip(self.tfmot_layers, self._mask_sizes)
+        ]
+        return tf.stack(sparsities) if sparsities else tf.zeros([0])
+
+    def layer_sparsities(self, update_masks: bool = True) -> dict:
+        """
+        Updates and applies the masks and returns the fraction of pruned weights of every
+        prunable layer.
+
+        Args:
+            update_masks (bool): Whether the plugin layers update their masks before they are
+                applied, e.g. not after the last epoch.
+
+        Returns:
+            dict: The sparsity by layer name.
+        """
+        if not self.plugin_layers and not self.tfmot_layers:
+            return {}
+        if update_masks:
+            for layer in self.plugin_layers:
+                layer.conditional_mask_update()
+        sparsities = dict(
+            zip(
+                [layer.name for layer in self.tfmot_layers],
+                self._apply_masks_and_reduce().numpy().tolist(),
+            )
+        )
+        for layer in self.plugin_layers:
+            sparsities[layer.name] = float(layer.sparsity)
+        return sparsities
+
+    def update(self, update_masks: bool = True) -> float:
+        """
+        Updates and applies the masks like `layer_sparsities` and returns the fraction of pruned
+        weights of the whole model.
+        """
+        return self.model_sparsity(self.layer_sparsities(update_masks))
+
+    def model_sparsity(self, sparsities: dict) -> float:
+        """
+        Returns the fraction of pruned weights of the whole model for the sparsities of the
+        layers returned by `layer_sparsities`.
+        """
+        if not sparsities or self.trainable_count == 0:
+            return 0.0
+        pruned = sum(
+            sparsities[layer.name] * size
+            for layer, size in zip(self.tfmot_layers, self._mask_sizes)
+        ) + sum(
+            sparsities[layer.name] * layer.count_params()
+            for layer in self.plugin_layers
+        )
+        return float(pruned / self.trainable_count)
 
 
 def collect_prunable_layers(model) -> list[PruningInterface]:
+    """
+    Returns the plugin pruning layers of the model and of the models nested in it, e.g. the
+    student of a Distiller, like `pruning_wrapper.collect_prunable_layers` does for tfmot.
+    """
     prunable_layers = []
     for layer in model.layers:
+        if isinstance(layer, keras.Model):
+            prunable_layers += collect_prunable_layers(layer)
         if issubclass(layer.__class__, PruningInterface):
             prunable_layers.append(layer)
     return prunable_layers
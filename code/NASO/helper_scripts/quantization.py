@@ -0,0 +1,127 @@
+import keras
+import tensorflow_model_optimization as tfmot
+from tensorflow_model_optimization.python.core.clustering.keras.cluster_wrapper import (
+    ClusterWeights,
+)
+from tensorflow_model_optimization.python.core.quantization.keras.default_8bit.default_8bit_quantize_registry import (
+    Default8BitQuantizeRegistry,
+)
+from tensorflow_model_optimization.python.core.quantization.keras.quantize_layer import (
+    QuantizeLayer,
+)
+from tensorflow_model_optimization.python.core.quantization.keras.quantize_wrapper import (
+    QuantizeWrapper,
+)
+from tensorflow_model_optimization.python.core.sparsity.keras.pruning_wrapper import (
+    PruneLowMagnitude,
+)
+
+from helper_scripts.pruning import collect_prunable_layers
+from inference.helper_scripts.tflite import convert_to_tflite
+
+# suffix of the int8 TFLite model next to the keras file of a quantization aware trained model
+INT8_EXTENSION = "_int8.tflite"
+
+
+def has_optimization_wrappers(model) -> bool:
+    """
+    Returns whether a model contains pruning or clustering wrappers. Quantization aware training
+    can not wrap these, such models are quantized after training instead.
+    """
+    return bool(collect_prunable_layers(model)) or any(
+        isinstance(layer, (PruneLowMagnitude, ClusterWeights)) for layer in model.layers
+    )
+
+
+def is_quantized_model(model) -> bool:
+    return any(
+        isinstance(layer, (QuantizeWrapper, QuantizeLayer)) for layer in model.layers
+    )
+
+
+def get_quantize_scheme(pruned: bool = False, clustered: bool = False):
+    """
+    Returns the scheme of the quantization aware training that keeps the sparsity of a pruned
+    model and the centroids of a clustered one, as in the collaborative optimization of the
+    tensorflow model optimization toolkit.
+    """
+    if clustered:
+        return tfmot.experimental.combine.Default8BitClusterPreserveQuantizeScheme(
+            preserve_sparsity=pruned
+        )
+    if pruned:
+        return tfmot.experimental.combine.Default8BitPrunePreserveQuantizeScheme()
+    return tfmot.quantization.keras.default_8bit.Default8BitQuantizeScheme()
+
+
+def quantize_model(model, include_last_layer=True, scheme=None):
+    """
+    Wraps all layers of a model that support 8 bit quantization for quantization aware training.
+    Unsupported layers, e.g. normalization layers or custom layers, stay in float.
+
+    Args:
+        model (keras.Model): A functional or sequential model without optimization wrappers.
+        include_last_layer (bool): Whether the output layer is quantized as well.
+        scheme: The quantize scheme, see `get_quantize_scheme`.
+
+    Returns:
+        keras.Model: The model for quantization aware training, it has to be compiled.
+    """
+    registry = Default8BitQuantizeRegistry()
+    last_layer = model.layers[-1]
+
+    def annotate(layer):
+        if registry.supports(layer) and (include_last_layer or layer is not last_layer):
+            return tfmot.quantization.keras.quantize_annotate_layer(layer)
+        return layer
+
+    annotated_model = keras.models.clone_model(model, clone_function=annotate)
+    with tfmot.quantization.keras.quantize_scope():
+        return tfmot.quantization.keras.quantize_apply(
+            annotated_model, scheme or get_quantize_scheme()
+        )
+
+
+def strip_quantization(model):
+    """
+    Returns the float model of a quantization aware trained model, with the trained weights and
+    without the fake quantization, so that it can be saved and loaded as a plain Keras model.
+    """
+    if not is_quantized_model(model):
+        return model
+    # the wrapper holds the kernel of its layer, so weights are matched by variable name
+    weights = {weight.name: weight for weight in model.weights}
+
+    def strip(layer):
+        if isinstance(layer, QuantizeLayer):
+            return keras.layers.Identity(name=layer.name)
+        if isinstance(layer, QuantizeWrapper):
+            inner_layer = layer.layer
+            config = inner_layer.get_config()
+            activation = config.get("activation")
+            # the wrapper replaces activations by their quantize aware version
+            if isinstance(activation, dict) and activation.get("class_name") == (
+                "QuantizeAwareActivation"
+            ):
+                config["activation"] = activation["config"]["activation"]
+            return inner_layer.__class__.from_config(config)
+        return layer.__class__.from_config(layer.get_config())
+
+    stripped_model = keras.models.clone_model(model, clone_function=strip)
+    for weight in stripped_model.weights:
+        weight.assign(weights[weight.name])
+    return stripped_model
+
+
+def export_int8_model(model, file_path: str) -> int:
+    """
+    Converts a quantization aware trained model into an int8 TFLite model. The converter takes
+    the quantization ranges learned in training, so no calibration data is needed.
+
+    Returns:
+        int: The size of the file in bytes.
+    """
+    content = convert_to_tflite(model, "dynamic_int8")
+    with open(file_path, "wb") as file:
+        file.write(content)
+    return len(content)
@@ -0,0 +1,160 @@
+import os
+
+import tensorflow as tf
+
+from naso.settings import DATASET_SHARDS
+
+
+def element_spec_to_json(element_spec):
+    """
+    Encodes a (nested) element spec of dense tensors as JSON, e.g. for the metadata of the shards.
+    """
+    if isinstance(element_spec, tf.TensorSpec):
+        return {"shape": element_spec.shape.as_list(), "dtype": element_spec.dtype.name}
+    if isinstance(element_spec, dict):
+        return {
+            "dict": {
+                key: element_spec_to_json(value) for key, value in element_spec.items()
+            }
+        }
+    if isinstance(element_spec, (tuple, list)):
+        return {"tuple": [element_spec_to_json(value) for value in element_spec]}
+    raise ValueError(f"Only dense tensors can be stored in shards, not {element_spec}")
+
+
+def element_spec_from_json(description):
+    if "dict" in description:
+        return {
+            key: element_spec_from_json(value)
+            for key, value in description["dict"].items()
+        }
+    if "tuple" in description:
+        return tuple(element_spec_from_json(value) for value in description["tuple"])
+    return tf.TensorSpec(description["shape"], tf.as_dtype(description["dtype"]))
+
+
+def _serialize(*element):
+    return tf.io.serialize_tensor(
+        tf.stack(
+            [
+                tf.io.serialize_tensor(component)
+                for component in tf.nest.flatten(element)
+            ]
+        )
+    )
+
+
+class ShardWriter:
+    """
+    Writes the elements of datasets round robin into TFRecord shards, so they are serialized
+    and written one at a time and no dataset has to fit in memory. Reading the shards
+    interleaved with a block length of one restores the order they were written in.
+
+    Args:
+        directory (str): The directory of the shards.
+        shards (int): Number of shard files.
+        compression (str): Compression of the records, e.g. `GZIP`, None for uncompressed.
+    """
+
+    def __init__(
+        self, directory: str, shards: int = DATASET_SHARDS, compression: str = None
+    ):
+        os.makedirs(directory, exist_ok=True)
+        options = tf.io.TFRecordOptions(compression_type=compression or "")
+        self.writers = [
+            tf.io.TFRecordWriter(
+                os.path.join(directory, f"{index:05d}.tfrecord"), options
+            )
+            for index in range(shards)
+        ]
+        self.count = 0
+
+    def write(self, dataset: tf.data.Dataset):
+        """
+        Appends the elements of an unbatched dataset of dense tensors.
+        """
+        for record in dataset.map(_serialize).as_numpy_iterator():
+            self.writers[self.count % len(self.writers)].write(record)
+            self.count += 1
+
+    def close(self):
+        for writer in self.writers:
+            writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def write_shards(
+    directory: str,
+    dataset: tf.data.Dataset,
+    shards: int = DATASET_SHARDS,
+    compression: str = None,
+) -> int:
+    """
+    Writes the elements of a dataset into TFRecord shards, see `ShardWriter`.
+
+    Returns:
+        int: The number of elements.
+    """
+    with ShardWriter(directory, shards, compression) as writer:
+        writer.write(dataset)
+    return writer.count
+
+
+def read_shards(
+    directory: str, element_spec, compression: str = None
+) -> tf.data.Dataset:
+    """
+    Reads the shards of a `ShardWriter` in parallel, in the order they were written.
+
+    Args:
+        directory (str): The directory of the shards.
+        element_spec: The declared element spec of the dataset.
+        compression (str): The compression the shards were written with.
+
+    Returns:
+        tf.data.Dataset: The unbatched dataset.
+    """
+    files = sorted(
+        os.path.join(directory, file)
+        for file in os.listdir(directory)
+        if file.endswith(".tfrecord")
+    )
+    specs = tf.nest.flatten(element_spec)
+
+    def parse(record):
+        components = tf.io.parse_tensor(record, tf.string)
+        return tf.nest.pack_sequence_as(
+            element_spec,
+            [
+                tf.ensure_shape(
+                    tf.io.parse_tensor(components[index], spec.dtype), spec.shape
+                )
+                for index, spec in enumerate(specs)
+            ],
+        )
+
+    return (
+        tf.data.Dataset.from_tensor_slices(files)
+        .interleave(
+            lambda file: tf.data.TFRecordDataset(
+                file, compression_type=compression or ""
+            ),
+            cycle_length=len(files),
+            block_length=1,
+            num_parallel_calls=tf.data.AUTOTUNE,
+            deterministic=True,
+        )
+        .map(parse, num_parallel_calls=tf.data.AUTOTUNE)
+    )
+
+
+def generator_dataset(generate, element_spec) -> tf.data.Dataset:
+    """
+    Wraps a generator function of a streaming loader into a dataset with its declared spec.
+    """
+    return tf.data.Dataset.from_generator(generate, output_signature=element_spec)
@@ -0,0 +1,294 @@
+import keras
+import numpy as np
+import tensorflow as tf
+from loguru import logger
+
+from helper_scripts.compaction import outputs_match
+from inference.helper_scripts.benchmark import LatencyBenchmark
+
+# sparsities at which the sparse matmul is compared against the dense one
+CROSSOVER_SPARSITIES = [0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.98, 0.99]
+
+_crossovers = {}
+
+
+@keras.saving.register_keras_serializable(package="naso")
+class SparseDense(keras.layers.Layer):
+    """
+    A Dense layer whose kernel only stores its nonzero weights. The transposed kernel is kept in
+    row major order, i.e. the layout of a CSR matrix with one row per unit, as indices and values
+    of a `tf.SparseTensor`, so the layer runs a sparse-dense matmul whose work scales with the
+    number of nonzero weights instead of the size of the kernel.
+
+    Args:
+        units (int): Number of output units.
+        nonzeros (int): Number of nonzero weights of the kernel.
+        activation: Activation function, as for Dense.
+        use_bias (bool): Whether the layer has a bias.
+    """
+
+    def __init__(self, units, nonzeros, activation=None, use_bias=True, **kwargs):
+        super().__init__(**kwargs)
+        self.units = int(units)
+        self.nonzeros = int(nonzeros)
+        self.activation = keras.activations.get(activation)
+        self.use_bias = use_bias
+
+    def build(self, input_shape):
+        self.input_dim = int(input_shape[-1])
+        self.kernel_indices = self.add_weight(
+            name="kernel_indices",
+            shape=(self.nonzeros, 2),
+            dtype=tf.int64,
+            initializer="zeros",
+            trainable=False,
+        )
+        self.kernel_values = self.add_weight(
+            name="kernel_values",
+            shape=(self.nonzeros,),
+            initializer="zeros",
+            trainable=False,
+        )
+        if self.use_bias:
+            self.bias = self.add_weight(
+                name="bias", shape=(self.units,), initializer="zeros", trainable=False
+            )
+        super().build(input_shape)
+
+    def call(self, inputs):
+        kernel = tf.SparseTensor(
+            self.kernel_indices, self.kernel_values, (self.units, self.input_dim)
+        )
+        flat_inputs = tf.reshape(
+            tf.cast(inputs, self.kernel_values.dtype), [-1, self.input_dim]
+        )
+        outputs = tf.transpose(
+            tf.sparse.sparse_dense_matmul(kernel, flat_inputs, adjoint_b=True)
+        )
+        if self.use_bias:
+            outputs = tf.nn.bias_add(outputs, self.bias)
+        outputs = tf.reshape(
+            outputs, tf.concat([tf.shape(inputs)[:-1], [self.units]], axis=0)
+        )
+        return self.activation(outputs)
+
+    def compute_output_shape(self, input_shape):
+        return tf.TensorShape(input_shape)[:-1].concatenate([self.units])
+
+    def get_config(self):
+        return {
+            **super().get_config(),
+            "units": self.units,
+            "nonzeros": self.nonzeros,
+            "activation": keras.activations.serialize(self.activation),
+            "use_bias": self.use_bias,
+        }
+
+    @staticmethod
+    def sparse_weights(kernel: np.ndarray, bias: np.ndarray = None) -> list:
+        """
+        Returns the weights of the layer for a dense kernel of shape (input_dim, units).
+        """
+        indices = np.argwhere(kernel.T != 0).astype(np.int64)
+        weights = [indices, kernel.T[indices[:, 0], indices[:, 1]]]
+        return weights + ([bias] if bias is not None else [])
+
+    def dense_kernel(self) -> np.ndarray:
+        kernel = np.zeros(
+            (self.units, self.input_dim), dtype=self.kernel_values.dtype.as_numpy_dtype
+        )
+        indices = self.kernel_indices.numpy()
+        kernel[indices[:, 0], indices[:, 1]] = self.kernel_values.numpy()
+        return kernel.T
+
+
+def layer_sparsity(layer) -> float:
+    """
+    Returns the fraction of zero weights of the kernel of a Dense layer.
+    """
+    return float(
+        1 - np.count_nonzero(layer.kernel.numpy()) / np.prod(layer.kernel.shape)
+    )
+
+
+def _median_latency(step, **benchmark_options) -> float:
+    return LatencyBenchmark(step, **benchmark_options).run()["metrics"][
+        "latency_p50 [ms]"
+    ]
+
+
+def measure_crossover(
+    input_dim: int, units: int, batch_size: int = 1, **benchmark_options
+) -> float | None:
+    """
+    Measures from which sparsity a sparse-dense matmul of random weights is faster than the
+    dense matmul for a kernel of the given shape. The result is memoised per shape and batch size
+    for the lifetime of the process.
+
+    Args:
+        input_dim (int): Number of inputs of the layer.
+        units (int): Number of units of the layer.
+        batch_size (int): Number of rows of the inputs.
+        **benchmark_options: Arguments of the LatencyBenchmark.
+
+    Returns:
+        float: The lowest sparsity of CROSSOVER_SPARSITIES at which the sparse matmul is faster,
+            None if it is never faster.
+    """
+    key = (input_dim, units, batch_size)
+    if key in _crossovers:
+        return _crossovers[key]
+    benchmark_options = {
+        "warmup": 3,
+        "iterations": 20,
+        "trials": 1,
+        **benchmark_options,
+    }
+    rng = np.random.default_rng(0)
+    inputs = tf.constant(rng.standard_normal((batch_size, input_dim)), tf.float32)
+    kernel = rng.standard_normal((input_dim, units)).astype(np.float32)
+
+    dense_matmul = tf.function(lambda kernel: tf.matmul(inputs, kernel))
+    dense_kernel = tf.constant(kernel)
+    dense_latency = _median_latency(
+        lambda: dense_matmul(dense_kernel).numpy(), **benchmark_options
+    )
+
+    sparse_matmul = tf.function(
+        lambda kernel: tf.transpose(
+            tf.sparse.sparse_dense_matmul(kernel, inputs, adjoint_b=True)
+        )
+    )
+    crossover = None
+    for sparsity in CROSSOVER_SPARSITIES:
+        pruned = np.where(rng.random(kernel.shape) < sparsity, 0, kernel)
+        indices, values = SparseDense.sparse_weights(pruned)
+        sparse_kernel = tf.SparseTensor(indices, values, (units, input_dim))
+        sparse_latency = _median_latency(
+            lambda: sparse_matmul(sparse_kernel).numpy(), **benchmark_options
+        )
+        if sparse_latency < dense_latency:
+            crossover = sparsity
+            break
+    _crossovers[key] = crossover
+    return crossover
+
+
+def _rebuild(model, replace):
+    """
+    Clones a model, replacing the layers for which `replace` returns a new layer and its weights
+    and copying the weights of all other layers.
+    """
+    replaced = {}
+
+    def clone_layer(layer):
+        replacement = replace(layer)
+        if replacement is None:
+            return layer.__class__.from_config(layer.get_config())
+        replaced[layer.name] = replacement[1]
+        return replacement[0]
+
+    clone = keras.models.clone_model(model, clone_function=clone_layer)
+    for layer, new_layer in zip(model.layers, clone.layers):
+        if layer.name in replaced:
+            new_layer.set_weights(replaced[layer.name])
+        elif layer.weights:
+            new_layer.set_weights(layer.get_weights())
+    return clone
+
+
+def sparsify_model(
+    model,
+    min_sparsity: float = 0.5,
+    batch_size: int = 1,
+    tolerance: float = 1e-4,
+    **benchmark_options,
+):
+    """
+    Replaces the Dense layers of a pruned model by SparseDense layers where that is faster. Every
+    Dense layer with at least `min_sparsity` zero weights is converted if its sparsity is above
+    the measured crossover for its shape and the batch size.
+
+    Args:
+        model (keras.Model): A functional or sequential model without pruning wrappers.
+        min_sparsity (float): Dense layers below this sparsity are not considered.
+        batch_size (int): Batch size of the crossover measurements.
+        tolerance (float): Maximum difference of the outputs of both models on random inputs.
+        **benchmark_options: Arguments of the LatencyBenchmark of the crossover measurements.
+
+    Returns:
+        tuple: The model with sparse layers, or the given model if no layer is converted, and the
+            report with the sparsity, crossover and decision of every Dense layer.
+    """
+    layers = []
+    for layer in model.layers:
+        if type(layer) is not keras.layers.Dense:
+            continue
+        sparsity = layer_sparsity(layer)
+        crossover = None
+        if sparsity >= min_sparsity:
+            crossover = measure_crossover(
+                layer.kernel.shape[0], layer.units, batch_size, **benchmark_options
+            )
+        layers.append(
+            {
+                "name": layer.name,
+                "sparsity": sparsity,
+                "crossover": crossover,
+                "sparse": crossover is not None and sparsity >= crossover,
+            }
+        )
+    report = {"layers": layers, "sparse_layers": 0}
+    sparse_layers = {layer["name"] for layer in layers if layer["sparse"]}
+    if not sparse_layers:
+        return model, report
+
+    def replace(layer):
+        if layer.name not in sparse_layers:
+            return None
+        config = layer.get_config()
+        weights = SparseDense.sparse_weights(
+            layer.kernel.numpy(), layer.bias.numpy() if layer.use_bias else None
+        )
+        sparse_layer = SparseDense(
+            units=layer.units,
+            nonzeros=len(weights[0]),
+            activation=config["activation"],
+            use_bias=layer.use_bias,
+            name=layer.name,
+            dtype=config["dtype"],
+        )
+        return sparse_layer, weights
+
+    try:
+        sparse_model = _rebuild(model, replace)
+        if not outputs_match(model, sparse_model, tolerance):
+            raise ValueError("The sparse model computes different outputs")
+    except (ValueError, TypeError, NotImplementedError) as exc:
+        logger.warning(f"Could not convert the model to sparse layers: {exc}")
+        return model, {**report, "error": str(exc)}
+    report["sparse_layers"] = len(sparse_layers)
+    return sparse_model, report
+
+
+def densify_model(model):
+    """
+    Replaces all SparseDense layers of a model by equivalent Dense layers.
+    """
+    if not any(isinstance(layer, SparseDense) for layer in model.layers):
+        return model
+
+    def replace(layer):
+        if not isinstance(layer, SparseDense):
+            return None
+        dense_layer = keras.layers.Dense(
+            layer.units,
+            activation=keras.activations.serialize(layer.activation),
+            use_bias=layer.use_bias,
+            name=layer.name,
+            dtype=layer.dtype_policy.name,
+        )
+        weights = [layer.dense_kernel()]
+        return dense_layer, weights + ([layer.bias.numpy()] if layer.use_bias else [])
+
+    return _rebuild(model, replace)
@@ -18,14 +18,14 @@ class Timer:
         Starts the timer.
         """
         if self.start_time is None:
-            self.start_time = time.time()
+            self.start_time = time.perf_counter()
 
     def stop(self):
         """
         Stops the timer and returns the elapsed time.
         """
         if self.start_time is not None:
-            elapsed_time = time.time() - self.start_time
+            elapsed_time = time.perf_counter() - self.start_time
             self.total_time += elapsed_time
             self.start_time = None
             return elapsed_time
@@ -36,7 +36,7 @@ class Timer:
         Resumes the timer.
         """
         if self.start_time is None:
-            self.start_time = time.time()
+            self.start_time = time.perf_counter()
 
     def get_total_time(self):
         """
@@ -4,6 +4,7 @@ import tensorflow as tf
 from loguru import logger
 
 from celery import shared_task
+from inference.helper_scripts.model_cache import get_model_cache
 from inference.models.inference import Inference
 from naso.celery import restart_all_workers
 from neural_architecture.NetworkCallbacks.evaluation_base_callback import (
@@ -14,7 +15,9 @@ from workers.helper_scripts.celery import get_compute_device_name
 
 @shared_task(bind=True)
 def run_inference(self, inference_id):
-    restart_all_workers()
+    if not get_model_cache():
+        # restarting the pool would throw away the cached models
+        restart_all_workers()
     self.update_state(
         state="PROGRESS",
         meta={"run_id": inference_id, "inference": True, "current": 1, "total": 1},
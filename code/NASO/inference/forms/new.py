@@ -5,6 +5,7 @@ from crispy_forms.layout import HTML, Column, Field, Layout, Row, Submit
 from decouple import config
 from django import forms
 
+from inference.helper_scripts.benchmark import parse_batch_sizes
 from runs.forms.base import BaseRunWithCallback
 
 
@@ -18,6 +19,74 @@ class NewInferenceForm(BaseRunWithCallback):
         initial=1,
         widget=forms.TextInput(attrs={"type": "number", "min": 0}),
     )
+    benchmark_warmup = forms.IntegerField(
+        label="Benchmark warm up",
+        initial=10,
+        widget=forms.TextInput(attrs={"type": "number", "min": 0}),
+    )
+    benchmark_iterations = forms.IntegerField(
+        label="Benchmark iterations",
+        initial=0,
+        help_text="0 disables the latency benchmark, unless a time budget is set",
+        widget=forms.TextInput(attrs={"type": "number", "min": 0}),
+    )
+    benchmark_time_budget = forms.FloatField(
+        label="Benchmark time budget [s]",
+        initial=0,
+        widget=forms.TextInput(attrs={"type": "number", "min": 0, "step": "any"}),
+    )
+    benchmark_trials = forms.IntegerField(
+        label="Benchmark trials",
+        initial=5,
+        widget=forms.TextInput(attrs={"type": "number", "min": 1}),
+    )
+    sweep_batch_sizes = forms.CharField(
+        label="Batch size sweep",
+        required=False,
+        help_text="e.g. 1,8,32 or 1-256 for all powers of two, empty disables the sweep",
+    )
+    latency_slo = forms.FloatField(
+        label="Latency SLO [ms]",
+        initial=0,
+        help_text="The sweep stops once the p99 latency exceeds it, 0 for no limit",
+        widget=forms.TextInput(attrs={"type": "number", "min": 0, "step": "any"}),
+    )
+
+    tflite_export = forms.BooleanField(
+        label="Export TFLite variants",
+        required=False,
+        help_text="float32, dynamic range int8 and full integer int8",
+    )
+    tflite_threads = forms.IntegerField(
+        label="TFLite threads",
+        initial=1,
+        widget=forms.TextInput(attrs={"type": "number", "min": 1}),
+    )
+
+    sparse_benchmark = forms.BooleanField(
+        label="Benchmark sparse Dense layers",
+        required=False,
+        help_text="Compares the latency with dense and with sparse matmuls",
+    )
+    sparse_min_sparsity = forms.FloatField(
+        label="Minimum sparsity",
+        initial=0.5,
+        widget=forms.TextInput(
+            attrs={"type": "number", "min": 0, "max": 1, "step": "any"}
+        ),
+    )
+
+    layer_profile = forms.BooleanField(
+        label="Profile layers",
+        required=False,
+        help_text="Measures the latency of every layer in isolation",
+    )
+
+    def clean_sweep_batch_sizes(self):
+        try:
+            return parse_batch_sizes(self.cleaned_data["sweep_batch_sizes"])
+        except ValueError as exc:
+            raise forms.ValidationError(str(exc)) from exc
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -38,6 +107,25 @@ class NewInferenceForm(BaseRunWithCallback):
                     css_class="col-3",
                 ),
             ),
+            Row(
+                Column(Field("benchmark_warmup"), css_class="col-3"),
+                Column(Field("benchmark_iterations"), css_class="col-3"),
+                Column(Field("benchmark_time_budget"), css_class="col-3"),
+                Column(Field("benchmark_trials"), css_class="col-3"),
+            ),
+            Row(
+                Column(Field("sweep_batch_sizes"), css_class="col-9"),
+                Column(Field("latency_slo"), css_class="col-3"),
+            ),
+            Row(
+                Column(Field("tflite_export"), css_class="col-9"),
+                Column(Field("tflite_threads"), css_class="col-3"),
+            ),
+            Row(
+                Column(Field("sparse_benchmark"), css_class="col-9"),
+                Column(Field("sparse_min_sparsity"), css_class="col-3"),
+            ),
+            Field("layer_profile"),
             self.callback_html(),
             self.dataloader_html(),
             self.gpu_field(include_inference=False),
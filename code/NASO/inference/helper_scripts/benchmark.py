@@ -0,0 +1,292 @@
+import itertools
+import time
+
+import numpy as np
+import tensorflow as tf
+from scipy import stats
+
+LATENCY_PERCENTILES = [50, 90, 99, 99.9]
+
+
+def summarize_latencies(latencies_ns) -> dict:
+    """
+    Computes the latency statistics of one set of measurements.
+    Outliers are all latencies outside of the Tukey fences, i.e. more than 1.5 interquartile
+    ranges below the first or above the third quartile.
+
+    Args:
+        latencies_ns (list[int]): The latencies in nanoseconds.
+
+    Returns:
+        dict: Mean, standard deviation, min, max, percentiles in milliseconds and the number of outliers.
+    """
+    latencies = np.asarray(latencies_ns, dtype=np.float64) / 1e6
+    if len(latencies) == 0:
+        return {}
+    first_quartile, third_quartile = np.percentile(latencies, [25, 75])
+    fence = 1.5 * (third_quartile - first_quartile)
+    outliers = np.count_nonzero(
+        (latencies < first_quartile - fence) | (latencies > third_quartile + fence)
+    )
+    summary = {
+        "latency_mean [ms]": float(np.mean(latencies)),
+        "latency_std [ms]": float(np.std(latencies)),
+        "latency_min [ms]": float(np.min(latencies)),
+        "latency_max [ms]": float(np.max(latencies)),
+        "latency_outliers": int(outliers),
+        "latency_outlier_fraction": float(outliers / len(latencies)),
+        "iterations": len(latencies),
+    }
+    for percentile, value in zip(
+        LATENCY_PERCENTILES, np.percentile(latencies, LATENCY_PERCENTILES)
+    ):
+        summary[f"latency_p{percentile:g} [ms]"] = float(value)
+    return summary
+
+
+def latency_histogram(latencies_ns, bins: int = 30) -> dict:
+    """
+    Returns a histogram of the latencies in milliseconds with logarithmic bins,
+    so that the tail stays visible next to the bulk of the measurements.
+    """
+    latencies = np.asarray(latencies_ns, dtype=np.float64) / 1e6
+    if len(latencies) == 0:
+        return {"edges": [], "counts": []}
+    lower, upper = np.min(latencies), np.max(latencies)
+    if lower <= 0 or lower == upper:
+        counts, edges = np.histogram(latencies, bins=bins)
+    else:
+        counts, edges = np.histogram(
+            latencies, bins=np.geomspace(lower, upper, bins + 1)
+        )
+    return {"edges": edges.tolist(), "counts": counts.tolist()}
+
+
+def confidence_interval(values, confidence: float = 0.95) -> tuple[float, float]:
+    """
+    Returns the mean of the values and the half width of its confidence interval
+    based on the t-distribution. The half width is NaN for less than two values.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    mean = float(np.mean(values))
+    if len(values) < 2:
+        return mean, float("nan")
+    half_width = stats.t.ppf((1 + confidence) / 2, len(values) - 1) * stats.sem(values)
+    return mean, float(half_width)
+
+
+class LatencyBenchmark:
+    """
+    Measures the latency of a function with warm up, a fixed number of iterations or a time
+    budget and repeated trials. Every call is timed with `time.perf_counter_ns`.
+
+    Args:
+        step (callable): The function to measure. It must block until its work is done.
+        warmup (int): Calls before every trial that are not measured.
+        iterations (int): Measured calls per trial.
+        time_budget (float): Seconds per trial. If set, a trial measures calls until the budget
+            is used up instead of a fixed number of iterations.
+        trials (int): Number of trials.
+    """
+
+    def __init__(
+        self,
+        step,
+        warmup: int = 10,
+        iterations: int = 100,
+        time_budget: float = 0,
+        trials: int = 5,
+    ):
+        self.step = step
+        self.warmup = warmup
+        self.iterations = iterations
+        self.time_budget = time_budget
+        self.trials = max(trials, 1)
+
+    def run_trial(self) -> list[int]:
+        """
+        Runs one trial and returns the latencies of its calls in nanoseconds.
+        """
+        for _ in range(self.warmup):
+            self.step()
+        latencies = []
+        budget_ns = int(self.time_budget * 1e9)
+        trial_start = time.perf_counter_ns()
+        while True:
+            start = time.perf_counter_ns()
+            self.step()
+            end = time.perf_counter_ns()
+            latencies.append(end - start)
+            if budget_ns > 0:
+                if end - trial_start >= budget_ns:
+                    break
+            elif len(latencies) >= self.iterations:
+                break
+        return latencies
+
+    def run(self) -> dict:
+        """
+        Runs all trials.
+
+        Returns:
+            dict: `metrics` with the statistics over all measurements and the confidence intervals
+                of the trial means and medians, `trials` with the statistics of every trial and
+                `histogram` with the latency histogram over all measurements.
+        """
+        trial_latencies = [self.run_trial() for _ in range(self.trials)]
+        all_latencies = list(itertools.chain.from_iterable(trial_latencies))
+        trials = [summarize_latencies(latencies) for latencies in trial_latencies]
+
+        metrics = summarize_latencies(all_latencies)
+        metrics["trials"] = self.trials
+        for key, name in [("latency_mean [ms]", "mean"), ("latency_p50 [ms]", "p50")]:
+            mean, half_width = confidence_interval([trial[key] for trial in trials])
+            metrics[f"latency_trial_{name} [ms]"] = mean
+            metrics[f"latency_trial_{name}_ci95 [ms]"] = half_width
+        return {
+            "metrics": metrics,
+            "trials": trials,
+            "histogram": latency_histogram(all_latencies),
+        }
+
+
+def build_predict_step(
+    model, dataset: tf.data.Dataset, batches: int = 32
+) -> tuple[callable, float]:
+    """
+    Builds a benchmark step that runs the model on one batch of the dataset. The batches are
+    loaded into memory before, so the benchmark does not measure the input pipeline, and the
+    step cycles through them. The outputs are copied to the host, so asynchronous devices
+    have finished their work when the step returns.
+
+    Args:
+        model (tf.keras.Model): The model to measure.
+        dataset (tf.data.Dataset): The batched dataset, elements are inputs or (inputs, labels).
+        batches (int): Maximum number of distinct batches kept in memory.
+
+    Returns:
+        tuple: The step and the average number of samples it processes per call.
+    """
+    inputs = []
+    for element in dataset.take(batches):
+        inputs.append(element[0] if isinstance(element, tuple) else element)
+    if not inputs:
+        raise ValueError("The dataset does not contain any batch to benchmark.")
+    samples_per_step = float(
+        np.mean([tf.nest.flatten(batch)[0].shape[0] for batch in inputs])
+    )
+    predict = tf.function(
+        lambda batch: model(batch, training=False), reduce_retracing=True
+    )
+    batch_cycle = itertools.cycle(inputs)
+
+    def step():
+        outputs = predict(next(batch_cycle))
+        tf.nest.map_structure(lambda output: output.numpy(), outputs)
+
+    return step, samples_per_step
+
+
+def parse_batch_sizes(value: str) -> list[int]:
+    """
+    Parses the batch sizes of a sweep. Either a comma separated list like `1,8,32` or a
+    geometric range `start-end`, optionally with a factor `start-end:factor` (default 2),
+    e.g. `1-256` for all powers of two up to 256.
+
+    Raises:
+        ValueError: If the value is not a valid list or range.
+    """
+    value = value.replace(" ", "")
+    if not value:
+        return []
+    if "-" in value:
+        bounds, _, factor = value.partition(":")
+        start, end = (int(bound) for bound in bounds.split("-"))
+        factor = float(factor) if factor else 2.0
+        if start < 1 or end < start or factor <= 1:
+            raise ValueError(f"Invalid batch size range {value}")
+        batch_sizes = []
+        batch_size = float(start)
+        while round(batch_size) <= end:
+            if not batch_sizes or round(batch_size) != batch_sizes[-1]:
+                batch_sizes.append(round(batch_size))
+            batch_size *= factor
+        return batch_sizes
+    batch_sizes = sorted({int(batch_size) for batch_size in value.split(",")})
+    if batch_sizes[0] < 1:
+        raise ValueError(f"Invalid batch sizes {value}")
+    return batch_sizes
+
+
+def run_batch_size_sweep(
+    model,
+    dataset: tf.data.Dataset,
+    batch_sizes: list[int],
+    latency_slo: float = 0,
+    profiler=None,
+    **benchmark_options,
+) -> list[dict]:
+    """
+    Benchmarks a model for a list of batch sizes in increasing order. The sweep stops at the
+    first batch size that runs out of memory or whose p99 latency exceeds the latency SLO, the
+    point is still recorded with its status.
+
+    Args:
+        model (tf.keras.Model): The model, loaded once for all batch sizes.
+        dataset (tf.data.Dataset): The unbatched dataset.
+        batch_sizes (list[int]): The batch sizes to benchmark.
+        latency_slo (float): Maximum p99 latency of a batch in milliseconds, 0 for no limit.
+        profiler (EnergyProfiler): Profiler for the energy per sample, None to skip energy.
+        **benchmark_options: Arguments of the LatencyBenchmark, e.g. warmup or iterations.
+
+    Returns:
+        list[dict]: One point per benchmarked batch size with throughput, latencies, energy
+            per sample and status (`ok`, `oom` or `slo_exceeded`).
+    """
+    dataset_size = int(dataset.cardinality())
+    if dataset_size < 0:
+        dataset_size = float("inf")
+    points = []
+    for batch_size in sorted(batch_sizes):
+        point = {"batch_size": batch_size}
+        try:
+            step, samples_per_step = build_predict_step(
+                model, dataset.batch(batch_size)
+            )
+            benchmark = LatencyBenchmark(step, **benchmark_options)
+            if profiler:
+                profiler.begin_phase("sweep")
+                profiler.begin_batch("sweep")
+            results = benchmark.run()
+            metrics = results["metrics"]
+            if profiler:
+                calls = metrics["iterations"] + benchmark.warmup * benchmark.trials
+                profiler.end_batch("sweep", int(calls * samples_per_step))
+        except tf.errors.ResourceExhaustedError:
+            point["status"] = "oom"
+            points.append(point)
+            break
+
+        mean_latency = metrics["latency_mean [ms]"]
+        point.update(
+            {
+                "status": "ok",
+                "samples_per_step": samples_per_step,
+                "samples_per_second": samples_per_step / mean_latency * 1e3,
+                "latency_per_sample [ms]": mean_latency / samples_per_step,
+                "latency_p50 [ms]": metrics["latency_p50 [ms]"],
+                "latency_p99 [ms]": metrics["latency_p99 [ms]"],
+            }
+        )
+        if profiler:
+            energy = profiler.attribute("sweep")
+            if "sweep_energy_per_sample [J]" in energy:
+                point["energy_per_sample [J]"] = energy["sweep_energy_per_sample [J]"]
+        points.append(point)
+        if latency_slo > 0 and point["latency_p99 [ms]"] > latency_slo:
+            point["status"] = "slo_exceeded"
+            break
+        if batch_size >= dataset_size:
+            # a single batch holds the whole dataset, larger batches would measure the same
+            break
+    return points
@@ -0,0 +1,135 @@
+import numpy as np
+import tensorflow as tf
+from loguru import logger
+
+
+class StreamingClassificationMetrics:
+    """
+    Accuracy and confusion matrix of a classifier, updated batch by batch. Only the counts are
+    kept, so the memory does not depend on the size of the dataset.
+
+    Labels can be class indices or one-hot encoded. Outputs with a single unit are treated as
+    binary probabilities with a threshold of 0.5, all other outputs as class scores. Labels that
+    are no classes of the outputs, e.g. the targets of regression models, raise a ValueError,
+    so the confusion matrix never grows beyond the number of output classes.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.confusion_matrix = np.zeros((0, 0), dtype=np.int64)
+        self.samples = 0
+
+    @staticmethod
+    def _classes(values, scores: bool) -> np.ndarray:
+        values = np.asarray(values)
+        if values.ndim > 1 and values.shape[-1] > 1:
+            if not scores and not (
+                np.isin(values, [0, 1]).all() and (values.sum(axis=-1) == 1).all()
+            ):
+                raise ValueError("The labels are neither class indices nor one-hot")
+            return np.argmax(values, axis=-1).reshape(-1)
+        values = values.reshape(-1)
+        if scores:
+            return (values > 0.5).astype(np.int64)
+        if not ((values >= 0) & (values == np.rint(values))).all():
+            raise ValueError("The labels are no class indices")
+        return values.astype(np.int64)
+
+    def update(self, labels, outputs):
+        """
+        Adds the predictions of one batch.
+
+        Args:
+            labels (array): The true labels of the batch.
+            outputs (array | dict): The model outputs of the batch. For models with several
+                outputs, the first one is evaluated.
+        """
+        if isinstance(outputs, dict):
+            outputs = list(outputs.values())[0]
+        elif isinstance(outputs, (list, tuple)):
+            outputs = outputs[0]
+        outputs = np.asarray(outputs)
+        labels = np.asarray(labels)
+        predicted = self._classes(outputs, scores=True)
+        true = self._classes(labels, scores=False)
+        if len(true) != len(predicted):
+            raise ValueError(
+                f"Got {len(true)} labels for {len(predicted)} predictions in a batch"
+            )
+        if len(true) == 0:
+            return
+
+        output_classes = (
+            outputs.shape[-1] if outputs.ndim > 1 and outputs.shape[-1] > 1 else 2
+        )
+        if true.max() >= output_classes:
+            raise ValueError(
+                f"The label {true.max()} is no class of outputs with "
+                f"{output_classes} classes"
+            )
+        classes = max(self.confusion_matrix.shape[0], output_classes)
+        if classes > self.confusion_matrix.shape[0]:
+            grown = np.zeros((classes, classes), dtype=np.int64)
+            size = self.confusion_matrix.shape[0]
+            grown[:size, :size] = self.confusion_matrix
+            self.confusion_matrix = grown
+        self.confusion_matrix += np.bincount(
+            true * classes + predicted, minlength=classes * classes
+        ).reshape(classes, classes)
+        self.samples += len(true)
+
+    def result(self) -> dict:
+        """
+        Returns:
+            dict: `accuracy` and the number of `evaluated_samples`, empty without samples.
+        """
+        if self.samples == 0:
+            return {}
+        return {
+            "accuracy": float(np.trace(self.confusion_matrix) / self.samples),
+            "evaluated_samples": self.samples,
+        }
+
+
+def stream_predict(
+    model, dataset: tf.data.Dataset, callbacks=None, metrics=None, logs=None
+) -> dict:
+    """
+    Runs the model over a batched dataset in a single pass. Unlike `model.predict`, the outputs
+    of a batch are dropped once the metrics are updated, so neither the predictions nor the labels
+    of the whole dataset are held in memory. The callbacks receive the same predict hooks as with
+    `model.predict`, including the outputs of every batch.
+
+    Args:
+        model (tf.keras.Model): The model.
+        dataset (tf.data.Dataset): The batched dataset, elements are inputs or (inputs, labels).
+        callbacks (list): Keras callbacks.
+        metrics (StreamingClassificationMetrics): Updated with every batch that has labels. If
+            the labels do not fit the outputs, e.g. for regression models, the evaluation is
+            skipped for the rest of the dataset.
+        logs (dict): Additional values for the logs of the prediction end.
+
+    Returns:
+        dict: The given logs with the metric results. They are passed to `on_predict_end`, so
+            they end up in the prediction metrics stored by the callbacks.
+    """
+    callback_list = tf.keras.callbacks.CallbackList(callbacks or [], model=model)
+    evaluate = metrics is not None
+    callback_list.on_predict_begin()
+    for batch, element in enumerate(dataset):
+        inputs, labels = element if isinstance(element, tuple) else (element, None)
+        callback_list.on_predict_batch_begin(batch)
+        outputs = model.predict_on_batch(inputs)
+        callback_list.on_predict_batch_end(batch, {"outputs": outputs})
+        if evaluate and labels is not None:
+            try:
+                metrics.update(labels, outputs)
+            except ValueError as exc:
+                logger.warning(f"Could not evaluate the predictions: {exc}")
+                metrics.reset()
+                evaluate = False
+    logs = {**(logs or {}), **(metrics.result() if evaluate else {})}
+    callback_list.on_predict_end(logs)
+    return logs
@@ -0,0 +1,145 @@
+import itertools
+
+import keras
+import numpy as np
+import tensorflow as tf
+
+from inference.helper_scripts.benchmark import LatencyBenchmark
+from neural_architecture.helper_scripts.model_analysis import analyse_model
+
+
+def collect_layer_inputs(model, dataset: tf.data.Dataset, batches: int = 8) -> dict:
+    """
+    Runs the model on batches of the dataset and records the arguments of the first call of
+    every layer, so each layer can be run in isolation on representative inputs.
+
+    Args:
+        model (keras.Model): A functional or sequential model.
+        dataset (tf.data.Dataset): The batched dataset, elements are inputs or (inputs, labels).
+        batches (int): Number of batches that are recorded.
+
+    Returns:
+        dict: The layer by name and the list of its recorded (args, kwargs) per batch.
+
+    Raises:
+        ValueError: If the model is not a graph of layers, e.g. a subclassed model.
+    """
+    if not getattr(model, "_is_graph_network", False):
+        raise ValueError("Only functional and sequential models can be profiled")
+    calls = {}
+    for layer in model.layers:
+        if isinstance(layer, keras.layers.InputLayer):
+            continue
+        # a shared layer is profiled on its first call in this model
+        nodes = [
+            node
+            for index, node in enumerate(layer._inbound_nodes)
+            if f"{layer.name}_ib-{index}" in model._network_nodes
+        ]
+        if nodes:
+            calls[layer.name] = (layer, nodes[0])
+
+    keras_inputs = {}
+    for _, node in calls.values():
+        for keras_input in node.keras_inputs:
+            keras_inputs.setdefault(id(keras_input), keras_input)
+    capture_model = keras.Model(model.inputs, list(keras_inputs.values()))
+
+    layer_inputs = {name: (layer, []) for name, (layer, _) in calls.items()}
+    for element in dataset.take(batches):
+        inputs = element[0] if isinstance(element, tuple) else element
+        values = dict(
+            zip(
+                keras_inputs.keys(),
+                tf.nest.flatten(capture_model(inputs, training=False)),
+            )
+        )
+        for name, (_, node) in calls.items():
+            arguments = tf.nest.map_structure(
+                lambda argument: values.get(id(argument), argument),
+                (node.call_args, node.call_kwargs),
+            )
+            layer_inputs[name][1].append(arguments)
+    return layer_inputs
+
+
+def build_layer_step(layer, arguments: list) -> callable:
+    """
+    Builds a benchmark step that calls the layer on the recorded arguments, cycling through
+    the batches, and copies the outputs to the host, so the step blocks until the layer is done.
+    """
+    call = tf.function(
+        lambda args, kwargs: layer(*args, **{**kwargs, "training": False}),
+        reduce_retracing=True,
+    )
+    argument_cycle = itertools.cycle(arguments)
+
+    def step():
+        args, kwargs = next(argument_cycle)
+        outputs = call(args, kwargs)
+        tf.nest.map_structure(lambda output: output.numpy(), outputs)
+
+    return step
+
+
+def profile_layers(
+    model, dataset: tf.data.Dataset, batch_size: int = 1, batches: int = 8, **options
+) -> dict:
+    """
+    Measures the latency of every layer in isolation with warm up and repetitions, on inputs
+    recorded from the dataset. The sum of the layers is usually above the latency of the whole
+    model, as every layer pays the dispatch overhead of its own call.
+
+    Args:
+        model (keras.Model): A functional or sequential model.
+        dataset (tf.data.Dataset): The unbatched dataset.
+        batch_size (int): Batch size of the recorded inputs.
+        batches (int): Number of distinct batches every layer is run on.
+        **options: Arguments of the LatencyBenchmark.
+
+    Returns:
+        dict: `metrics` with the total latency and the hottest layer, `layers` with latency,
+            share of the total, FLOPs, output activation bytes and parameter bytes per layer,
+            sorted by latency.
+    """
+    layer_inputs = collect_layer_inputs(model, dataset.batch(batch_size), batches)
+    flops = {}
+    for row in analyse_model(model, batch_size)["layers"]:
+        flops[row["name"]] = flops.get(row["name"], 0) + row["flops"]
+
+    layers = []
+    for name, (layer, arguments) in layer_inputs.items():
+        if not arguments:
+            continue
+        latency = LatencyBenchmark(build_layer_step(layer, arguments), **options).run()
+        outputs = tf.nest.flatten(layer(*arguments[0][0], **arguments[0][1]))
+        layers.append(
+            {
+                "name": name,
+                "type": layer.__class__.__name__,
+                "latency_p50 [ms]": latency["metrics"]["latency_p50 [ms]"],
+                "latency_mean [ms]": latency["metrics"]["latency_mean [ms]"],
+                "flops": flops.get(name, 0),
+                "activation_bytes": int(
+                    sum(np.prod(output.shape) * output.dtype.size for output in outputs)
+                ),
+                "parameter_bytes": int(
+                    sum(
+                        np.prod(weight.shape) * weight.dtype.size
+                        for weight in layer.weights
+                    )
+                ),
+            }
+        )
+    total = sum(layer["latency_p50 [ms]"] for layer in layers)
+    for layer in layers:
+        layer["share"] = layer["latency_p50 [ms]"] / total if total else 0.0
+    layers.sort(key=lambda layer: layer["latency_p50 [ms]"], reverse=True)
+    return {
+        "metrics": {
+            "layer_latency_sum [ms]": total,
+            "hottest_layer": layers[0]["name"] if layers else "",
+            "hottest_layer_share": layers[0]["share"] if layers else 0.0,
+        },
+        "layers": layers,
+    }
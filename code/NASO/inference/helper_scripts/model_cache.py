@@ -0,0 +1,147 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import tensorflow as tf
+from loguru import logger
+
+from naso.settings import MODEL_CACHE_MEMORY_BUDGET
+
+
+def model_size(model) -> int:
+    """
+    Returns the memory of the weights of a model in bytes.
+    """
+    return int(
+        sum(np.prod(weight.shape) * weight.dtype.size for weight in model.weights)
+    )
+
+
+class ModelCache:
+    """
+    Keeps loaded models of a worker process between tasks. A model is identified by the path,
+    modification time and content hash of its file, so an overwritten model file is loaded again.
+    The least recently used models are evicted once the weights of all cached models exceed the
+    memory budget; a model larger than the whole budget is returned without being cached.
+
+    Args:
+        memory_budget (int): Maximum bytes of cached weights.
+        loader (callable): Loads a model from a path.
+        size_of (callable): Returns the bytes of a loaded model.
+    """
+
+    def __init__(
+        self,
+        memory_budget: int,
+        loader=tf.keras.models.load_model,
+        size_of=model_size,
+    ):
+        self.memory_budget = memory_budget
+        self.loader = loader
+        self.size_of = size_of
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._models = OrderedDict()
+        self._digests = {}
+        self._lock = threading.Lock()
+
+    @property
+    def memory_usage(self) -> int:
+        return sum(size for _, size in self._models.values())
+
+    def _digest(self, path: str, stat: os.stat_result) -> str:
+        # hashing reads the whole file, so it is done once per version of the file
+        version = (path, stat.st_mtime_ns, stat.st_size)
+        if version not in self._digests:
+            sha256 = hashlib.sha256()
+            with open(path, "rb") as file:
+                for chunk in iter(lambda: file.read(1 << 20), b""):
+                    sha256.update(chunk)
+            self._digests = {
+                key: digest for key, digest in self._digests.items() if key[0] != path
+            }
+            self._digests[version] = sha256.hexdigest()
+        return self._digests[version]
+
+    def key(self, path: str) -> tuple[str, int, str]:
+        """
+        Returns the cache key of a model file: its absolute path, modification time and sha256.
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        return path, stat.st_mtime_ns, self._digest(path, stat)
+
+    def get(self, path: str):
+        """
+        Returns the model of a file, loading it if it is not cached.
+
+        Args:
+            path (str): The model file.
+
+        Returns:
+            tuple: The model and the seconds it took to load it, None if it was cached.
+        """
+        with self._lock:
+            key = self.key(path)
+            if key in self._models:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return self._models[key][0], None
+            self.misses += 1
+
+            start = time.perf_counter()
+            model = self.loader(path)
+            load_time = time.perf_counter() - start
+            size = self.size_of(model)
+
+            # older versions of the same file can not be requested anymore
+            for old_key in [old for old in self._models if old[0] == key[0]]:
+                del self._models[old_key]
+                self.evictions += 1
+            if size > self.memory_budget:
+                logger.info(
+                    f"Model {path} with {size} bytes exceeds the model cache budget"
+                )
+                return model, load_time
+            while self._models and self.memory_usage + size > self.memory_budget:
+                self._models.popitem(last=False)
+                self.evictions += 1
+            self._models[key] = (model, size)
+            return model, load_time
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: The hit, miss and eviction counters, the number of cached models and their
+                memory in bytes.
+        """
+        return {
+            "model_cache_hits": self.hits,
+            "model_cache_misses": self.misses,
+            "model_cache_evictions": self.evictions,
+            "model_cache_models": len(self._models),
+            "model_cache_memory": self.memory_usage,
+        }
+
+
+_model_cache = None
+
+
+def get_model_cache() -> ModelCache | None:
+    """
+    Returns the model cache of this process, None if MODEL_CACHE_MEMORY_BUDGET disables it.
+    """
+    global _model_cache
+    if MODEL_CACHE_MEMORY_BUDGET <= 0:
+        return None
+    if _model_cache is None:
+        _model_cache = ModelCache(MODEL_CACHE_MEMORY_BUDGET * 1024 * 1024)
+    return _model_cache
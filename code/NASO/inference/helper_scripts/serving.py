@@ -0,0 +1,212 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+import tensorflow as tf
+from loguru import logger
+
+from inference.helper_scripts.model_cache import get_model_cache
+from naso.settings import SERVING_MAX_BATCH_SIZE, SERVING_MAX_DELAY
+
+
+class ServingRequest:
+    """
+    The inputs of one request together with the future of its outputs.
+    """
+
+    def __init__(self, inputs: np.ndarray):
+        self.inputs = inputs
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent requests into micro batches. A background thread waits for the first
+    request and then collects further requests for at most `max_delay` seconds or until
+    `max_batch_size` samples are reached, runs the model once on the concatenated inputs and
+    splits the outputs again. Requests whose samples have a different shape than the first one
+    of a batch wait for the next batch.
+
+    Args:
+        predict (callable): Runs the model on a batch of inputs and returns its outputs.
+        max_batch_size (int): Maximum number of samples of a micro batch.
+        max_delay (float): Maximum seconds the first request of a batch waits for others.
+    """
+
+    def __init__(self, predict, max_batch_size: int = 32, max_delay: float = 0.005):
+        self.predict = predict
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_delay = max_delay
+        self.requests = 0
+        self.batches = 0
+        self.samples = 0
+        self.queue_time = 0.0
+        self.compute_time = 0.0
+        self._queue = queue.Queue()
+        self._deferred = []
+        self._stats_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, inputs) -> Future:
+        """
+        Queues the inputs of a request.
+
+        Args:
+            inputs (array): One or more samples, the first axis is the batch axis.
+
+        Returns:
+            Future: Resolves to a dict with the `outputs` of the request, its `queue_time` and
+                the `compute_time` and `batch_size` of the micro batch, times in seconds.
+        """
+        request = ServingRequest(np.asarray(inputs))
+        if request.inputs.ndim == 0:
+            raise ValueError("The inputs need a batch axis")
+        self._queue.put(request)
+        return request.future
+
+    def _next_request(self, timeout: float = None) -> ServingRequest | None:
+        if self._deferred:
+            return self._deferred.pop(0)
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _collect(self) -> list[ServingRequest]:
+        first = self._next_request()
+        batch = [first]
+        samples = len(first.inputs)
+        sample_shape = first.inputs.shape[1:]
+        deadline = first.enqueued + self.max_delay
+        skipped = []
+        while samples < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0 and self._queue.empty() and not self._deferred:
+                break
+            request = self._next_request(max(remaining, 0))
+            if request is None:
+                break
+            if (
+                request.inputs.shape[1:] != sample_shape
+                or samples + len(request.inputs) > self.max_batch_size
+            ):
+                skipped.append(request)
+                if remaining <= 0:
+                    break
+                continue
+            batch.append(request)
+            samples += len(request.inputs)
+        self._deferred = skipped + self._deferred
+        return batch
+
+    def _run(self):
+        while True:
+            # requests that timed out and were cancelled while they were queued are dropped
+            batch = [
+                request
+                for request in self._collect()
+                if request.future.set_running_or_notify_cancel()
+            ]
+            if not batch:
+                continue
+            started = time.perf_counter()
+            try:
+                outputs = self.predict(
+                    np.concatenate([request.inputs for request in batch])
+                )
+            except Exception as exc:  # pylint: disable=broad-except
+                logger.error(f"Serving batch failed: {exc}")
+                for request in batch:
+                    request.future.set_exception(exc)
+                continue
+            compute_time = time.perf_counter() - started
+
+            offsets = np.cumsum([len(request.inputs) for request in batch])
+            batch_size = int(offsets[-1])
+            split_outputs = [
+                np.split(np.asarray(output), offsets[:-1])
+                for output in tf.nest.flatten(outputs)
+            ]
+            with self._stats_lock:
+                self.requests += len(batch)
+                self.batches += 1
+                self.samples += batch_size
+                self.compute_time += compute_time
+                for request in batch:
+                    self.queue_time += started - request.enqueued
+            for index, request in enumerate(batch):
+                request.future.set_result(
+                    {
+                        "outputs": tf.nest.pack_sequence_as(
+                            outputs, [output[index] for output in split_outputs]
+                        ),
+                        "queue_time": started - request.enqueued,
+                        "compute_time": compute_time,
+                        "batch_size": batch_size,
+                    }
+                )
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: Number of requests, batches and samples, the mean batch size and the mean
+                queue time per request and compute time per batch in milliseconds.
+        """
+        with self._stats_lock:
+            return {
+                "requests": self.requests,
+                "batches": self.batches,
+                "samples": self.samples,
+                "mean_batch_size": self.samples / self.batches if self.batches else 0,
+                "queue_time_mean [ms]": (
+                    self.queue_time / self.requests * 1e3 if self.requests else 0
+                ),
+                "compute_time_mean [ms]": (
+                    self.compute_time / self.batches * 1e3 if self.batches else 0
+                ),
+            }
+
+
+_batchers: dict[str, MicroBatcher] = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(model_file: str) -> MicroBatcher:
+    """
+    Returns the micro batcher of a model file and loads the model on first use. The batchers
+    and their models stay in memory for the lifetime of the process.
+    """
+    with _batchers_lock:
+        if model_file not in _batchers:
+            model_cache = get_model_cache()
+            if model_cache:
+                model = model_cache.get(model_file)[0]
+            else:
+                model = tf.keras.models.load_model(model_file)
+            predict = tf.function(
+                lambda batch: model(batch, training=False), reduce_retracing=True
+            )
+
+            def run_model(batch):
+                return tf.nest.map_structure(
+                    lambda output: output.numpy(), predict(batch)
+                )
+
+            _batchers[model_file] = MicroBatcher(
+                run_model, SERVING_MAX_BATCH_SIZE, SERVING_MAX_DELAY / 1e3
+            )
+        return _batchers[model_file]
+
+
+def get_serving_stats() -> dict:
+    """
+    Returns the statistics of all batchers of this process by model file.
+    """
+    with _batchers_lock:
+        return {
+            model_file: batcher.stats() for model_file, batcher in _batchers.items()
+        }
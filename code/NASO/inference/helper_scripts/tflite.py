@@ -0,0 +1,267 @@
+import itertools
+import os
+
+import numpy as np
+import tensorflow as tf
+from loguru import logger
+from tensorflow.lite.python.convert_phase import ConverterError
+
+from inference.helper_scripts.benchmark import LatencyBenchmark
+from inference.helper_scripts.evaluation import StreamingClassificationMetrics
+
+# float32 keeps the weights as they are, dynamic_int8 stores int8 weights and quantizes the
+# activations at runtime, full_int8 also runs all activations, inputs and outputs in int8
+TFLITE_VARIANTS = ["float32", "dynamic_int8", "full_int8"]
+
+
+def _inputs(element):
+    return element[0] if isinstance(element, tuple) else element
+
+
+def representative_dataset(dataset: tf.data.Dataset, samples: int = 100):
+    """
+    Returns the generator of calibration samples for the full integer quantization.
+
+    Args:
+        dataset (tf.data.Dataset): The unbatched dataset of the run.
+        samples (int): Number of samples to calibrate the activation ranges with.
+    """
+
+    def generator():
+        for element in dataset.take(samples):
+            yield [tf.cast(tf.expand_dims(_inputs(element), 0), tf.float32)]
+
+    return generator
+
+
+def convert_to_tflite(
+    model, variant: str, dataset: tf.data.Dataset = None, samples: int = 100
+) -> bytes:
+    """
+    Converts a Keras model into a TFLite flatbuffer.
+
+    Args:
+        model (tf.keras.Model): The model to convert.
+        variant (str): One of TFLITE_VARIANTS.
+        dataset (tf.data.Dataset): The unbatched dataset, needed for `full_int8`.
+        samples (int): Number of calibration samples for `full_int8`.
+
+    Returns:
+        bytes: The flatbuffer of the converted model.
+    """
+    if variant not in TFLITE_VARIANTS:
+        raise ValueError(f"Unknown TFLite variant {variant}")
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if variant != "float32":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if variant == "full_int8":
+        if dataset is None:
+            raise ValueError("The full integer quantization needs a dataset")
+        converter.representative_dataset = representative_dataset(dataset, samples)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+    return converter.convert()
+
+
+class TfliteModel:
+    """
+    Runs a TFLite flatbuffer on the interpreter. Batches of float inputs are quantized for
+    integer models and the outputs are dequantized again, so the model can be used like the
+    Keras model it was converted from.
+
+    Args:
+        model_content (bytes): The flatbuffer.
+        num_threads (int): Threads of the interpreter.
+    """
+
+    def __init__(self, model_content: bytes, num_threads: int = 1):
+        self.interpreter = tf.lite.Interpreter(
+            model_content=model_content, num_threads=max(num_threads, 1)
+        )
+        self.input_details = self.interpreter.get_input_details()[0]
+        self.output_details = self.interpreter.get_output_details()[0]
+        self.interpreter.allocate_tensors()
+        self._batch_size = None
+
+    def prepare(self, batch):
+        """
+        Resizes the interpreter for the batch and converts it into the input type of the model.
+        """
+        batch = np.asarray(batch, dtype=np.float32)
+        if len(batch) != self._batch_size:
+            self.interpreter.resize_tensor_input(
+                self.input_details["index"], batch.shape
+            )
+            self.interpreter.allocate_tensors()
+            self._batch_size = len(batch)
+        dtype = self.input_details["dtype"]
+        if dtype != np.float32:
+            scale, zero_point = self.input_details["quantization"]
+            limits = np.iinfo(dtype)
+            batch = np.clip(
+                np.round(batch / scale + zero_point), limits.min, limits.max
+            )
+        return batch.astype(dtype)
+
+    def invoke(self, prepared_batch) -> np.ndarray:
+        """
+        Runs the model on a batch returned by `prepare` and returns the raw outputs.
+        """
+        self.interpreter.set_tensor(self.input_details["index"], prepared_batch)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self.output_details["index"])
+
+    def predict(self, batch) -> np.ndarray:
+        outputs = self.invoke(self.prepare(batch))
+        if self.output_details["dtype"] != np.float32:
+            scale, zero_point = self.output_details["quantization"]
+            outputs = (outputs.astype(np.float32) - zero_point) * scale
+        return outputs
+
+
+def evaluate_tflite(
+    model, tflite_models: dict, dataset: tf.data.Dataset, samples: int = 0
+) -> dict:
+    """
+    Computes the accuracy of the Keras model and all TFLite variants on the same batches.
+
+    Args:
+        model (tf.keras.Model): The Keras model.
+        tflite_models (dict[str, TfliteModel]): The variants by name.
+        dataset (tf.data.Dataset): The batched dataset with labels.
+        samples (int): Maximum number of evaluated samples, 0 for the whole dataset.
+
+    Returns:
+        dict: The accuracy by variant name, `keras` for the Keras model. Empty if the outputs
+            can not be evaluated as classification.
+    """
+    metrics = {
+        name: StreamingClassificationMetrics()
+        for name in ["keras"] + list(tflite_models)
+    }
+    evaluated = 0
+    try:
+        for element in dataset:
+            if not isinstance(element, tuple):
+                return {}
+            inputs, labels = element[0], element[1]
+            metrics["keras"].update(labels, model.predict_on_batch(inputs))
+            for name, tflite_model in tflite_models.items():
+                metrics[name].update(labels, tflite_model.predict(inputs))
+            evaluated += len(labels)
+            if 0 < samples <= evaluated:
+                break
+    except ValueError:
+        return {}
+    return {
+        name: metric.result()["accuracy"]
+        for name, metric in metrics.items()
+        if metric.samples
+    }
+
+
+def export_tflite(
+    model,
+    dataset: tf.data.Dataset,
+    directory: str,
+    name: str,
+    batch_size: int = 1,
+    num_threads: int = 1,
+    profiler=None,
+    evaluation_samples: int = 0,
+    calibration_samples: int = 100,
+    **benchmark_options,
+) -> list[dict]:
+    """
+    Exports a model as all TFLite variants and benchmarks them on the interpreter.
+
+    Args:
+        model (tf.keras.Model): The model to export.
+        dataset (tf.data.Dataset): The unbatched dataset, used for calibration, benchmark and
+            accuracy.
+        directory (str): Directory of the exported `{name}_{variant}.tflite` files.
+        name (str): Base name of the files.
+        batch_size (int): Batch size of the benchmark and evaluation.
+        num_threads (int): Threads of the interpreter.
+        profiler (EnergyProfiler): Profiler for the energy per sample, None to skip energy.
+        evaluation_samples (int): Maximum samples for the accuracy, 0 for the whole dataset.
+        calibration_samples (int): Samples of the representative dataset.
+        **benchmark_options: Arguments of the LatencyBenchmark, e.g. warmup or iterations.
+
+    Returns:
+        list[dict]: Per variant the file, size, latency statistics, energy per sample, accuracy
+            and accuracy delta to the Keras model, or the error if it can not be converted.
+    """
+    os.makedirs(directory, exist_ok=True)
+    batched = dataset.batch(batch_size)
+    benchmark_batch = _inputs(next(iter(batched)))
+    tflite_models = {}
+    variants = []
+    for variant in TFLITE_VARIANTS:
+        try:
+            content = convert_to_tflite(model, variant, dataset, calibration_samples)
+            tflite_model = TfliteModel(content, num_threads)
+        except (ConverterError, ValueError, RuntimeError) as error:
+            # e.g. ops without int8 kernels, the other variants are still exported
+            logger.warning(f"The TFLite variant {variant} can not be exported: {error}")
+            variants.append({"variant": variant, "error": str(error)})
+            continue
+        file_path = os.path.join(directory, f"{name}_{variant}.tflite")
+        with open(file_path, "wb") as file:
+            file.write(content)
+        tflite_models[variant] = tflite_model
+
+        prepared_batch = tflite_model.prepare(benchmark_batch)
+        benchmark = LatencyBenchmark(
+            lambda: tflite_model.invoke(prepared_batch), **benchmark_options
+        )
+        if profiler:
+            profiler.begin_phase(variant)
+            profiler.begin_batch(variant)
+        results = benchmark.run()
+        result = {
+            "variant": variant,
+            "file": file_path,
+            "size": len(content),
+            "num_threads": num_threads,
+            **results["metrics"],
+        }
+        if profiler:
+            calls = (
+                results["metrics"]["iterations"] + benchmark.warmup * benchmark.trials
+            )
+            profiler.end_batch(variant, calls * len(prepared_batch))
+            energy = profiler.attribute(variant)
+            if f"{variant}_energy_per_sample [J]" in energy:
+                result["energy_per_sample [J]"] = energy[
+                    f"{variant}_energy_per_sample [J]"
+                ]
+        variants.append(result)
+
+    accuracies = evaluate_tflite(
+        model,
+        tflite_models,
+        batched,
+        evaluation_samples,
+    )
+    for result in variants:
+        if result["variant"] in accuracies:
+            result["accuracy"] = accuracies[result["variant"]]
+            result["accuracy_delta"] = (
+                accuracies[result["variant"]] - accuracies["keras"]
+            )
+    return variants
+
+
+def flatten_variant_metrics(variants: list[dict]) -> dict:
+    """
+    Returns the size, median latency, energy and accuracy delta of all variants as flat metrics,
+    e.g. `tflite_full_int8_size`, for the comparison of runs.
+    """
+    metrics = {}
+    keys = ["size", "latency_p50 [ms]", "energy_per_sample [J]", "accuracy_delta"]
+    for result, key in itertools.product(variants, keys):
+        if key in result:
+            metrics[f"tflite_{result['variant']}_{key}"] = result[key]
+    return metrics
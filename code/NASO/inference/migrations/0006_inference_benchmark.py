@@ -0,0 +1,32 @@
+# Generated by Django 4.2.13 on 2026-10-18 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("inference", "0005_inference_worker"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="inference",
+            name="benchmark_warmup",
+            field=models.IntegerField(default=10),
+        ),
+        migrations.AddField(
+            model_name="inference",
+            name="benchmark_iterations",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="inference",
+            name="benchmark_time_budget",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name="inference",
+            name="benchmark_trials",
+            field=models.IntegerField(default=5),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.13 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("inference", "0006_inference_benchmark"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="inference",
+            name="sweep_batch_sizes",
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name="inference",
+            name="latency_slo",
+            field=models.FloatField(default=0),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.13 on 2026-10-18 13:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("inference", "0007_inference_sweep"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="inference",
+            name="confusion_matrix",
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
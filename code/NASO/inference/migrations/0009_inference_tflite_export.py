@@ -0,0 +1,22 @@
+# Generated by Django 4.2.13 on 2026-10-18 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("inference", "0008_inference_confusion_matrix"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="inference",
+            name="tflite_export",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="inference",
+            name="tflite_threads",
+            field=models.IntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.13 on 2026-10-18 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("inference", "0009_inference_tflite_export"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="inference",
+            name="sparse_benchmark",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="inference",
+            name="sparse_min_sparsity",
+            field=models.FloatField(default=0.5),
+        ),
+    ]
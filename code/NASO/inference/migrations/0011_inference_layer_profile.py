@@ -0,0 +1,17 @@
+# Generated by Django 4.2.13 on 2026-10-18 17:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("inference", "0010_inference_sparse_benchmark"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="inference",
+            name="layer_profile",
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.13 on 2026-10-18 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("inference", "0011_inference_layer_profile"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="inference",
+            name="dataset_cache",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
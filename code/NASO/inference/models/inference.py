@@ -1,11 +1,27 @@
 import os
 
-import numpy as np
 import tensorflow as tf
+from decouple import config
 from django.db import models
-from sklearn.metrics import accuracy_score
 
+from helper_scripts.database import lock_safe_db_operation
+from helper_scripts.dataset_cache import merge_cache_statistics
+from helper_scripts.energy_attribution import energy_profiler
 from helper_scripts.importing import get_object
+from helper_scripts.sparse_inference import densify_model, sparsify_model
+from inference.helper_scripts.benchmark import (
+    LatencyBenchmark,
+    build_predict_step,
+    run_batch_size_sweep,
+)
+from inference.helper_scripts.evaluation import (
+    StreamingClassificationMetrics,
+    stream_predict,
+)
+from inference.helper_scripts.layer_profile import profile_layers
+from inference.helper_scripts.model_cache import get_model_cache
+from inference.helper_scripts.tflite import export_tflite, flatten_variant_metrics
+from naso.settings import TFLITE_EVALUATION_SAMPLES
 from neural_architecture.helper_scripts.architecture import calculate_flops
 from neural_architecture.models.dataset import Dataset
 from neural_architecture.NetworkCallbacks.timing_callback import TimingCallback
@@ -46,11 +62,32 @@ class Inference(models.Model):
     )
     batch_size = models.IntegerField(default=1)
     flops = models.IntegerField(default=0)
+    # latency benchmark, disabled if there are neither iterations nor a time budget
+    benchmark_warmup = models.IntegerField(default=10)
+    benchmark_iterations = models.IntegerField(default=0)
+    benchmark_time_budget = models.FloatField(default=0)
+    benchmark_trials = models.IntegerField(default=5)
+    # batch size sweep, disabled if empty. The latency SLO in ms stops the sweep, 0 for none
+    sweep_batch_sizes = models.JSONField(default=list, blank=True)
+    latency_slo = models.FloatField(default=0)
+    # export of TFLite variants, benchmarked on the interpreter with the given threads
+    tflite_export = models.BooleanField(default=False)
+    tflite_threads = models.IntegerField(default=1)
+    # latency of the model with dense and with sparse matmuls in Dense layers above the sparsity
+    sparse_benchmark = models.BooleanField(default=False)
+    sparse_min_sparsity = models.FloatField(default=0.5)
+    # latency of every layer in isolation, with the benchmark warm up, iterations and trials
+    layer_profile = models.BooleanField(default=False)
+    # rows are the true classes, columns the predicted ones
+    confusion_matrix = models.JSONField(default=list, blank=True)
+    # hits, misses and load time of the dataset cache, see helper_scripts.dataset_cache
+    dataset_cache = models.JSONField(default=dict, blank=True)
 
     _model = None
     _train_data = None
     _test_data = None
     _eval_data = None
+    _load_metrics = None
 
     def __str__(self):
         return self.name
@@ -109,13 +146,229 @@ class Inference(models.Model):
             self.save()
 
     def _load_model(self):
+        """
+        Loads the model through the model cache of the worker, if it is enabled. The cold load
+        time of a cache miss and the cache counters are kept in `_load_metrics`.
+        """
         self._try_link_run()
-        self._model = tf.keras.models.load_model(self.model_file)
+        model_cache = get_model_cache()
+        if model_cache:
+            self._model, load_time = model_cache.get(self.model_file)
+            self._load_metrics = model_cache.stats()
+            if load_time is not None:
+                self._load_metrics["model_load_time [s]"] = load_time
+        else:
+            self._model = tf.keras.models.load_model(self.model_file)
         if not self._train_data:
             self._load_data()
 
     def _load_data(self):
         (self._train_data, self._test_data, self._eval_data) = self.dataset.get_data()
+        if self.dataset.cache_statistics:
+            self.dataset_cache = merge_cache_statistics(
+                self.dataset_cache, self.dataset.cache_statistics
+            )
+            lock_safe_db_operation(lambda: self.save(update_fields=["dataset_cache"]))
+
+    def get_prediction_metric(self):
+        """
+        Returns the metrics of the last prediction, without the benchmark metrics.
+        """
+        for metric in self.prediction_metrics.order_by("-id"):
+            if not metric.metrics[0].get("benchmark"):
+                return metric
+        return None
+
+    def get_benchmark_metric(self, kind="latency"):
+        """
+        Returns the metrics of the last benchmark of a kind (`latency`, `sweep`, `tflite`,
+        `sparse` or `layers`) or None.
+        """
+        for metric in self.prediction_metrics.order_by("-id"):
+            benchmark = metric.metrics[0].get("benchmark")
+            # benchmarks saved before the sweep existed are flagged with True
+            if (benchmark is True and kind == "latency") or benchmark == kind:
+                return metric
+        return None
+
+    def get_sweep_metric(self):
+        return self.get_benchmark_metric("sweep")
+
+    def _benchmark_options(self):
+        return {
+            "warmup": self.benchmark_warmup,
+            "iterations": self.benchmark_iterations or 20,
+            "time_budget": self.benchmark_time_budget,
+            "trials": self.benchmark_trials,
+        }
+
+    def _save_benchmark_metric(self, data):
+        metric = TrainingMetric(epoch=0, metrics=[{"run_id": self.id, **data}])
+        lock_safe_db_operation(metric.save)
+        self.prediction_metrics.add(metric)
+
+    def run_benchmark(self):
+        """
+        Benchmarks the latency of a single batch with the configured warm up, iterations or time budget
+        and number of trials and stores the results as prediction metric.
+
+        Returns:
+            dict: The benchmark results, see `LatencyBenchmark.run`.
+        """
+        if not self._model:
+            self._load_model()
+        step, _ = build_predict_step(
+            self._model, self._train_data.batch(self.batch_size)
+        )
+        results = LatencyBenchmark(step, **self._benchmark_options()).run()
+        self._save_benchmark_metric(
+            {
+                "benchmark": "latency",
+                "batch_size": self.batch_size,
+                "metrics": results["metrics"],
+                "trials": results["trials"],
+                "histogram": results["histogram"],
+            }
+        )
+        return results
+
+    def run_batch_size_sweep(self):
+        """
+        Benchmarks the loaded model for all batch sizes of the sweep and stores the resulting
+        throughput/latency/energy curve as prediction metric.
+
+        Returns:
+            list[dict]: The points of the curve, see `run_batch_size_sweep`.
+        """
+        if not self._model:
+            self._load_model()
+        with energy_profiler(self.gpu) as profiler:
+            points = run_batch_size_sweep(
+                self._model,
+                self._train_data,
+                self.sweep_batch_sizes,
+                latency_slo=self.latency_slo,
+                profiler=profiler,
+                **self._benchmark_options(),
+            )
+        valid_points = [point for point in points if point["status"] != "oom"]
+        metrics = {}
+        if valid_points:
+            best = max(valid_points, key=lambda point: point["samples_per_second"])
+            metrics = {
+                "sweep_max_samples_per_second": best["samples_per_second"],
+                "sweep_best_batch_size": best["batch_size"],
+                "sweep_max_batch_size": valid_points[-1]["batch_size"],
+            }
+        self._save_benchmark_metric(
+            {"benchmark": "sweep", "metrics": metrics, "points": points}
+        )
+        return points
+
+    def get_tflite_metric(self):
+        return self.get_benchmark_metric("tflite")
+
+    def run_tflite_export(self):
+        """
+        Exports the model as float32, dynamic range int8 and full integer int8 TFLite files and
+        stores size, latency, energy and accuracy delta of every variant as prediction metric.
+
+        Returns:
+            list[dict]: The results per variant, see `export_tflite`.
+        """
+        if not self._model:
+            self._load_model()
+        name = os.path.splitext(os.path.basename(self.model_file))[0]
+        # the interpreter runs on the CPU, whatever device the run uses
+        with energy_profiler("CPU:0") as profiler:
+            variants = export_tflite(
+                self._model,
+                self._train_data,
+                config("TENSORFLOW_MODEL_PATH") + "tflite/",
+                f"{name}_{self.id}",
+                batch_size=self.batch_size,
+                num_threads=self.tflite_threads,
+                profiler=profiler,
+                evaluation_samples=TFLITE_EVALUATION_SAMPLES,
+                **self._benchmark_options(),
+            )
+        self._save_benchmark_metric(
+            {
+                "benchmark": "tflite",
+                "metrics": flatten_variant_metrics(variants),
+                "variants": variants,
+            }
+        )
+        return variants
+
+    def get_sparse_metric(self):
+        return self.get_benchmark_metric("sparse")
+
+    def run_sparse_benchmark(self):
+        """
+        Benchmarks the model once with dense matmuls only and once with SparseDense layers for
+        all Dense layers whose sparsity is above `sparse_min_sparsity` and the measured crossover,
+        and stores the latency of both variants and the decision per layer as prediction metric.
+
+        Returns:
+            dict: The latency metrics of both variants, the speedup and the layer report.
+        """
+        if not self._model:
+            self._load_model()
+        dense_model = densify_model(self._model)
+        sparse_model, report = sparsify_model(
+            dense_model,
+            self.sparse_min_sparsity,
+            self.batch_size,
+            **self._benchmark_options(),
+        )
+        dataset = self._train_data.batch(self.batch_size)
+        variants = []
+        for variant, model in [("dense", dense_model), ("sparse", sparse_model)]:
+            step, _ = build_predict_step(model, dataset)
+            results = LatencyBenchmark(step, **self._benchmark_options()).run()
+            variants.append({"variant": variant, **results["metrics"]})
+        metrics = {
+            "dense_latency_p50 [ms]": variants[0]["latency_p50 [ms]"],
+            "sparse_latency_p50 [ms]": variants[1]["latency_p50 [ms]"],
+            "sparse_speedup": variants[0]["latency_p50 [ms]"]
+            / variants[1]["latency_p50 [ms]"],
+            "sparse_layers": report["sparse_layers"],
+        }
+        self._save_benchmark_metric(
+            {
+                "benchmark": "sparse",
+                "batch_size": self.batch_size,
+                "metrics": metrics,
+                "variants": variants,
+                "layers": report["layers"],
+            }
+        )
+        return {**metrics, **report}
+
+    def get_layer_profile_metric(self):
+        return self.get_benchmark_metric("layers")
+
+    def run_layer_profile(self):
+        """
+        Measures the latency of every layer in isolation on inputs recorded from the dataset and
+        stores latency, FLOPs, activation and parameter bytes per layer as prediction metric.
+
+        Returns:
+            dict: The profile, see `profile_layers`.
+        """
+        if not self._model:
+            self._load_model()
+        profile = profile_layers(
+            self._model,
+            self._train_data,
+            self.batch_size,
+            **self._benchmark_options(),
+        )
+        self._save_benchmark_metric(
+            {"benchmark": "layers", "batch_size": self.batch_size, **profile}
+        )
+        return profile
 
     def predict(self, datapoint):
         """
@@ -127,32 +380,39 @@ class Inference(models.Model):
         return self._model.predict(datapoint)
 
     def measure_inference(self, callbacks=[], **kwargs):
+        """
+        Runs the model once over the dataset and evaluates the predictions batch by batch, so
+        the memory does not grow with the dataset. The accuracy is added to the prediction metrics
+        and the confusion matrix is stored on the inference. Afterwards the configured benchmark
+        and batch size sweep are run.
+
+        Returns:
+            dict: The evaluation results, e.g. `accuracy`.
+        """
         if not self._model:
             self._load_model()
         timer = TimingCallback()
         self.flops = calculate_flops(self._model, self.batch_size)
         self.save()
-        predictions = self._model.predict(
+        metrics = StreamingClassificationMetrics()
+        results = stream_predict(
+            self._model,
             self._train_data.batch(self.batch_size),
-            batch_size=self.batch_size,
-            verbose=2,
             callbacks=[timer] + self.get_callbacks() + callbacks,
+            metrics=metrics,
+            logs=self._load_metrics,
         )
-        try:
-            predicted_classes = tf.argmax(
-                predictions[list(predictions.keys())[0]], axis=1
-            )
-
-            true_labels = np.concatenate(
-                [y for x, y in self._train_data.batch(self.batch_size)], axis=0
-            )
-            print(predicted_classes[0])
-            print(true_labels[0])
-
-            accuracy = accuracy_score(true_labels, predicted_classes)
-            print("accuracy:", accuracy)
-        except Exception as e:
-            print(
-                f"Something went wrong with calculating the accuracy, Error: {str(e)}"
-            )
-        return predictions
+        if metrics.samples:
+            self.confusion_matrix = metrics.confusion_matrix.tolist()
+            self.save()
+        if self.benchmark_iterations > 0 or self.benchmark_time_budget > 0:
+            self.run_benchmark()
+        if self.sweep_batch_sizes:
+            self.run_batch_size_sweep()
+        if self.tflite_export:
+            self.run_tflite_export()
+        if self.sparse_benchmark:
+            self.run_sparse_benchmark()
+        if self.layer_profile:
+            self.run_layer_profile()
+        return results
@@ -0,0 +1,433 @@
+import math
+import os
+import tempfile
+import threading
+from unittest import mock
+
+import numpy as np
+import tensorflow as tf
+from django.test import SimpleTestCase
+
+from helper_scripts.power_sampler import StreamingCommandPowerSource
+from inference.helper_scripts.benchmark import (
+    LatencyBenchmark,
+    confidence_interval,
+    parse_batch_sizes,
+    run_batch_size_sweep,
+    summarize_latencies,
+)
+from inference.helper_scripts.evaluation import (
+    StreamingClassificationMetrics,
+    stream_predict,
+)
+from inference.helper_scripts.layer_profile import profile_layers
+from inference.helper_scripts.model_cache import ModelCache
+from inference.helper_scripts.serving import MicroBatcher
+from inference.helper_scripts.tflite import (
+    TFLITE_VARIANTS,
+    convert_to_tflite,
+    export_tflite,
+    flatten_variant_metrics,
+)
+from inference.models.inference import Inference
+
+
+class LatencyBenchmarkTestCase(SimpleTestCase):
+    def test_summarize_latencies(self):
+        # 1 ms to 99 ms and one outlier of 1 s
+        latencies = [i * 1_000_000 for i in range(1, 100)] + [1_000_000_000]
+        summary = summarize_latencies(latencies)
+        self.assertEqual(summary["iterations"], 100)
+        self.assertEqual(summary["latency_min [ms]"], 1.0)
+        self.assertEqual(summary["latency_max [ms]"], 1000.0)
+        self.assertAlmostEqual(summary["latency_p50 [ms]"], 50.5)
+        self.assertIn("latency_p99.9 [ms]", summary)
+        self.assertEqual(summary["latency_outliers"], 1)
+
+    def test_confidence_interval(self):
+        mean, half_width = confidence_interval([10.0, 12.0, 14.0])
+        self.assertEqual(mean, 12.0)
+        # t(0.975, 2) * 2 / sqrt(3)
+        self.assertAlmostEqual(half_width, 4.968275, places=5)
+        self.assertTrue(math.isnan(confidence_interval([1.0])[1]))
+
+    def test_iterations_and_trials(self):
+        calls = []
+        benchmark = LatencyBenchmark(
+            lambda: calls.append(1), warmup=3, iterations=20, trials=4
+        )
+        results = benchmark.run()
+        self.assertEqual(len(calls), 4 * (3 + 20))
+        self.assertEqual(len(results["trials"]), 4)
+        self.assertEqual(results["metrics"]["iterations"], 80)
+        self.assertEqual(sum(results["histogram"]["counts"]), 80)
+        self.assertIn("latency_trial_mean_ci95 [ms]", results["metrics"])
+
+    def test_time_budget(self):
+        benchmark = LatencyBenchmark(
+            lambda: None, warmup=0, iterations=1, time_budget=0.01, trials=1
+        )
+        self.assertGreater(len(benchmark.run_trial()), 1)
+
+
+class BatchSizeSweepTestCase(SimpleTestCase):
+    def setUp(self):
+        self.model = tf.keras.Sequential(
+            [tf.keras.Input(shape=(4,)), tf.keras.layers.Dense(2)]
+        )
+        self.dataset = tf.data.Dataset.from_tensor_slices(
+            (np.ones((10, 4), dtype=np.float32), np.zeros(10))
+        )
+
+    def test_parse_batch_sizes(self):
+        self.assertEqual(parse_batch_sizes("32, 1,8"), [1, 8, 32])
+        self.assertEqual(parse_batch_sizes("1-64"), [1, 2, 4, 8, 16, 32, 64])
+        self.assertEqual(parse_batch_sizes("1-100:10"), [1, 10, 100])
+        self.assertEqual(parse_batch_sizes(""), [])
+        for value in ["0,4", "8-2", "1-8:1", "a"]:
+            with self.assertRaises(ValueError):
+                parse_batch_sizes(value)
+
+    def test_sweep_stops_at_dataset_size(self):
+        points = run_batch_size_sweep(
+            self.model, self.dataset, [2, 4, 16, 32], warmup=1, iterations=3, trials=1
+        )
+        self.assertEqual([point["batch_size"] for point in points], [2, 4, 16])
+        self.assertEqual(points[-1]["samples_per_step"], 10)
+        for point in points:
+            self.assertEqual(point["status"], "ok")
+            self.assertGreater(point["samples_per_second"], 0)
+
+    def test_inference_sweep_without_power_source(self):
+        inference = Inference(
+            gpu="GPU:0",
+            sweep_batch_sizes=[1, 2],
+            benchmark_warmup=1,
+            benchmark_iterations=2,
+            benchmark_trials=1,
+        )
+        inference._model = self.model
+        inference._train_data = self.dataset
+        source = StreamingCommandPowerSource(["/nonexistent/power-tool"])
+        with mock.patch(
+            "helper_scripts.power_sampler.get_power_source", return_value=source
+        ), mock.patch.object(Inference, "_save_benchmark_metric") as save_metric:
+            points = inference.run_batch_size_sweep()
+        self.assertEqual([point["batch_size"] for point in points], [1, 2])
+        self.assertNotIn("energy_per_sample [J]", points[0])
+        save_metric.assert_called_once()
+
+    def test_sweep_stops_at_latency_slo(self):
+        points = run_batch_size_sweep(
+            self.model,
+            self.dataset,
+            [1, 2, 4],
+            latency_slo=1e-9,
+            warmup=1,
+            iterations=3,
+            trials=1,
+        )
+        self.assertEqual(len(points), 1)
+        self.assertEqual(points[0]["status"], "slo_exceeded")
+
+
+class StreamingEvaluationTestCase(SimpleTestCase):
+    def test_confusion_matrix(self):
+        metrics = StreamingClassificationMetrics()
+        metrics.update([0, 1], np.array([[0.9, 0.1, 0.0], [0.2, 0.7, 0.1]]))
+        # one-hot labels
+        metrics.update(
+            [[0, 0, 1], [1, 0, 0]], np.array([[0.1, 0.1, 0.8], [0.1, 0.8, 0.1]])
+        )
+        np.testing.assert_array_equal(
+            metrics.confusion_matrix, [[1, 1, 0], [0, 1, 0], [0, 0, 1]]
+        )
+        self.assertEqual(metrics.result(), {"accuracy": 0.75, "evaluated_samples": 4})
+
+    def test_binary_outputs(self):
+        metrics = StreamingClassificationMetrics()
+        metrics.update(np.array([1.0, 0.0, 1.0]), np.array([[0.8], [0.6], [0.3]]))
+        np.testing.assert_array_equal(metrics.confusion_matrix, [[0, 1], [1, 1]])
+
+    def test_regression_labels_are_not_evaluated(self):
+        metrics = StreamingClassificationMetrics()
+        for labels in [[120.5, 98.0], [5000, 7000], [[0.2, 0.8], [1.0, 0.0]]]:
+            with self.assertRaises(ValueError):
+                metrics.update(np.array(labels), np.array([[0.3], [0.9]]))
+        self.assertEqual(metrics.confusion_matrix.size, 0)
+
+        model = tf.keras.Sequential(
+            [tf.keras.Input(shape=(2,)), tf.keras.layers.Dense(1)]
+        )
+        dataset = tf.data.Dataset.from_tensor_slices(
+            (np.ones((4, 2), dtype=np.float32), np.array([80.0, 95.5, 130.0, 2.0e6]))
+        )
+        results = stream_predict(
+            model, dataset.batch(2), metrics=StreamingClassificationMetrics()
+        )
+        self.assertNotIn("accuracy", results)
+
+    def test_stream_predict(self):
+        class BatchCounter(tf.keras.callbacks.Callback):
+            def __init__(self):
+                super().__init__()
+                self.sizes = []
+                self.end_logs = None
+
+            def on_predict_batch_end(self, batch, logs=None):
+                self.sizes.append(len(logs["outputs"]))
+
+            def on_predict_end(self, logs=None):
+                self.end_logs = logs
+
+        model = tf.keras.Sequential(
+            [tf.keras.Input(shape=(2,)), tf.keras.layers.Dense(2, use_bias=False)]
+        )
+        model.set_weights([np.eye(2, dtype=np.float32)])
+        inputs = np.array([[1, 0], [0, 1], [1, 0], [1, 0], [0, 1]], dtype=np.float32)
+        labels = np.array([0, 1, 1, 0, 1])
+        counter = BatchCounter()
+        results = stream_predict(
+            model,
+            tf.data.Dataset.from_tensor_slices((inputs, labels)).batch(2),
+            callbacks=[counter],
+            metrics=StreamingClassificationMetrics(),
+        )
+        self.assertEqual(counter.sizes, [2, 2, 1])
+        self.assertEqual(results["accuracy"], 0.8)
+        self.assertEqual(counter.end_logs["accuracy"], 0.8)
+
+
+class ModelCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.loaded = []
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_model(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(content)
+        return path
+
+    def load(self, path):
+        self.loaded.append(path)
+        with open(path, encoding="utf-8") as file:
+            return file.read()
+
+    def test_hits_and_modified_files(self):
+        cache = ModelCache(100, loader=self.load, size_of=len)
+        path = self.write_model("a.keras", "model a")
+        model, load_time = cache.get(path)
+        self.assertEqual(model, "model a")
+        self.assertIsNotNone(load_time)
+        self.assertEqual(cache.get(path), ("model a", None))
+
+        self.write_model("a.keras", "model a, retrained")
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000))
+        self.assertEqual(cache.get(path)[0], "model a, retrained")
+        self.assertEqual(len(self.loaded), 2)
+        stats = cache.stats()
+        self.assertEqual(stats["model_cache_hits"], 1)
+        self.assertEqual(stats["model_cache_misses"], 2)
+        self.assertEqual(stats["model_cache_models"], 1)
+
+    def test_lru_eviction(self):
+        cache = ModelCache(20, loader=self.load, size_of=len)
+        first = self.write_model("first.keras", "x" * 8)
+        second = self.write_model("second.keras", "y" * 8)
+        third = self.write_model("third.keras", "z" * 8)
+        cache.get(first)
+        cache.get(second)
+        cache.get(first)
+        cache.get(third)
+        self.assertEqual(cache.stats()["model_cache_evictions"], 1)
+        self.assertEqual(cache.memory_usage, 16)
+        # second was least recently used
+        cache.get(first)
+        cache.get(second)
+        self.assertEqual(self.loaded, [first, second, third, second])
+
+    def test_model_over_budget(self):
+        cache = ModelCache(4, loader=self.load, size_of=len)
+        path = self.write_model("large.keras", "too large")
+        cache.get(path)
+        cache.get(path)
+        self.assertEqual(cache.stats()["model_cache_misses"], 2)
+        self.assertEqual(cache.stats()["model_cache_models"], 0)
+
+
+class MicroBatcherTestCase(SimpleTestCase):
+    def setUp(self):
+        self.batch_sizes = []
+
+    def predict(self, batch):
+        self.batch_sizes.append(len(batch))
+        return {"double": batch * 2, "sum": batch.sum(axis=1)}
+
+    def test_concurrent_requests_are_batched(self):
+        batcher = MicroBatcher(self.predict, max_batch_size=8, max_delay=0.2)
+        futures = [batcher.submit(np.full((2, 3), i)) for i in range(3)]
+        results = [future.result(timeout=5) for future in futures]
+        self.assertEqual(self.batch_sizes, [6])
+        for i, result in enumerate(results):
+            np.testing.assert_array_equal(
+                result["outputs"]["double"], np.full((2, 3), 2 * i)
+            )
+            np.testing.assert_array_equal(result["outputs"]["sum"], [3 * i, 3 * i])
+            self.assertEqual(result["batch_size"], 6)
+        self.assertEqual(batcher.stats()["requests"], 3)
+        self.assertEqual(batcher.stats()["batches"], 1)
+
+    def test_max_batch_size_and_shapes(self):
+        batcher = MicroBatcher(self.predict, max_batch_size=4, max_delay=0.2)
+        futures = [
+            batcher.submit(np.ones((3, 2))),
+            batcher.submit(np.ones((1, 5))),
+            batcher.submit(np.ones((2, 2))),
+        ]
+        for future in futures:
+            future.result(timeout=5)
+        self.assertEqual(sorted(self.batch_sizes), [1, 2, 3])
+
+    def test_errors_are_raised_per_request(self):
+        batcher = MicroBatcher(lambda batch: 1 / 0, max_delay=0)
+        with self.assertRaises(ZeroDivisionError):
+            batcher.submit([[1.0]]).result(timeout=5)
+
+    def test_requests_are_served_after_a_cancelled_one(self):
+        running, release = threading.Event(), threading.Event()
+
+        def predict(batch):
+            running.set()
+            release.wait(5)
+            return batch
+
+        batcher = MicroBatcher(predict, max_delay=0)
+        first = batcher.submit([[1.0]])
+        running.wait(5)
+        # times out in the queue while the first batch runs
+        self.assertTrue(batcher.submit([[2.0]]).cancel())
+        release.set()
+        first.result(timeout=5)
+        result = batcher.submit([[3.0]]).result(timeout=5)
+        np.testing.assert_array_equal(result["outputs"], [[3.0]])
+
+
+class TfliteExportTestCase(SimpleTestCase):
+    def test_export_variants(self):
+        model = tf.keras.Sequential(
+            [
+                tf.keras.Input(shape=(4,)),
+                tf.keras.layers.Dense(8, activation="relu"),
+                tf.keras.layers.Dense(3, activation="softmax"),
+            ]
+        )
+        inputs = np.random.default_rng(0).random((20, 4), dtype=np.float32)
+        labels = np.argmax(model.predict(inputs, verbose=0), axis=1)
+        dataset = tf.data.Dataset.from_tensor_slices((inputs, labels))
+        with tempfile.TemporaryDirectory() as directory:
+            variants = export_tflite(
+                model,
+                dataset,
+                directory,
+                "model",
+                batch_size=4,
+                num_threads=2,
+                calibration_samples=10,
+                warmup=1,
+                iterations=3,
+                trials=1,
+            )
+            self.assertEqual(
+                [variant["variant"] for variant in variants], TFLITE_VARIANTS
+            )
+            for variant in variants:
+                self.assertEqual(os.path.getsize(variant["file"]), variant["size"])
+                self.assertIn("latency_p50 [ms]", variant)
+        # the labels are the predictions of the keras model
+        self.assertEqual(variants[0]["accuracy"], 1.0)
+        self.assertEqual(variants[0]["accuracy_delta"], 0.0)
+        self.assertGreaterEqual(variants[2]["accuracy"], 0.5)
+        self.assertIn("tflite_full_int8_size", flatten_variant_metrics(variants))
+
+    def test_failed_variant_is_recorded(self):
+        model = tf.keras.Sequential(
+            [tf.keras.Input(shape=(4,)), tf.keras.layers.Dense(3)]
+        )
+        dataset = tf.data.Dataset.from_tensor_slices(
+            (np.ones((8, 4), dtype=np.float32), np.zeros(8, dtype=np.int64))
+        )
+
+        def convert(model, variant, *args):
+            if variant == "full_int8":
+                raise RuntimeError("no int8 kernel")
+            return convert_to_tflite(model, variant, *args)
+
+        with tempfile.TemporaryDirectory() as directory, mock.patch(
+            "inference.helper_scripts.tflite.convert_to_tflite", side_effect=convert
+        ):
+            variants = export_tflite(
+                model, dataset, directory, "model", warmup=1, iterations=2, trials=1
+            )
+        self.assertEqual(
+            variants[2], {"variant": "full_int8", "error": "no int8 kernel"}
+        )
+        self.assertIn("latency_p50 [ms]", variants[1])
+        self.assertNotIn("tflite_full_int8_size", flatten_variant_metrics(variants))
+
+    def test_export_without_power_source(self):
+        inference = Inference(
+            id=1,
+            model_file="model.keras",
+            batch_size=2,
+            benchmark_warmup=1,
+            benchmark_iterations=2,
+            benchmark_trials=1,
+        )
+        inference._model = tf.keras.Sequential(
+            [tf.keras.Input(shape=(4,)), tf.keras.layers.Dense(3)]
+        )
+        inference._train_data = tf.data.Dataset.from_tensor_slices(
+            (np.ones((8, 4), dtype=np.float32), np.zeros(8, dtype=np.int64))
+        )
+        source = StreamingCommandPowerSource(["/nonexistent/power-tool"])
+        with tempfile.TemporaryDirectory() as directory, mock.patch(
+            "inference.models.inference.config", return_value=directory + "/"
+        ), mock.patch(
+            "helper_scripts.energy_attribution.get_energy_counter", return_value=None
+        ), mock.patch(
+            "helper_scripts.power_sampler.get_power_source", return_value=source
+        ), mock.patch.object(
+            Inference, "_save_benchmark_metric"
+        ) as save_metric:
+            variants = inference.run_tflite_export()
+        self.assertEqual(len(variants), len(TFLITE_VARIANTS))
+        self.assertNotIn("energy_per_sample [J]", variants[0])
+        save_metric.assert_called_once()
+
+
+class LayerProfileTestCase(SimpleTestCase):
+    def test_every_layer_is_profiled(self):
+        inputs = tf.keras.Input(shape=(6, 4))
+        dense = tf.keras.layers.Dense(8, name="dense")(inputs)
+        attention = tf.keras.layers.MultiHeadAttention(2, 4)(dense, dense)
+        outputs = tf.keras.layers.Add(name="add")([dense, attention])
+        model = tf.keras.Model(inputs, outputs)
+        dataset = tf.data.Dataset.from_tensor_slices(
+            (np.random.rand(32, 6, 4).astype(np.float32), np.zeros(32))
+        )
+
+        profile = profile_layers(
+            model, dataset, batch_size=4, batches=2, warmup=1, iterations=3, trials=1
+        )
+        layers = {layer["name"]: layer for layer in profile["layers"]}
+        self.assertEqual(set(layers), {layer.name for layer in model.layers[1:]})
+        self.assertEqual(layers["add"]["activation_bytes"], 4 * 6 * 8 * 4)
+        self.assertEqual(layers["dense"]["parameter_bytes"], (4 * 8 + 8) * 4)
+        self.assertAlmostEqual(sum(layer["share"] for layer in profile["layers"]), 1.0)
+        self.assertEqual(
+            profile["metrics"]["hottest_layer"], profile["layers"][0]["name"]
+        )
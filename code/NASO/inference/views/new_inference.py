@@ -63,6 +63,19 @@ class NewInference(TemplateView):
             old_inference = Inference.objects.get(pk=old_inference_id)
             form.initial["name"] = old_inference.name
             form.initial["batch_size"] = old_inference.batch_size
+            form.initial["benchmark_warmup"] = old_inference.benchmark_warmup
+            form.initial["benchmark_iterations"] = old_inference.benchmark_iterations
+            form.initial["benchmark_time_budget"] = old_inference.benchmark_time_budget
+            form.initial["benchmark_trials"] = old_inference.benchmark_trials
+            form.initial["sweep_batch_sizes"] = ",".join(
+                str(batch_size) for batch_size in old_inference.sweep_batch_sizes
+            )
+            form.initial["latency_slo"] = old_inference.latency_slo
+            form.initial["tflite_export"] = old_inference.tflite_export
+            form.initial["tflite_threads"] = old_inference.tflite_threads
+            form.initial["sparse_benchmark"] = old_inference.sparse_benchmark
+            form.initial["sparse_min_sparsity"] = old_inference.sparse_min_sparsity
+            form.initial["layer_profile"] = old_inference.layer_profile
             form.initial["load_model"] = old_inference.model_file
             form.initial["metrics"] = [
                 metric.instance_type for metric in old_inference.metrics.all()
@@ -92,6 +105,17 @@ class NewInference(TemplateView):
                     gpu=gpu,
                     worker=queue,
                     batch_size=form.cleaned_data["batch_size"],
+                    benchmark_warmup=form.cleaned_data["benchmark_warmup"],
+                    benchmark_iterations=form.cleaned_data["benchmark_iterations"],
+                    benchmark_time_budget=form.cleaned_data["benchmark_time_budget"],
+                    benchmark_trials=form.cleaned_data["benchmark_trials"],
+                    sweep_batch_sizes=form.cleaned_data["sweep_batch_sizes"],
+                    latency_slo=form.cleaned_data["latency_slo"],
+                    tflite_export=form.cleaned_data["tflite_export"],
+                    tflite_threads=form.cleaned_data["tflite_threads"],
+                    sparse_benchmark=form.cleaned_data["sparse_benchmark"],
+                    sparse_min_sparsity=form.cleaned_data["sparse_min_sparsity"],
+                    layer_profile=form.cleaned_data["layer_profile"],
                 )
                 inference.save()
                 inference.metrics.set(
@@ -58,9 +58,41 @@ MEDIA_URL = "/media/"
 # Kaggle interaction:
 KAGGLE_USERNAME = config("KAGGLE_USERRNAME", default="")
 KAGGLE_API_KEY = config("KAGGLE_KEY", default="")
-ENERGY_MEASUREMENT_FREQUENCY = config(
-    "ENERGY_MEASUREMENT_FREQUENCY", default=0.5, cast=float
+# power sampler: seconds between two power readings and number of readings kept per device
+POWER_SAMPLING_INTERVAL = config("POWER_SAMPLING_INTERVAL", default=0.1, cast=float)
+POWER_SAMPLER_BUFFER_SIZE = config(
+    "POWER_SAMPLER_BUFFER_SIZE", default=100000, cast=int
 )
+# sysfs directory with the RAPL energy counters used for exact CPU energy measurements
+RAPL_POWERCAP_ROOT = config("RAPL_POWERCAP_ROOT", default="/sys/class/powercap")
+# seconds the idle power of a device is measured before the first phase, 0 disables the idle baseline
+IDLE_POWER_MEASUREMENT_DURATION = config(
+    "IDLE_POWER_MEASUREMENT_DURATION", default=1.0, cast=float
+)
+# before predictions the power must stay within SETTLE_TOLERANCE (relative) of the idle power
+# for SETTLE_WINDOW seconds; the measurement starts anyway after SETTLE_TIMEOUT seconds
+SETTLE_TOLERANCE = config("SETTLE_TOLERANCE", default=0.1, cast=float)
+SETTLE_WINDOW = config("SETTLE_WINDOW", default=0.5, cast=float)
+SETTLE_TIMEOUT = config("SETTLE_TIMEOUT", default=10.0, cast=float)
+# maximum number of values a chart may request of the power series of a run
+POWER_WINDOW_MAX_POINTS = config("POWER_WINDOW_MAX_POINTS", default=5000, cast=int)
+# megabytes of model weights the inference workers keep loaded between tasks, 0 disables the cache
+MODEL_CACHE_MEMORY_BUDGET = config("MODEL_CACHE_MEMORY_BUDGET", default=2048, cast=int)
+# model serving: maximum samples of a micro batch and milliseconds a request waits for others
+SERVING_MAX_BATCH_SIZE = config("SERVING_MAX_BATCH_SIZE", default=32, cast=int)
+SERVING_MAX_DELAY = config("SERVING_MAX_DELAY", default=5.0, cast=float)
+# samples the accuracy of the TFLite variants is compared on, 0 for the whole dataset
+TFLITE_EVALUATION_SAMPLES = config("TFLITE_EVALUATION_SAMPLES", default=1000, cast=int)
+# Dense layers with less zero weights are never considered for the sparse matmul
+SPARSE_MIN_SPARSITY = config("SPARSE_MIN_SPARSITY", default=0.5, cast=float)
+# preprocessed datasets shared by the workers on disk, megabytes before the least recently used
+# datasets are evicted, 0 disables the cache
+DATASET_CACHE_PATH = config(
+    "DATASET_CACHE_PATH", default=os.path.join(BASE_DIR, "dataset_cache")
+)
+DATASET_CACHE_SIZE = config("DATASET_CACHE_SIZE", default=10240, cast=int)
+# TFRecord files per split of streaming datasets, they are read in parallel
+DATASET_SHARDS = config("DATASET_SHARDS", default=8, cast=int)
 
 # Application definition
 
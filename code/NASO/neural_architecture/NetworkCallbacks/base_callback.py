@@ -4,7 +4,7 @@ import types
 import tensorflow as tf
 
 from api.views.metrics import TensorflowMetricAPIView as MetricAPIView
-from helper_scripts.pruning import calculate_sparsity, collect_prunable_layers
+from helper_scripts.pruning import PruningBookkeeping, collect_prunable_layers
 from helper_scripts.timer import Timer
 from inference.models.inference import Inference
 from neural_architecture.helper_scripts.architecture import calculate_flops
@@ -74,6 +74,7 @@ class BaseCallback(tf.keras.callbacks.Callback):
     def on_train_begin(self, logs=None):
         # Collect all the prunable layers in the model.
         self.prunable_layers = collect_prunable_layers(self.model)
+        self.pruning_bookkeeping = PruningBookkeeping(self.model)
         if not self.prunable_layers:
             return
         # If the model is newly created/initialized, set the 'pruning_step' to 0.
@@ -131,21 +132,13 @@ class BaseCallback(tf.keras.callbacks.Callback):
         """
 
         if self.model:
-            # call prune –weights:
-            weight_mask_ops = []
-            for layer in self.prunable_layers:
-                if tf.executing_eagerly():
-                    if epoch != self.epochs - 1:
-                        layer.conditional_mask_update()
-                    layer.weight_mask_op()
-                else:
-                    if epoch != self.epochs - 1:
-                        weight_mask_ops.append(layer.conditional_mask_update())
-                    weight_mask_ops.append(layer.weight_mask_op())
-
-            K.batch_get_value(weight_mask_ops)
-            logs["sparsity"] = calculate_sparsity(self.model)
-            logs["flops"] = calculate_flops(self.model, self.batch_size)
+            # masks are updated except after the last epoch, applied and reduced on the device
+            sparsities = self.pruning_bookkeeping.layer_sparsities(
+                update_masks=epoch != self.epochs - 1
+            )
+            logs["sparsity"] = self.pruning_bookkeeping.model_sparsity(sparsities)
+            # the analysis of the architecture is cached, only the sparsities are applied
+            logs["flops"] = calculate_flops(self.model, self.batch_size, sparsities)
         metrics = {}
         for key in logs:
             if not math.isnan(logs[key]):
@@ -1,9 +1,18 @@
+import time
+
 import numpy as np
 import tensorflow as tf
-
-from helper_scripts.power_management import get_cpu_power_usage, get_gpu_power_usage
+from loguru import logger
+
+from helper_scripts.energy_attribution import EnergyProfiler
+from helper_scripts.energy_counter import get_energy_counter
+from helper_scripts.power_sampler import (
+    PowerSourceUnavailableError,
+    acquire_power_sampler,
+    release_power_sampler,
+)
 from inference.models.inference import Inference
-from naso.settings import ENERGY_MEASUREMENT_FREQUENCY
+from naso.settings import IDLE_POWER_MEASUREMENT_DURATION
 from neural_architecture.models.autokeras import AutoKerasRun
 from runs.models.training import NetworkTraining
 
@@ -13,8 +22,22 @@ class EnergyCallback(tf.keras.callbacks.Callback):
     Callback class to measure and log power consumption during training, testing, and prediction.
 
     This callback calculates the power usage of the GPU during different stages of the model's lifecycle,
-    such as training, testing, and prediction. It uses the `nvidia-smi` command-line tool to query the GPU's
-    power draw and calculates the average power usage.
+    such as training, testing, and prediction. The readings come from the shared PowerSampler of the
+    run's device, so no process is spawned per measurement; every stage just averages the readings
+    between its begin and end.
+
+    For CPU devices with RAPL energy counters the sampler is not used at all. The exact energy of
+    every epoch, test and predict phase is the difference of the counters at its begin and end and
+    is logged as "energy_consumption [J]"; the power is that energy divided by the phase duration.
+
+    Additionally an EnergyProfiler records the boundaries of every batch and attributes the energy
+    to the batches, with the idle power of the device subtracted. The results, e.g.
+    "train_batch_energy [J]" or "predict_energy_per_sample [J]", are added to the logs and end up
+    in the TrainingMetric of the epoch or phase.
+
+    The sampler is acquired at the begin of a phase and released at the end of training, testing
+    or prediction, so no sampler thread outlives the phase because Keras or a trial still holds
+    the callback. Validation inside of `fit` keeps the sampler until the end of training.
 
     The power consumption measurements are logged in the `logs` dictionary, which can be accessed by other
     callbacks or during model evaluation.
@@ -34,7 +57,6 @@ class EnergyCallback(tf.keras.callbacks.Callback):
 
     measurements = []
     trial_measurements = []
-    _last_measurement = 0
 
     def __init__(
         self, run: AutoKerasRun | Inference | NetworkTraining, *args, **kwargs
@@ -42,14 +64,104 @@ class EnergyCallback(tf.keras.callbacks.Callback):
         super().__init__(*args, **kwargs)
         self.run = run
         self.trial_measurements = []
+        self.measurements = []
+        self.sampler = None
+        self.energy_counter = get_energy_counter(run.gpu)
+        self.energy = None
+        self.profiler = None
+        self.idle_power = None
+        self.power_source_available = True
+        self._training = False
+        self._window_start = {}
+        self._energy_start = {}
+
+    def __del__(self):
+        # fallback if a phase never ended, e.g. because fit raised;
+        # the module globals may already be gone at interpreter shutdown
+        if self.sampler and release_power_sampler:
+            release_power_sampler(self.sampler.device)
+            self.sampler = None
+
+    def release_sampler(self):
+        """
+        Releases the sampler of the device. The profiler holds the sampler as well and is dropped
+        with it; the idle power is kept, so the next phase does not measure it again.
+        """
+        self.profiler = None
+        if self.sampler:
+            release_power_sampler(self.sampler.device)
+            self.sampler = None
+
+    def start_measuring(self, phase: str):
+        """
+        Starts a new measurement window of a phase. Validation runs inside of an epoch, so every
+        phase has its own window. The sampler of the device is acquired and the idle power is
+        measured on first use.
 
-    def measure_power(self):
-        if self.run.gpu.startswith("GPU"):
-            measurement = get_gpu_power_usage(self.run.gpu)
-            self.measurements.append(measurement)
-        elif self.run.gpu.startswith("CPU"):
-            measurement = get_cpu_power_usage(self.run.gpu)
-            self.measurements.append(measurement)
+        Args:
+            phase (str): `train`, `test` or `predict`.
+        """
+        self.measurements = []
+        self.energy = None
+        if not self.energy_counter and not self.sampler:
+            if not self.run.gpu.startswith(("GPU", "CPU")):
+                return
+            if not self.power_source_available:
+                return
+            try:
+                self.sampler = acquire_power_sampler(self.run.gpu)
+            except PowerSourceUnavailableError as exc:
+                logger.warning(f"Power is not measured: {exc}")
+                self.power_source_available = False
+                return
+            self.sampler.wait_for_sample()
+        if not self.profiler:
+            self.profiler = EnergyProfiler(self.sampler, self.energy_counter)
+            if self.idle_power is None:
+                self.idle_power = self.profiler.measure_idle_power(
+                    IDLE_POWER_MEASUREMENT_DURATION
+                )
+            else:
+                self.profiler.idle_power = self.idle_power
+                if self.sampler:
+                    self.sampler.idle_power = self.idle_power
+        if self.energy_counter:
+            self._energy_start[phase] = self.energy_counter.read()
+        self._window_start[phase] = time.monotonic()
+        self.profiler.begin_phase(phase)
+
+    def measure_power(self, phase: str):
+        """
+        Collects all power readings of the measurement window of the phase in `measurements`.
+        With energy counters, `energy` is set to the joules of the window and the only
+        measurement is the average power derived from it.
+        """
+        window_end = time.monotonic()
+        window_start = self._window_start.get(phase)
+        if window_start is None:
+            return
+        if self.energy_counter:
+            self.energy = self.energy_counter.read() - self._energy_start[phase]
+            duration = window_end - window_start
+            if duration > 0:
+                self.measurements = [self.energy / duration]
+        elif self.sampler:
+            self.measurements = self.sampler.get_measurements(window_start, window_end)
+
+    def attribute_energy(self, phase: str, logs):
+        """
+        Adds the energy the profiler attributed to the batches of the phase to the logs.
+        """
+        if self.profiler and logs is not None:
+            logs.update(self.profiler.attribute(phase))
+
+    def begin_batch(self, phase: str):
+        if self.profiler:
+            self.profiler.begin_batch(phase)
+
+    def end_batch(self, phase: str, size: int = None):
+        if self.profiler:
+            self.profiler.end_batch(phase, size)
 
     def on_epoch_begin(self, epoch, logs=None, *args):
         """
@@ -66,8 +178,7 @@ class EnergyCallback(tf.keras.callbacks.Callback):
         """
         if logs is None:
             logs = []
-        self.measurements = []
-        self.measure_power()
+        self.start_measuring("train")
 
     def on_epoch_end(self, epoch, logs=None, *args):
         """
@@ -84,7 +195,10 @@ class EnergyCallback(tf.keras.callbacks.Callback):
         """
         if logs is None:
             logs = []
-        self.measure_power()
+        self.measure_power("train")
+        if not self.measurements:
+            return
+        self.attribute_energy("train", logs)
 
         # calculate average power usage:
         average_power_usage = sum(self.measurements) / len(self.measurements)
@@ -94,11 +208,26 @@ class EnergyCallback(tf.keras.callbacks.Callback):
             self.trial_measurements
         )
         logs["trial_power_consumption_var"] = np.var(self.trial_measurements)
+        if self.energy is not None:
+            logs["energy_consumption [J]"] = self.energy
         if "execution_time" in logs:
             logs["energy_consumption [Ws]"] = (
                 average_power_usage * logs["execution_time"]
             )
 
+    def on_train_begin(self, logs=None):
+        self._training = True
+
+    def on_train_end(self, logs=None):
+        self._training = False
+        self.release_sampler()
+
+    def on_train_batch_begin(self, batch, logs=None):
+        self.begin_batch("train")
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.end_batch("train")
+
     def on_test_begin(self, logs=None):
         """
         Called at the beginning of the testing phase.
@@ -110,8 +239,7 @@ class EnergyCallback(tf.keras.callbacks.Callback):
         Returns:
             None
         """
-        self.measurements = []
-        self.measure_power()
+        self.start_measuring("test")
 
     def on_test_end(self, logs=None):
         """
@@ -128,14 +256,27 @@ class EnergyCallback(tf.keras.callbacks.Callback):
         appends it to the measurements list, and calculates the average power usage
         based on all the measurements. The average power usage is then added to the
         logs dictionary with the key "power_consumption".
+        The sampler is released, unless the test is the validation of a training.
         """
-        self.measure_power()
-        average_power_usage = sum(self.measurements) / len(self.measurements)
-        logs["power_consumption"] = average_power_usage
-        logs["power_consumption_var"] = np.var(self.measurements)
+        try:
+            self.measure_power("test")
+            if not self.measurements:
+                return
+            self.attribute_energy("test", logs)
+            average_power_usage = sum(self.measurements) / len(self.measurements)
+            logs["power_consumption"] = average_power_usage
+            logs["power_consumption_var"] = np.var(self.measurements)
+            if self.energy is not None:
+                logs["energy_consumption [J]"] = self.energy
+        finally:
+            if not self._training:
+                self.release_sampler()
+
+    def on_test_batch_begin(self, batch, logs=None):
+        self.begin_batch("test")
 
     def on_test_batch_end(self, batch, logs=None):
-        self.measure_power()
+        self.end_batch("test")
 
     def on_predict_begin(self, logs=None):
         """
@@ -147,7 +288,7 @@ class EnergyCallback(tf.keras.callbacks.Callback):
         Returns:
             None
         """
-        self.measurements = []
+        self.start_measuring("predict")
 
     def on_predict_end(self, logs=None):
         """
@@ -161,30 +302,36 @@ class EnergyCallback(tf.keras.callbacks.Callback):
 
         This method calculates the power usage measurement at the end of each prediction and updates
         the average power usage. This is then added to the logs dictionary with the key "power_consumption".
+        The sampler is released, unless the prediction runs inside of a training.
         """
-        self.measure_power()
-        average_power_usage = sum(self.measurements) / len(self.measurements)
-        logs["power_consumption"] = average_power_usage
-        logs["power_consumption_var"] = np.var(self.measurements)
-        logs["power_consumption_max"] = np.max(self.measurements)
-        logs["power_consumption_min"] = np.min(self.measurements)
-        logs["power_consumption_median"] = np.median(self.measurements)
-        if "execution_time_mean" in logs:
-            logs["energy_consumption [Ws]"] = (
-                average_power_usage * logs["execution_time_mean"]
-            )
+        try:
+            self.measure_power("predict")
+            if not self.measurements:
+                return
+            self.attribute_energy("predict", logs)
+            average_power_usage = sum(self.measurements) / len(self.measurements)
+            logs["power_consumption"] = average_power_usage
+            logs["power_consumption_var"] = np.var(self.measurements)
+            logs["power_consumption_max"] = np.max(self.measurements)
+            logs["power_consumption_min"] = np.min(self.measurements)
+            logs["power_consumption_median"] = np.median(self.measurements)
+            if self.energy is not None:
+                logs["energy_consumption [J]"] = self.energy
+            if "execution_time_mean" in logs:
+                logs["energy_consumption [Ws]"] = (
+                    average_power_usage * logs["execution_time_mean"]
+                )
+        finally:
+            if not self._training:
+                self.release_sampler()
+
+    def on_predict_batch_begin(self, batch, logs=None):
+        self.begin_batch("predict")
 
     def on_predict_batch_end(self, batch, logs=None):
-        """
-        Callback method called at the end of each batch during prediction.
-
-        Args:
-            batch: The batch index.
-            logs: Dictionary containing the loss value and other metrics.
-
-        Returns:
-            None
-        """
-        if logs["total_time"] - self._last_measurement > ENERGY_MEASUREMENT_FREQUENCY:
-            self._last_measurement = logs["total_time"]
-            self.measure_power()
+        size = None
+        if logs and "outputs" in logs:
+            outputs = tf.nest.flatten(logs["outputs"])
+            if outputs and np.ndim(outputs[0]):
+                size = np.shape(outputs[0])[0]
+        self.end_batch("predict", size)
@@ -36,11 +36,17 @@ class EvaluationBaseCallback(tf.keras.callbacks.Callback):
     times = []
     _batch = 0
 
-    def __init__(self, run: Run | Inference, given_sparsity: float = None):
+    def __init__(
+        self,
+        run: Run | Inference,
+        given_sparsity: float = None,
+        settle_time: float = None,
+    ):
         super().__init__()
         self.run = run
         self.timer = Timer()
         self.sparsity = given_sparsity
+        self.settle_time = settle_time
 
     def on_test_begin(self, logs=None):
         """
@@ -125,6 +131,8 @@ class EvaluationBaseCallback(tf.keras.callbacks.Callback):
         """
         if self.sparsity:
             logs["sparsity"] = self.sparsity
+        if self.settle_time is not None:
+            logs["settle_time"] = self.settle_time
         logs["total_batches"] = self._batch
         if self.run.gpu.startswith("GPU"):
             logs["memory_consumption"] = tf.config.experimental.get_memory_info(
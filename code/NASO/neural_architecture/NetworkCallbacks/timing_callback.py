@@ -2,7 +2,6 @@ import numpy as np
 import tensorflow as tf
 
 from helper_scripts.timer import Timer
-from naso.settings import ENERGY_MEASUREMENT_FREQUENCY
 
 
 class TimingCallback(tf.keras.callbacks.Callback):
@@ -29,7 +28,6 @@ class TimingCallback(tf.keras.callbacks.Callback):
 
     times = []
     _batch = 0
-    _last_measurement = 0
 
     def __init__(self):
         super().__init__()
@@ -163,6 +161,8 @@ class TimingCallback(tf.keras.callbacks.Callback):
         """
         logs["execution_time_mean"] = sum(self.times) / len(self.times)
         logs["execution_time_variance"] = np.var(self.times)
+        logs["execution_time_p50"] = np.percentile(self.times, 50)
+        logs["execution_time_p99"] = np.percentile(self.times, 99)
 
     def on_predict_batch_begin(self, batch, logs=None):
         """
@@ -194,8 +194,5 @@ class TimingCallback(tf.keras.callbacks.Callback):
             logs = []
         elapsed_time = self.timer.stop()
         logs["total_time"] = self.timer.get_total_time()
-        if logs["total_time"] - self._last_measurement > ENERGY_MEASUREMENT_FREQUENCY:
-            self._last_measurement = logs["total_time"]
-        else:
-            self.times.append(elapsed_time)
-            logs["execution_time"] = elapsed_time
+        self.times.append(elapsed_time)
+        logs["execution_time"] = elapsed_time
@@ -43,6 +43,7 @@ def run_autokeras(self, run_id, inference_workers):
     # Place the model on the specified GPU
     with tf.device(run.gpu):
         (train_dataset, test_dataset, eval_dataset) = run.dataset.get_data()
+        run.record_dataset_cache(run.dataset.cache_statistics)
 
         callback = AutoKerasCallback(self, run)
         timing_callback = TimingCallback()
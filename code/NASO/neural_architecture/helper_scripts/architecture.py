@@ -1,10 +1,7 @@
-from collections import namedtuple
-
 import numpy as np
 import tensorflow as tf
-from tensorflow_model_optimization.python.core.sparsity.keras import pruning_wrapper
 
-from plugins.interfaces.pruning_method import PruningInterface
+from neural_architecture.helper_scripts.model_analysis import analyse_model
 
 
 def is_feedforward(model):
@@ -121,59 +118,17 @@ def is_merge_node(layer_name, connections):
     return len(edges_to_target(layer_name, connections)) > 1
 
 
-def calculate_flops(model, batch_size):
-    total_flops = 0
-
-    for layer in model.layers:
-        if isinstance(layer, tf.keras.layers.Conv2D):
-            total_flops += conv_flops(layer, batch_size)
-        elif isinstance(
-            layer, (tf.keras.layers.MaxPooling2D, tf.keras.layers.AveragePooling2D)
-        ):
-            total_flops += pooling_flops(layer, batch_size)
-        elif isinstance(layer, tf.keras.layers.Dense):
-            total_flops += fc_flops(layer, batch_size)
-        elif isinstance(layer, pruning_wrapper.PruneLowMagnitude) or issubclass(
-            layer.__class__, PruningInterface
-        ):
-            model_layer = layer.layer
-            model_struct = namedtuple("Model", "layers")
-            total_flops += calculate_flops(
-                model_struct(layers=[model_layer]), batch_size
-            )
-
-    return total_flops
-
-
-def conv_flops(layer, batch_size):
-    input_shape = layer.input_shape[1:]
-    output_shape = layer.output_shape[1:]
-    kernel_size = layer.kernel_size[0] * layer.kernel_size[1]
-    Cin = input_shape[-1]
-    Cout = output_shape[-1]
-    Hout, Wout = output_shape[1:3]
-
-    flops = Cin * Cout * kernel_size * Hout * Wout * batch_size
-    return flops
-
-
-def pooling_flops(layer, batch_size):
-    input_shape = layer.input_shape[1:]
-    Cin = input_shape[-1]
-    Hin, Win = input_shape[1:3]
-
-    flops = Cin * Hin * Win * batch_size
-    return flops
-
-
-def fc_flops(layer, batch_size):
-    input_shape = layer.input_shape[1:]
-    output_shape = layer.output_shape[1:]
-    Cin = input_shape[-1]
-    Cout = output_shape[-1]
+def calculate_flops(model, batch_size, sparsities: dict = None):
+    """
+    Returns the floating point operations of a forward pass of a batch, see `analyse_model`.
 
-    flops = Cin * Cout * batch_size
-    return flops
+    Args:
+        model (keras.Model): The model, it has to be built.
+        batch_size (int): Number of samples of the forward pass.
+        sparsities (dict): Fraction of pruned weights by layer name, pruned weights do not
+            count.
+    """
+    return analyse_model(model, batch_size, sparsities)["flops"]
 
 
 def quantize_weights(model):
@@ -0,0 +1,477 @@
+import hashlib
+import json
+import weakref
+
+import keras
+import numpy as np
+import tensorflow as tf
+from tensorflow_model_optimization.python.core.clustering.keras.cluster_wrapper import (
+    ClusterWeights,
+)
+from tensorflow_model_optimization.python.core.quantization.keras.quantize_wrapper import (
+    QuantizeWrapper,
+)
+from tensorflow_model_optimization.python.core.sparsity.keras.pruning_wrapper import (
+    PruneLowMagnitude,
+)
+
+from plugins.interfaces.pruning_method import PruningInterface
+
+# analyses by architecture fingerprint, the oldest is evicted first
+MAX_CACHED_ANALYSES = 256
+_analyses = {}
+# fingerprints of the models already seen, so that analysing a model again is a lookup
+_fingerprints = weakref.WeakKeyDictionary()
+
+OPTIMIZATION_WRAPPERS = (
+    PruneLowMagnitude,
+    PruningInterface,
+    ClusterWeights,
+    QuantizeWrapper,
+)
+SEPARABLE_CONVOLUTIONS = (keras.layers.SeparableConv1D, keras.layers.SeparableConv2D)
+DEPTHWISE_CONVOLUTIONS = (keras.layers.DepthwiseConv1D, keras.layers.DepthwiseConv2D)
+TRANSPOSED_CONVOLUTIONS = (
+    keras.layers.Conv1DTranspose,
+    keras.layers.Conv2DTranspose,
+    keras.layers.Conv3DTranspose,
+)
+CONVOLUTIONS = (keras.layers.Conv1D, keras.layers.Conv2D, keras.layers.Conv3D)
+# number of gates and elementwise operations of the state update per unit and step
+RECURRENT_LAYERS = {
+    keras.layers.LSTM: (4, 5),
+    keras.layers.GRU: (3, 6),
+    keras.layers.SimpleRNN: (1, 0),
+}
+POOLING_LAYERS = (
+    keras.layers.MaxPooling1D,
+    keras.layers.MaxPooling2D,
+    keras.layers.MaxPooling3D,
+    keras.layers.AveragePooling1D,
+    keras.layers.AveragePooling2D,
+    keras.layers.AveragePooling3D,
+)
+GLOBAL_POOLING_LAYERS = (
+    keras.layers.GlobalMaxPooling1D,
+    keras.layers.GlobalMaxPooling2D,
+    keras.layers.GlobalMaxPooling3D,
+    keras.layers.GlobalAveragePooling1D,
+    keras.layers.GlobalAveragePooling2D,
+    keras.layers.GlobalAveragePooling3D,
+)
+MERGE_LAYERS = (
+    keras.layers.Add,
+    keras.layers.Subtract,
+    keras.layers.Multiply,
+    keras.layers.Average,
+    keras.layers.Maximum,
+    keras.layers.Minimum,
+)
+ACTIVATION_LAYERS = (
+    keras.layers.Activation,
+    keras.layers.ReLU,
+    keras.layers.LeakyReLU,
+    keras.layers.PReLU,
+    keras.layers.ELU,
+    keras.layers.ThresholdedReLU,
+)
+# layers that only move, copy or look up values
+ZERO_COST_LAYERS = (
+    keras.layers.InputLayer,
+    keras.layers.Reshape,
+    keras.layers.Flatten,
+    keras.layers.Permute,
+    keras.layers.RepeatVector,
+    keras.layers.Concatenate,
+    keras.layers.Embedding,
+    keras.layers.Identity,
+    keras.layers.Dropout,
+    keras.layers.SpatialDropout1D,
+    keras.layers.SpatialDropout2D,
+    keras.layers.SpatialDropout3D,
+    keras.layers.GaussianNoise,
+    keras.layers.GaussianDropout,
+    keras.layers.AlphaDropout,
+    keras.layers.ZeroPadding1D,
+    keras.layers.ZeroPadding2D,
+    keras.layers.ZeroPadding3D,
+    keras.layers.Cropping1D,
+    keras.layers.Cropping2D,
+    keras.layers.Cropping3D,
+    keras.layers.UpSampling1D,
+    keras.layers.UpSampling2D,
+    keras.layers.UpSampling3D,
+)
+
+
+def _as_shapes(structure) -> list[tuple]:
+    """
+    Flattens the input or output shapes of a node, which are a shape, a list or a dict of
+    shapes, into a list of shapes.
+    """
+    if isinstance(structure, tf.TensorShape):
+        return [tuple(structure.as_list())] if structure.rank is not None else []
+    if isinstance(structure, dict):
+        structure = list(structure.values())
+    if isinstance(structure, (list, tuple)):
+        if all(dim is None or isinstance(dim, int) for dim in structure):
+            return [tuple(structure)]
+        return [shape for element in structure for shape in _as_shapes(element)]
+    return []
+
+
+def _size(shape) -> int:
+    """
+    Returns the number of values per sample of a shape with batch dimension. Unknown
+    dimensions, e.g. a variable number of timesteps, count as 1.
+    """
+    return int(np.prod([dim or 1 for dim in shape[1:]]))
+
+
+def _channels(layer, shape) -> int:
+    if getattr(layer, "data_format", "channels_last") == "channels_first":
+        return shape[1] or 1
+    return shape[-1] or 1
+
+
+def _network_nodes(model, layer) -> list:
+    """
+    Returns the calls of a layer in the graph of the model. A layer that is shared with another
+    model, e.g. a clone for quantization, also has the nodes of the other graph.
+    """
+    network_nodes = getattr(model, "_network_nodes", None)
+    if network_nodes is None:
+        return list(layer._inbound_nodes)
+    return [
+        node
+        for index, node in enumerate(layer._inbound_nodes)
+        if f"{layer.name}_ib-{index}" in network_nodes
+    ]
+
+
+def _attention_cost(layer, input_shapes, output_shape) -> tuple[int, int, int]:
+    if isinstance(layer, keras.layers.MultiHeadAttention):
+        query = _as_shapes(layer._query_shape)[0]
+        value = _as_shapes(layer._value_shape)[0]
+        key = _as_shapes(layer._key_shape)[0] if layer._key_shape else value
+        query_steps = _size(query) // (query[-1] or 1)
+        value_steps = _size(value) // (value[-1] or 1)
+        heads = layer._num_heads
+        key_dim = layer._key_dim
+        value_dim = layer._value_dim or key_dim
+        projection_macs = (
+            heads
+            * (
+                query_steps * query[-1] * key_dim
+                + value_steps * key[-1] * key_dim
+                + value_steps * value[-1] * value_dim
+            )
+            + query_steps * heads * value_dim * output_shape[-1]
+        )
+        attention_macs = heads * query_steps * value_steps * (key_dim + value_dim)
+        # softmax over the scores
+        elementwise = 3 * heads * query_steps * value_steps
+        if layer._use_bias:
+            elementwise += heads * (
+                query_steps * key_dim + value_steps * (key_dim + value_dim)
+            ) + _size(output_shape)
+        return projection_macs + attention_macs, projection_macs, elementwise
+    query, value = input_shapes[0], input_shapes[1]
+    query_steps = _size(query) // (query[-1] or 1)
+    value_steps = _size(value) // (value[-1] or 1)
+    attention_macs = query_steps * value_steps * (query[-1] + value[-1])
+    elementwise = 3 * query_steps * value_steps
+    if isinstance(layer, keras.layers.AdditiveAttention):
+        # tanh of the sum of query and key for every pair of steps
+        elementwise += 2 * query_steps * value_steps * query[-1]
+    return attention_macs, 0, elementwise
+
+
+def _layer_cost(layer, input_shapes, output_shapes) -> tuple[int, int, int, bool]:
+    """
+    Returns the cost of one call of a layer per sample.
+
+    Returns:
+        tuple: The multiply accumulates, the part of them with weights, which shrinks with the
+            sparsity of the layer, the other floating point operations, e.g. biases,
+            activations or pooling, and whether the layer type is covered at all.
+    """
+    if isinstance(layer, ZERO_COST_LAYERS):
+        return 0, 0, 0, True
+    if not input_shapes or not output_shapes:
+        return 0, 0, 0, False
+    first_input = input_shapes[0]
+    output = output_shapes[0]
+    outputs = sum(_size(shape) for shape in output_shapes)
+
+    weight_macs = None
+    if isinstance(layer, keras.layers.Dense):
+        weight_macs = outputs * (first_input[-1] or 1)
+    elif isinstance(layer, SEPARABLE_CONVOLUTIONS):
+        depthwise_channels = _channels(layer, first_input) * layer.depth_multiplier
+        positions = outputs // _channels(layer, output)
+        weight_macs = (
+            positions
+            * depthwise_channels
+            * (int(np.prod(layer.kernel_size)) + _channels(layer, output))
+        )
+    elif isinstance(layer, DEPTHWISE_CONVOLUTIONS):
+        weight_macs = outputs * int(np.prod(layer.kernel_size))
+    elif isinstance(layer, TRANSPOSED_CONVOLUTIONS):
+        # every input value is scattered into a kernel sized patch of every filter
+        weight_macs = (
+            _size(first_input)
+            * _channels(layer, output)
+            * int(np.prod(layer.kernel_size))
+        )
+    elif isinstance(layer, CONVOLUTIONS):
+        weight_macs = (
+            outputs
+            * (_channels(layer, first_input) // layer.groups)
+            * int(np.prod(layer.kernel_size))
+        )
+    if weight_macs is not None:
+        elementwise = outputs if getattr(layer, "use_bias", False) else 0
+        if layer.activation not in (None, keras.activations.linear):
+            elementwise += outputs
+        return weight_macs, weight_macs, elementwise, True
+
+    for recurrent_layer, (gates, state_update) in RECURRENT_LAYERS.items():
+        if isinstance(layer, recurrent_layer):
+            steps = first_input[1] or 1
+            units = layer.units
+            weight_macs = steps * gates * units * ((first_input[-1] or 1) + units)
+            # bias and activation of every gate, then the update of the state
+            elementwise = steps * units * (2 * gates + state_update)
+            return weight_macs, weight_macs, elementwise, True
+
+    if isinstance(
+        layer,
+        (
+            keras.layers.MultiHeadAttention,
+            keras.layers.Attention,
+            keras.layers.AdditiveAttention,
+        ),
+    ):
+        macs, weight_macs, elementwise = _attention_cost(layer, input_shapes, output)
+        return macs, weight_macs, elementwise, True
+    if isinstance(layer, keras.layers.BatchNormalization):
+        # scale and shift with the moving statistics
+        return 0, 0, 2 * outputs, True
+    if isinstance(
+        layer,
+        (
+            keras.layers.LayerNormalization,
+            keras.layers.GroupNormalization,
+            keras.layers.UnitNormalization,
+        ),
+    ):
+        # mean and variance are computed per sample, then normalized, scaled and shifted
+        return 0, 0, 5 * outputs, True
+    if isinstance(layer, POOLING_LAYERS):
+        return 0, 0, outputs * int(np.prod(layer.pool_size)), True
+    if isinstance(layer, GLOBAL_POOLING_LAYERS):
+        return 0, 0, _size(first_input), True
+    if isinstance(layer, MERGE_LAYERS):
+        return 0, 0, outputs * max(len(input_shapes) - 1, 1), True
+    if isinstance(layer, keras.layers.Dot):
+        axes = layer.axes if isinstance(layer.axes, int) else layer.axes[0]
+        return outputs * (first_input[axes] or 1), 0, 0, True
+    if isinstance(layer, keras.layers.Softmax):
+        return 0, 0, 3 * outputs, True
+    if isinstance(layer, ACTIVATION_LAYERS):
+        return 0, 0, outputs, True
+    return 0, 0, 0, False
+
+
+def _analyse_call(layer, input_shapes, output_shapes, rows, seen, name, repeats=1):
+    """
+    Appends the rows of one call of a layer. Nested models and wrappers are analysed through
+    the layers they contain, pruning wrappers keep their name, as the sparsities are reported
+    by the name of the wrapper.
+    """
+    if isinstance(layer, keras.Model):
+        _analyse_layers(layer, rows, seen, repeats)
+        return
+    if isinstance(layer, OPTIMIZATION_WRAPPERS) and hasattr(layer, "layer"):
+        _analyse_call(
+            layer.layer, input_shapes, output_shapes, rows, seen, name, repeats
+        )
+        return
+    if isinstance(layer, keras.layers.Bidirectional):
+        for direction in [layer.forward_layer, layer.backward_layer]:
+            _analyse_call(
+                direction, input_shapes, output_shapes, rows, seen, name, repeats
+            )
+        return
+    if isinstance(layer, keras.layers.TimeDistributed):
+        steps = input_shapes[0][1] or 1
+        _analyse_call(
+            layer.layer,
+            [(shape[0],) + tuple(shape[2:]) for shape in input_shapes],
+            [(shape[0],) + tuple(shape[2:]) for shape in output_shapes],
+            rows,
+            seen,
+            name,
+            repeats * steps,
+        )
+        return
+
+    macs, weight_macs, elementwise, covered = _layer_cost(
+        layer, input_shapes, output_shapes
+    )
+    itemsize = np.dtype(layer.compute_dtype or "float32").itemsize
+    outputs = sum(_size(shape) for shape in output_shapes)
+    inputs = sum(_size(shape) for shape in input_shapes)
+    rows.append(
+        {
+            "name": name,
+            "type": layer.__class__.__name__,
+            "macs": macs * repeats,
+            "weight_macs": weight_macs * repeats,
+            "flops": (2 * macs + elementwise) * repeats,
+            # shared layers only count their weights once
+            "params": 0 if id(layer) in seen else int(layer.count_params()),
+            "activation_memory": outputs * itemsize * repeats,
+            "peak_memory": (inputs + outputs) * itemsize,
+            "covered": covered,
+        }
+    )
+    seen.add(id(layer))
+
+
+def _analyse_layers(model, rows, seen, repeats=1):
+    for layer in model.layers:
+        nodes = _network_nodes(model, layer)
+        if nodes:
+            for node in nodes:
+                _analyse_call(
+                    layer,
+                    _as_shapes(node.input_shapes),
+                    _as_shapes(node.output_shapes),
+                    rows,
+                    seen,
+                    layer.name,
+                    repeats,
+                )
+        else:
+            _analyse_call(layer, [], [], rows, seen, layer.name, repeats)
+
+
+def _without_build_config(layer_config):
+    """
+    Removes the build configurations, they depend on whether a layer was built yet and the
+    shapes are part of the description anyway.
+    """
+    if isinstance(layer_config, dict):
+        return {
+            key: _without_build_config(value)
+            for key, value in layer_config.items()
+            if key != "build_config"
+        }
+    if isinstance(layer_config, list):
+        return [_without_build_config(value) for value in layer_config]
+    return layer_config
+
+
+def _describe(model) -> list:
+    description = []
+    for layer in model.layers:
+        try:
+            layer_config = layer.get_config()
+        except NotImplementedError:
+            layer_config = {}
+        description.append(
+            [
+                layer.__class__.__name__,
+                layer.name,
+                _without_build_config(layer_config),
+                [
+                    [node.input_shapes, node.output_shapes]
+                    for node in _network_nodes(model, layer)
+                ],
+                _describe(layer) if isinstance(layer, keras.Model) else [],
+            ]
+        )
+    return description
+
+
+def architecture_fingerprint(model) -> str:
+    """
+    Returns a hash of the layers, their configuration and the shapes of their calls, which is
+    the same for every model with the same architecture, independent of the weights.
+    """
+    try:
+        return _fingerprints[model]
+    except (KeyError, TypeError):
+        pass
+    description = json.dumps(_describe(model), sort_keys=True, default=str)
+    fingerprint = hashlib.sha1(description.encode("utf-8")).hexdigest()
+    try:
+        _fingerprints[model] = fingerprint
+    except TypeError:
+        pass
+    return fingerprint
+
+
+def analyse_layers(model) -> list[dict]:
+    """
+    Returns the cost of every layer call per sample. The analysis only depends on the
+    architecture, so it is memoised per fingerprint.
+    """
+    fingerprint = architecture_fingerprint(model)
+    if fingerprint not in _analyses:
+        if len(_analyses) >= MAX_CACHED_ANALYSES:
+            _analyses.pop(next(iter(_analyses)))
+        rows = []
+        _analyse_layers(model, rows, set())
+        _analyses[fingerprint] = rows
+    return _analyses[fingerprint]
+
+
+def analyse_model(model, batch_size: int = 1, sparsities: dict = None) -> dict:
+    """
+    Counts multiply accumulates (MACs), floating point operations (FLOPs), parameters and the
+    memory of the activations of a forward pass. A MAC is two FLOPs; biases, activations,
+    normalization, pooling and merges add their elementwise operations. Convolutions in 1D, 2D
+    and 3D, depthwise, separable and transposed convolutions, dense, recurrent and attention
+    layers, nested models and the pruning, clustering and quantization wrappers are covered.
+    Layers that are not covered, e.g. custom layers of plugins, count with zero operations and
+    are marked in the rows of the layers.
+
+    The per layer analysis is cached per architecture, only the sparsity is applied per call,
+    so analysing the same model after every epoch is cheap.
+
+    Args:
+        model (keras.Model): The model, it has to be built.
+        batch_size (int): Number of samples of the forward pass.
+        sparsities (dict): Fraction of pruned weights by layer name, e.g. of the
+            PruningBookkeeping. Pruned weights do not count as MACs.
+
+    Returns:
+        dict: The totals and the rows of every layer call.
+    """
+    sparsities = sparsities or {}
+    layers = []
+    for row in analyse_layers(model):
+        pruned_macs = int(row["weight_macs"] * sparsities.get(row["name"], 0.0))
+        layers.append(
+            {
+                **row,
+                "macs": (row["macs"] - pruned_macs) * batch_size,
+                "weight_macs": (row["weight_macs"] - pruned_macs) * batch_size,
+                "flops": (row["flops"] - 2 * pruned_macs) * batch_size,
+                "activation_memory": row["activation_memory"] * batch_size,
+                "peak_memory": row["peak_memory"] * batch_size,
+            }
+        )
+    return {
+        "macs": sum(row["macs"] for row in layers),
+        "flops": sum(row["flops"] for row in layers),
+        "params": sum(row["params"] for row in layers),
+        "activation_memory [B]": sum(row["activation_memory"] for row in layers),
+        "peak_activation_memory [B]": max(
+            [row["peak_memory"] for row in layers], default=0
+        ),
+        "layers": layers,
+    }
@@ -186,6 +186,12 @@ def load_dataset_loaders():
         name="SkLearn Datasets",
         description="These are all the datasets that are available in sklearn.",
     )
+    _, _ = DatasetLoader.objects.get_or_create(
+        module_name="neural_architecture.models.dataset",
+        class_name="LocalDatasetLoader",
+        name="Local Datasets",
+        description="These are the uploaded datasets, once they are ingested.",
+    )
 
 
 def load_pruning_utilities():
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.13 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("neural_architecture", "0057_autokerasrun_power_series"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="autokerasmodel",
+            name="compact_export_model",
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name="autokerasmodel",
+            name="compaction_report",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="networkconfiguration",
+            name="compact_export_model",
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name="networkconfiguration",
+            name="compaction_report",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.13 on 2026-10-18 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("neural_architecture", "0058_compact_export_model"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="autokerasmodel",
+            name="sparse_export_model",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="networkconfiguration",
+            name="sparse_export_model",
+            field=models.BooleanField(default=False),
+        ),
+    ]
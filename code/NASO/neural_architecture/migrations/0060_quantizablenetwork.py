@@ -0,0 +1,47 @@
+# Generated by Django 4.2.13 on 2026-10-18 16:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("neural_architecture", "0059_sparse_export_model"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="QuantizableNetwork",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("use_quantization", models.BooleanField(default=False)),
+                ("fine_tune_epochs", models.IntegerField(default=1)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="autokerasmodel",
+            name="quantization_options",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="neural_architecture.quantizablenetwork",
+            ),
+        ),
+        migrations.AddField(
+            model_name="networkconfiguration",
+            name="quantization_options",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="neural_architecture.quantizablenetwork",
+            ),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.13 on 2026-10-18 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("neural_architecture", "0061_autokerasrun_dataset_cache"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="localdataset",
+            name="label_column",
+            field=models.CharField(blank=True, default="", max_length=64),
+        ),
+        migrations.AddField(
+            model_name="localdataset",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("ingesting", "Ingesting"),
+                    ("ready", "Ready"),
+                    ("failed", "Failed"),
+                ],
+                default="pending",
+                max_length=9,
+            ),
+        ),
+        migrations.AddField(
+            model_name="localdataset",
+            name="progress",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name="localdataset",
+            name="schema",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="localdataset",
+            name="statistics",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="localdataset",
+            name="splits",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="localdataset",
+            name="shards_path",
+            field=models.CharField(blank=True, default="", max_length=255),
+        ),
+        migrations.AddField(
+            model_name="localdataset",
+            name="error",
+            field=models.TextField(blank=True, default=""),
+        ),
+    ]
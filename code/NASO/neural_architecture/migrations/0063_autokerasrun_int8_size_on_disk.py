@@ -0,0 +1,17 @@
+# Generated by Django 4.2.13 on 2026-10-18 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("neural_architecture", "0062_localdataset_ingestion"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="autokerasrun",
+            name="int8_size_on_disk",
+            field=models.IntegerField(default=-1),
+        ),
+    ]
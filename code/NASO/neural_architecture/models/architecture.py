@@ -1,4 +1,5 @@
 import os
+import time
 import zipfile
 
 import keras
@@ -6,11 +7,18 @@ from decouple import config
 from django.db import models
 from loguru import logger
 
+from helper_scripts.codebook_format import (
+    CODEBOOK_EXTENSION,
+    load_codebook_model,
+    save_codebook_model,
+)
 from helper_scripts.importing import get_object
+from helper_scripts.quantization import INT8_EXTENSION
 from neural_architecture.models.graphs import Graph
 from neural_architecture.models.model_optimization import (
     ClusterableNetwork,
     PrunableNetwork,
+    QuantizableNetwork,
 )
 from neural_architecture.models.types import (
     ActivationFunctionType,
@@ -102,6 +110,9 @@ class NetworkModel(PrunableNetwork):
     clustering_options = models.ForeignKey(
         ClusterableNetwork, null=True, on_delete=models.deletion.CASCADE
     )
+    quantization_options = models.ForeignKey(
+        QuantizableNetwork, null=True, on_delete=models.deletion.CASCADE
+    )
     load_model = models.BooleanField(default=False)
 
     def save_model_on_disk(self, model):
@@ -117,6 +128,10 @@ class NetworkModel(PrunableNetwork):
                 export_model = self.clustering_options.get_cluster_export_model(
                     export_model
                 )
+            if self.quantization_options:
+                export_model = self.quantization_options.get_quantized_export_model(
+                    export_model, os.path.splitext(file_path)[0] + INT8_EXTENSION
+                )
 
             export_model.save(file_path, save_format="keras")
 
@@ -127,6 +142,17 @@ class NetworkModel(PrunableNetwork):
             ) as zip_file:
                 zip_file.write(file_path)
 
+            if self.pruning_method or (
+                self.clustering_options and self.clustering_options.use_clustering
+            ):
+                try:
+                    save_codebook_model(
+                        export_model,
+                        os.path.splitext(file_path)[0] + CODEBOOK_EXTENSION,
+                    )
+                except (ValueError, TypeError, NotImplementedError) as exc:
+                    logger.warning(f"Could not save the codebook model: {exc}")
+
             self.model_file = file_path
             self.save()
             logger.success(f"Saved model to {self.name}_{self.id}.keras")
@@ -143,6 +169,47 @@ class NetworkModel(PrunableNetwork):
             return os.path.getsize(os.path.splitext(self.model_file)[0] + ".zip")
         return -1
 
+    def get_codebook_file(self) -> str:
+        return os.path.splitext(self.model_file)[0] + CODEBOOK_EXTENSION
+
+    def get_codebook_model_size(self) -> int:
+        """
+        Returns the size of the codebook file of a pruned or clustered model, -1 if there is none.
+        """
+        if self.save_model and os.path.exists(self.get_codebook_file()):
+            return os.path.getsize(self.get_codebook_file())
+        return -1
+
+    def get_int8_model_size(self) -> int:
+        """
+        Returns the size of the int8 TFLite file of a quantization aware trained model, -1 if
+        there is none.
+        """
+        int8_file = os.path.splitext(self.model_file)[0] + INT8_EXTENSION
+        if self.save_model and os.path.exists(int8_file):
+            return os.path.getsize(int8_file)
+        return -1
+
+    def measure_load_times(self) -> dict:
+        """
+        Measures how long it takes to load the saved model from the keras file and from the
+        codebook file, if there is one.
+
+        Returns:
+            dict: The seconds by format, `keras` and `codebook`.
+        """
+        load_times = {}
+        if not self.save_model:
+            return load_times
+        loaders = [("keras", keras.models.load_model, self.model_file)]
+        if os.path.exists(self.get_codebook_file()):
+            loaders.append(("codebook", load_codebook_model, self.get_codebook_file()))
+        for name, loader, file_path in loaders:
+            start = time.perf_counter()
+            loader(file_path)
+            load_times[name] = time.perf_counter() - start
+        return load_times
+
 
 class NetworkConfiguration(BuildModelFromGraph, NetworkModel):
     """
@@ -14,9 +14,12 @@ from helper_scripts.extensions import (
     custom_on_trial_end_decorator,
 )
 from helper_scripts.importing import get_arguments_as_dict, get_class, get_object
+from helper_scripts.power_sampler import wait_until_settled
+from helper_scripts.quantization import INT8_EXTENSION
 from neural_architecture.models.model_optimization import (
     ClusterableNetwork,
     PrunableNetwork,
+    QuantizableNetwork,
 )
 from neural_architecture.NetworkCallbacks.evaluation_base_callback import (
     EvaluationBaseCallback,
@@ -125,6 +128,9 @@ class AutoKerasModel(BuildModelFromGraph, PrunableNetwork):
     clustering_options = models.ForeignKey(
         ClusterableNetwork, null=True, on_delete=models.deletion.CASCADE
     )
+    quantization_options = models.ForeignKey(
+        QuantizableNetwork, null=True, on_delete=models.deletion.CASCADE
+    )
 
     auto_model: autokeras.AutoModel = None
     loaded_model: autokeras.AutoModel = None
@@ -151,6 +157,7 @@ class AutoKerasModel(BuildModelFromGraph, PrunableNetwork):
                 self.tuner_object.on_epoch_begin
             )
             (train_data, _, dataset) = run.dataset.get_data()
+            run.record_dataset_cache(run.dataset.cache_statistics)
             self.tuner_object.on_trial_end = custom_on_trial_end_decorator(
                 self.tuner_object.on_trial_end, run, train_data, dataset
             )
@@ -304,6 +311,20 @@ class AutoKerasModel(BuildModelFromGraph, PrunableNetwork):
             return best_path
         raise RuntimeError("search is not finished yet and best model cannot be found.")
 
+    def get_int8_model_file(self) -> str:
+        return (
+            f"{config('NAS_MODEL_PATH')}{self.trial_folder}/best_model{INT8_EXTENSION}"
+        )
+
+    def get_int8_model_size(self) -> int:
+        """
+        Returns the size of the int8 TFLite file of the best quantization aware trained model, -1
+        if there is none.
+        """
+        if os.path.exists(self.get_int8_model_file()):
+            return os.path.getsize(self.get_int8_model_file())
+        return -1
+
     def get_trial_checkpoint_path(self, trial_id) -> str:
         """
         Returns the checkpoint path for a specific trial.
@@ -507,11 +528,22 @@ class AutoKerasModel(BuildModelFromGraph, PrunableNetwork):
             raise ValueError("Model has not been built yet.")
         batch_size = 1
         timing_callback = TimingCallback()
-        export_model = self.get_export_model(self.auto_model.export_model())
+        # the export and its benchmarks run before the device settles for the measurement
+        trained_model = self.auto_model.export_model()
+        export_model = self.get_export_model(trained_model)
+        self.measure_compaction_latency(trained_model)
         if self.clustering_options:
             export_model = self.clustering_options.get_cluster_export_model(
                 export_model
             )
+        if self.quantization_options:
+            # predicts with the float model instead of the simulated quantization
+            export_model = self.quantization_options.get_quantized_export_model(
+                export_model, self.get_int8_model_file()
+            )
+            run.int8_size_on_disk = self.get_int8_model_size()
+            run.save()
+        settle_time = wait_until_settled(run.gpu)
         return export_model.predict(
             dataset,
             batch_size,
@@ -519,7 +551,7 @@ class AutoKerasModel(BuildModelFromGraph, PrunableNetwork):
             steps=None,
             callbacks=[timing_callback]
             + self.get_callbacks(run)
-            + [EvaluationBaseCallback(run)],
+            + [EvaluationBaseCallback(run, settle_time=settle_time)],
         )
 
     def evaluate(self, *args, **kwargs):
@@ -558,6 +590,8 @@ class AutoKerasRun(Run):
     inference_metrics = models.ManyToManyField(
         TrainingMetric, related_name="autokeras_inference_metrics"
     )
+    # size of the int8 TFLite model of quantization aware trained models
+    int8_size_on_disk = models.IntegerField(default=-1)
 
     def __str__(self):
         return self.model.project_name
@@ -579,7 +613,7 @@ class AutoKerasRun(Run):
         return {"model_size": model_size, "average_power": avg_power}
 
     def get_power_measurements(self):
-        if self.power_measurements == "":
+        if not self.has_power_measurements():
             return [
                 metric.metrics[0]["metrics"]["power_consumption"]
                 for metric in self.metrics.all()
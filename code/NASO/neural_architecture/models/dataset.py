@@ -1,14 +1,33 @@
+import inspect
 import os
+from functools import partial
 from pathlib import Path
 
 import matplotlib.pyplot as plt
+import numpy as np
 import tensorflow as tf
 import tensorflow_datasets as tfds
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
 from django.http import JsonResponse
 from sklearn import datasets
 
+from helper_scripts.array_cache import (
+    array_dataset,
+    is_numeric_array,
+    load_arrays,
+    read_array_metadata,
+    save_arrays,
+)
+from helper_scripts.dataset_cache import (
+    SPLITS,
+    dataset_cache_key,
+    get_dataset_cache,
+)
 from helper_scripts.importing import get_class
+from helper_scripts.ingestion import read_ingested
+from helper_scripts.sharded_dataset import generator_dataset
 from naso import settings
 from plugins.interfaces.dataset import DatasetLoaderInterface
 
@@ -98,6 +117,8 @@ class DatasetLoader(models.Model):
         """
         if not self.dataset_loader:
             self.dataset_loader = self.load_dataset_loader()
+        if self.dataset_loader.streaming:
+            return self.get_streaming_data(*args, **kwargs)
         data = self.dataset_loader.get_data(*args, **kwargs)
         train_dataset = data[0]
         if len(data) > 1:
@@ -110,6 +131,42 @@ class DatasetLoader(models.Model):
             eval_dataset = train_dataset
         return (train_dataset, test_dataset, eval_dataset)
 
+    def get_streaming_data(self, *args, **kwargs) -> tuple:
+        """
+        Returns the splits of a streaming loader as datasets over its generators, with the
+        element spec the loader declares.
+        """
+        element_spec = self.dataset_loader.get_element_spec(*args, **kwargs)
+        if element_spec is None:
+            raise ValueError(
+                f"{self.class_name} streams its data, but declares no element spec"
+            )
+        return tuple(
+            generator_dataset(
+                partial(self.dataset_loader.generate, *args, split=split, **kwargs),
+                element_spec,
+            )
+            for split in SPLITS
+        )
+
+    def get_cache_key(self, *args, **kwargs) -> str | None:
+        """
+        Returns the key of the preprocessed datasets in the dataset cache for the arguments of
+        `get_data`, None if the loader can not be cached.
+        """
+        if not self.dataset_loader:
+            self.dataset_loader = self.load_dataset_loader()
+        if not self.dataset_loader.cacheable:
+            return None
+        return dataset_cache_key(
+            self.module_name,
+            self.class_name,
+            self.dataset_loader.get_split_spec(),
+            self.dataset_loader.preprocessing_version,
+            args,
+            kwargs,
+        )
+
     def get_datasets(self):
         """
         Returns the datasets provided by the dataset loader.
@@ -122,6 +179,17 @@ class DatasetLoader(models.Model):
         return self.dataset_loader.get_datasets()
 
 
+def _size_to_json(get_size):
+    """
+    Returns a size of a loader as plain integers or lists for the metadata of the dataset
+    cache, None if the loader has no size information.
+    """
+    try:
+        return np.asarray(get_size()).tolist()
+    except NotImplementedError:
+        return None
+
+
 class Dataset(models.Model):
     """
     Represents a dataset used in the application.
@@ -160,12 +228,27 @@ class Dataset(models.Model):
     def __str__(self):
         return self.name
 
+    # element size, size and statistics of the dataset cache of the last `get_data`. Other
+    # state a loader sets while loading is not restored if the datasets are cached.
+    cached_element_size = None
+    cached_size = None
+    cache_statistics: dict = {}
+
     def get_element_size(self, *args, **kwargs):
+        if self.cached_element_size is not None:
+            return self.cached_element_size
         if not self.dataset_loader:
             raise ValueError("no dataset loaded yet")
         return self.dataset_loader.get_element_size()
 
-    def get_data(self, *args, **kwargs):
+    def get_size(self, *args, **kwargs):
+        if self.cached_size is not None:
+            return self.cached_size
+        if not self.dataset_loader:
+            raise ValueError("no dataset loaded yet")
+        return self.dataset_loader.dataset_loader.get_size()
+
+    def _load_data(self, *args, **kwargs):
         return self.dataset_loader.get_data(
             name=self.name,
             as_supervised=self.as_supervised,
@@ -174,22 +257,178 @@ class Dataset(models.Model):
             **kwargs,
         )
 
+    def get_data(self, *args, **kwargs):
+        """
+        Returns the train, test and evaluation datasets. The preprocessed datasets are taken from
+        the dataset cache if it is enabled, the loader only runs if they are not cached yet.
+        """
+        cache = get_dataset_cache()
+        key = None
+        if cache:
+            key = self.dataset_loader.get_cache_key(
+                self.name, self.as_supervised, *args, **kwargs
+            )
+        if key is None:
+            self.cache_statistics = {}
+            return self._load_data(*args, **kwargs)
+
+        def build():
+            datasets = self._load_data(*args, **kwargs)
+            loader = self.dataset_loader.dataset_loader
+            metadata = {
+                "element_size": _size_to_json(loader.get_element_size),
+                "dataset_size": _size_to_json(loader.get_size),
+            }
+            if loader.streaming:
+                # written one element at a time, so the splits never have to fit in memory
+                metadata["format"] = "tfrecord"
+            return datasets, metadata
+
+        datasets, metadata, self.cache_statistics = cache.get_or_build(key, build)
+        if metadata.get("element_size") is not None:
+            # loaders return integer sizes for flat elements, e.g. Kaggle California Housing
+            self.cached_element_size = tuple(
+                np.atleast_1d(metadata["element_size"]).tolist()
+            )
+        self.cached_size = metadata.get("dataset_size")
+        (train_dataset, test_dataset, eval_dataset) = datasets
+        return (train_dataset.prefetch(tf.data.AUTOTUNE), test_dataset, eval_dataset)
+
 
 class LocalDataset(models.Model):
     """
-    Represents a local dataset.
+    Represents a local dataset. An upload is ingested once in the background, see
+    `neural_architecture.tasks`, afterwards its data is read from the converted
+    shards only.
 
     Attributes:
         file (FileField): The uploaded file for the dataset.
         name (CharField): The name of the dataset.
         dataloader (ForeignKey): The foreign key to the DatasetLoader model.
         remote_source (CharField): The remote source of the dataset.
+        label_column (CharField): The column of the labels, the last column if empty.
+        status (CharField): The state of the ingestion.
+        progress (FloatField): The progress of the ingestion between 0 and 1.
+        schema (JSONField): The inferred columns and their types.
+        statistics (JSONField): Count, missing values, mean, std, min and max or the categories
+            per column.
+        splits (JSONField): The first and the last row after each split.
+        shards_path (CharField): The directory of the converted shards.
+        error (TextField): Why the ingestion failed.
     """
 
     file = models.FileField(upload_to="datasets/")
     name = models.CharField(max_length=64)
     dataloader = models.ForeignKey(DatasetLoader, on_delete=models.CASCADE, null=True)
     remote_source = models.CharField(max_length=255)
+    label_column = models.CharField(max_length=64, blank=True, default="")
+    status = models.CharField(
+        max_length=9,
+        choices=[
+            ("pending", "Pending"),
+            ("ingesting", "Ingesting"),
+            ("ready", "Ready"),
+            ("failed", "Failed"),
+        ],
+        default="pending",
+    )
+    progress = models.FloatField(default=0)
+    schema = models.JSONField(default=dict, blank=True)
+    statistics = models.JSONField(default=dict, blank=True)
+    splits = models.JSONField(default=dict, blank=True)
+    shards_path = models.CharField(max_length=255, blank=True, default="")
+    error = models.TextField(blank=True, default="")
+
+    def __str__(self):
+        return self.name
+
+    def start_ingestion(self, queue: str = None):
+        """
+        Starts the ingestion of the upload on a worker.
+
+        Args:
+            queue (str): The queue of the worker, the default queue if None.
+        """
+        from neural_architecture.tasks import ingest_local_dataset
+
+        self.status = "pending"
+        self.progress = 0
+        self.error = ""
+        self.save(update_fields=["status", "progress", "error"])
+        ingest_local_dataset.apply_async(args=(self.id,), queue=queue)
+
+    def get_data(self) -> tuple:
+        """
+        Returns the train, test and evaluation datasets from the converted shards.
+
+        Raises:
+            ValueError: If the upload is not ingested yet.
+        """
+        if self.status != "ready":
+            raise ValueError(f"The dataset {self.name} is not ingested yet")
+        return read_ingested(self.shards_path)
+
+    def get_element_size(self) -> tuple:
+        return (len(self.schema["columns"]) - 1,)
+
+
+@receiver(post_save, sender=LocalDataset)
+def ingest_new_upload(sender, instance: LocalDataset, created: bool, **kwargs):
+    """
+    Starts the ingestion of a new upload once it is committed, so the worker finds it.
+    """
+    if created and instance.file:
+        transaction.on_commit(instance.start_ingestion)
+
+
+class LocalDatasetLoader(DatasetLoaderInterface):
+    """
+    Loads the ingested uploads of LocalDataset from their shards.
+    """
+
+    # the shards are read from disk already
+    cacheable = False
+    element_size = 0
+    dataset_size = 0
+
+    def _get_local_dataset(self, name) -> LocalDataset:
+        local_dataset = (
+            LocalDataset.objects.filter(name=name, status="ready").order_by("id").last()
+        )
+        if local_dataset is None:
+            raise ValueError(f"There is no ingested dataset {name}")
+        return local_dataset
+
+    def get_info(self, name, *args, **kwargs):
+        local_dataset = self._get_local_dataset(name)
+        return {
+            "description": local_dataset.remote_source or local_dataset.file.name,
+            "length": sum(
+                stop - start for start, stop in local_dataset.splits.values()
+            ),
+            "schema": local_dataset.schema,
+            "statistics": local_dataset.statistics,
+        }
+
+    def get_data(self, name, *args, **kwargs):
+        local_dataset = self._get_local_dataset(name)
+        self.element_size = local_dataset.get_element_size()
+        start, stop = local_dataset.splits["train"]
+        self.dataset_size = stop - start
+        return local_dataset.get_data()
+
+    def get_element_size(self, *args, **kwargs):
+        return self.element_size
+
+    def get_size(self, *args, **kwargs):
+        return self.dataset_size
+
+    def get_datasets(self, *args, **kwargs):
+        return list(
+            LocalDataset.objects.filter(status="ready")
+            .values_list("name", flat=True)
+            .distinct()
+        )
 
 
 class TensorflowDatasetLoader(DatasetLoaderInterface):
@@ -212,6 +451,10 @@ class TensorflowDatasetLoader(DatasetLoaderInterface):
     module_name = "tensorflow_datasets"
     dataset_list = tfds.list_builders()
     info: dict = {}
+    splits = ["train", "test[:50%]", "test[50%:]"]
+
+    def get_split_spec(self) -> str:
+        return ",".join(self.splits)
 
     def normalize_img(self, image, label):
         """Normalizes images: `uint8` -> `float32`."""
@@ -230,7 +473,7 @@ class TensorflowDatasetLoader(DatasetLoaderInterface):
         """
         (dataset, self.info) = tfds.load(
             name,
-            split=["train", "test[:50%]", "test[50%:]"],
+            split=self.splits,
             as_supervised=as_supervised,
             with_info=True,
         )
@@ -380,6 +623,11 @@ class SkLearnDatasetLoader(DatasetLoaderInterface):
     training_split = 0.8
     element_size = 0
     dataset_size = 0
+    # the arrays are memory mapped from disk already
+    cacheable = False
+
+    def get_split_spec(self) -> str:
+        return f"train={self.training_split}"
 
     def get_size(self, *args, **kwargs):
         """
@@ -390,17 +638,52 @@ class SkLearnDatasetLoader(DatasetLoaderInterface):
         """
         return self.dataset_size
 
-    def get_info(self, name, *args, **kwargs):
-        loader_args = {}
-        if "data_dir" in kwargs:
-            loader_args["data_home"] = kwargs["data_dir"]
+    def _get_array_directory(self, name, **kwargs) -> str:
+        return os.path.join(
+            datasets.get_data_home(kwargs.get("data_dir")),
+            "naso_arrays",
+            self.dataset_list[name],
+        )
 
-        data = getattr(datasets, self.dataset_list[name])(**loader_args)
-        if hasattr(data.data, "shape"):
-            info = {"description": data.DESCR, "length": data.data.shape[0]}
-        else:
-            info = {"description": data.DESCR, "length": len(data.data)}
-        return info
+    def _load_arrays(self, name, **kwargs) -> tuple:
+        """
+        Returns data, target and metadata of a dataset. On the first call the dataset is fetched
+        and converted to `.npy` files next to the scikit-learn data, later calls memory map
+        them. Datasets that are no numeric arrays, e.g. texts, are returned as fetched.
+        """
+        directory = self._get_array_directory(name, **kwargs)
+        if read_array_metadata(directory) is None:
+            function = getattr(datasets, self.dataset_list[name])
+            loader_args = {}
+            if (
+                "data_dir" in kwargs
+                and "data_home" in inspect.signature(function).parameters
+            ):
+                loader_args["data_home"] = kwargs["data_dir"]
+            data = function(**loader_args)
+            if not (is_numeric_array(data.data) and is_numeric_array(data.target)):
+                target = np.asarray(data.target)
+                return (
+                    data.data,
+                    target.reshape((len(target), -1)),
+                    {"description": data.DESCR, "length": len(target)},
+                )
+            save_arrays(
+                directory,
+                {
+                    "data": data.data,
+                    "target": data.target.reshape((data.target.shape[0], -1)),
+                },
+                {"description": data.DESCR, "length": data.target.shape[0]},
+            )
+        arrays = load_arrays(directory)
+        return arrays["data"], arrays["target"], read_array_metadata(directory)
+
+    def get_info(self, name, *args, **kwargs):
+        metadata = read_array_metadata(self._get_array_directory(name, **kwargs))
+        if metadata is None:
+            _, _, metadata = self._load_arrays(name, **kwargs)
+        return {"description": metadata["description"], "length": metadata["length"]}
 
     def get_element_size(self, *args, **kwargs):
         """
@@ -411,6 +694,15 @@ class SkLearnDatasetLoader(DatasetLoaderInterface):
         """
         return self.element_size
 
+    def get_element_spec(self, name, *args, **kwargs):
+        metadata = read_array_metadata(self._get_array_directory(name, **kwargs))
+        if metadata is None or "arrays" not in metadata:
+            return None
+        return tuple(
+            tf.TensorSpec(array["shape"][1:], tf.as_dtype(np.dtype(array["dtype"])))
+            for array in [metadata["arrays"]["data"], metadata["arrays"]["target"]]
+        )
+
     def get_datasets(self, *args, **kwargs):
         """
         Get the list of available datasets.
@@ -430,43 +722,26 @@ class SkLearnDatasetLoader(DatasetLoaderInterface):
         Returns:
             tuple: A tuple containing the train and test sets.
         """
-        loader_args = {}
-        if "data_dir" in kwargs:
-            loader_args["data_home"] = kwargs["data_dir"]
-
-        data = getattr(datasets, self.dataset_list[name])(**loader_args)
-        target_values = data.target.reshape((-1, 1))
-        size = target_values.shape[0]
-        self.element_size = data.data.shape[1:]
+        data, target_values, metadata = self._load_arrays(name, **kwargs)
+        size = metadata["length"]
+        self.element_size = tuple(getattr(data, "shape", (size,))[1:])
         self.dataset_size = size
 
-        train_set = tf.data.Dataset.from_tensor_slices(
-            (
-                data.data[: int(size * self.training_split)],
-                target_values[: int(size * self.training_split)],
+        train_end = int(size * self.training_split)
+        test_end = int(size * ((1 + self.training_split) * 0.5))
+        bounds = [(0, train_end), (train_end, test_end), (test_end, size)]
+        if "arrays" in metadata:
+            # the rows are read from the memory maps while iterating
+            return tuple(
+                array_dataset((data, target_values), start, stop)
+                for start, stop in bounds
             )
-        )
-        test_set = tf.data.Dataset.from_tensor_slices(
-            (
-                data.data[
-                    int(size * self.training_split) : int(
-                        size * ((1 + self.training_split) * 0.5)
-                    )
-                ],
-                target_values[
-                    int(size * self.training_split) : int(
-                        size * ((1 + self.training_split) * 0.5)
-                    )
-                ],
-            )
-        )
-        eval_set = tf.data.Dataset.from_tensor_slices(
-            (
-                data.data[int(size * ((1 + self.training_split) * 0.5)) :],
-                target_values[int(size * ((1 + self.training_split) * 0.5)) :],
+        return tuple(
+            tf.data.Dataset.from_tensor_slices(
+                (data[start:stop], target_values[start:stop])
             )
+            for start, stop in bounds
         )
-        return (train_set, test_set, eval_set)
 
 
 def get_datasets(request, pk):
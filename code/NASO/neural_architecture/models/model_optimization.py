@@ -1,3 +1,5 @@
+import weakref
+
 import autokeras as ak
 import tensorflow_model_optimization as tfmot
 from django.core.exceptions import ValidationError
@@ -7,11 +9,27 @@ from tensorflow_model_optimization.python.core.sparsity.keras.prune_registry imp
     PruneRegistry,
 )
 
+from helper_scripts.compaction import compact_pruned_model, compaction_latency
+from helper_scripts.database import lock_safe_db_operation
 from helper_scripts.importing import get_object
 from helper_scripts.pruning import strip_pruning
+from helper_scripts.quantization import (
+    export_int8_model,
+    get_quantize_scheme,
+    has_optimization_wrappers,
+    is_quantized_model,
+    quantize_model,
+    strip_quantization,
+)
+from helper_scripts.sparse_inference import sparsify_model
+from naso.settings import SPARSE_MIN_SPARSITY
 from neural_architecture.helper_scripts.architecture import copy_model
 from neural_architecture.models.types import BaseType, TypeInstance
 
+# export models and compaction reports by trained model, see
+# PrunableNetwork.get_export_model
+_export_models = weakref.WeakKeyDictionary()
+
 
 class PruningMethodTypes(BaseType):
     """
@@ -199,11 +217,68 @@ class ClusterableNetwork(models.Model):
         return copy_model(model, model_layers)
 
     def get_cluster_export_model(self, model):
-        if self.use_clustering:
+        if self.use_clustering and not is_quantized_model(model):
             return tfmot.clustering.keras.strip_clustering(model)
         return model
 
 
+class QuantizableNetwork(models.Model):
+    """
+    Options of the quantization aware training, the model is trained with simulated int8 weights
+    and activations and exported as int8 TFLite model.
+
+    Quantization aware training can not wrap the pruning and clustering wrappers. If pruning or
+    clustering is enabled, the trained model is stripped and fine tuned with quantization for
+    `fine_tune_epochs`, using the schemes that preserve the sparsity and the clusters.
+
+    Attributes:
+        use_quantization (bool): Whether the model is trained with quantization.
+        fine_tune_epochs (int): Epochs of the quantization aware fine tuning of pruned or
+            clustered models.
+    """
+
+    use_quantization = models.BooleanField(default=False)
+    fine_tune_epochs = models.IntegerField(default=1)
+
+    def build_quantized_model(self, model, include_last_layer=True):
+        """
+        Wraps the model for quantization aware training. Models with pruning or clustering
+        wrappers are returned as they are and quantized in `build_fine_tune_model` after training.
+        """
+        if not self.use_quantization:
+            return model
+        if has_optimization_wrappers(model):
+            logger.info("Quantization is applied after the pruning and clustering")
+            return model
+        logger.info("Built quantization aware model")
+        return quantize_model(model, include_last_layer)
+
+    def needs_fine_tuning(self, model) -> bool:
+        return self.use_quantization and not is_quantized_model(model)
+
+    def build_fine_tune_model(
+        self, model, pruned=False, clustered=False, include_last_layer=True
+    ):
+        """
+        Wraps a trained and stripped model for the quantization aware fine tuning, keeping the
+        zeros of a pruned and the centroids of a clustered model.
+        """
+        return quantize_model(
+            model, include_last_layer, get_quantize_scheme(pruned, clustered)
+        )
+
+    def get_quantized_export_model(self, model, int8_file_path: str):
+        """
+        Writes the int8 TFLite model of a quantization aware trained model and returns its float
+        model for saving in the Keras format.
+        """
+        if not (self.use_quantization and is_quantized_model(model)):
+            return model
+        size = export_int8_model(model, int8_file_path)
+        logger.success(f"Saved int8 model with {size} bytes to {int8_file_path}")
+        return strip_quantization(model)
+
+
 class PrunableNetwork(models.Model):
     """
     A base class for prunable neural network models.
@@ -213,6 +288,12 @@ class PrunableNetwork(models.Model):
         pruning_method (PruningMethod): The pruning method to be used.
         pruning_schedule (PruningSchedule): The pruning schedule to be used.
         pruning_policy (PruningPolicy): The pruning policy to be used.
+        compact_export_model (bool): Whether the exported model is physically compacted, i.e.
+            pruned units and filters are removed from the weight tensors.
+        sparse_export_model (bool): Whether sparse enough Dense layers of the exported model
+            run a sparse matmul.
+        compaction_report (dict): Parameters, FLOPs and latency before and after the last
+            compaction and the sparse layer decisions.
 
     Methods:
         build_pruning_model(model): Builds a pruning model based on the specified pruning method, schedule, and policy.
@@ -231,6 +312,9 @@ class PrunableNetwork(models.Model):
     pruning_policy = models.ForeignKey(
         PruningPolicy, on_delete=models.deletion.SET_NULL, null=True
     )
+    compact_export_model = models.BooleanField(default=True)
+    sparse_export_model = models.BooleanField(default=False)
+    compaction_report = models.JSONField(default=dict, blank=True)
 
     class Meta:
         abstract = True
@@ -300,7 +384,14 @@ class PrunableNetwork(models.Model):
 
     def get_export_model(self, model):
         """
-        Returns the exported model with pruning applied.
+        Returns the exported model with pruning applied. If `compact_export_model` is set,
+        the units and filters that were pruned completely are removed from the model. If
+        `sparse_export_model` is set, Dense layers above the measured sparse/dense crossover
+        are replaced by SparseDense layers. Quantization aware models were stripped of pruning
+        before their quantization, they are returned as they are.
+
+        The export is done once per trained model, later calls return the cached export
+        model, so call it after the training and before any measurement.
 
         Args:
             model: The original model.
@@ -309,13 +400,61 @@ class PrunableNetwork(models.Model):
             The exported model with pruning applied.
 
         """
-        if self.pruning_method:
-            export_model = strip_pruning(model)
+        if self.pruning_method and not is_quantized_model(model):
+            options = (self.compact_export_model, self.sparse_export_model)
+            cached = _export_models.get(model)
+            if cached and cached["options"] == options:
+                self.compaction_report = cached["report"]
+                return cached["model"]
+            stripped_model = strip_pruning(model)
+            export_model = stripped_model
+            report = {}
+            if self.compact_export_model:
+                export_model, report = compact_pruned_model(export_model)
+            if self.sparse_export_model:
+                export_model, sparse_report = sparsify_model(
+                    export_model, SPARSE_MIN_SPARSITY
+                )
+                report = {**report, "sparse_layers": sparse_report}
+            self.compaction_report = report
+            _export_models[model] = {
+                "options": options,
+                "stripped_model": stripped_model,
+                "model": export_model,
+                "report": report,
+            }
+            if self.pk and (self.compact_export_model or self.sparse_export_model):
+                lock_safe_db_operation(
+                    lambda: self.save(update_fields=["compaction_report"])
+                )
             print("final model")
             export_model.summary()
             return export_model
         return model
 
+    def measure_compaction_latency(self, model):
+        """
+        Adds the latency before and after the compaction of the export model of `model` to
+        the compaction report. It runs benchmarks, so it is called after the training and
+        outside the measured inference.
+        """
+        if not (self.pruning_method and self.compact_export_model):
+            return
+        self.get_export_model(model)
+        cached = _export_models.get(model)
+        if not cached or not cached["report"].get("removed_channels"):
+            return
+        if "speedup" not in cached["report"]:
+            cached["report"].update(
+                compaction_latency(cached["stripped_model"], cached["model"])
+            )
+            logger.info(f"Compacted model speedup {cached['report']['speedup']:.2f}")
+        self.compaction_report = cached["report"]
+        if self.pk:
+            lock_safe_db_operation(
+                lambda: self.save(update_fields=["compaction_report"])
+            )
+
 
 class EnsurePrunableModelPolicy(tfmot.sparsity.keras.PruningPolicy):
     _model = None
@@ -1,5 +1,4 @@
 import threading
-import time
 import traceback
 
 import keras
@@ -9,6 +8,7 @@ from loguru import logger
 
 from celery import shared_task
 from helper_scripts.extensions import start_async_measuring
+from helper_scripts.power_sampler import wait_until_settled
 from inference.helper_scripts.tensorflow import run_inference_from_run
 from naso.celery import restart_all_workers
 from neural_architecture.NetworkCallbacks.base_callback import BaseCallback
@@ -16,6 +16,7 @@ from neural_architecture.NetworkCallbacks.evaluation_base_callback import (
     EvaluationBaseCallback,
 )
 from neural_architecture.NetworkCallbacks.timing_callback import TimingCallback
+from runs.models.distillation import Distillation
 from runs.models.training import NetworkTraining, TrainingMetric
 
 logger.add("net.log", backtrace=True, diagnose=True)
@@ -118,9 +119,38 @@ class NeuralNetwork:
 
         self.train()
         self.validate()
+        self.training_config.network_model.measure_compaction_latency(self.model)
+        distillation = self.get_distillation()
+        if distillation:
+            distillation.compare(
+                self.get_export_model(),
+                self.eval_dataset,
+                self.training_config.evaluation_parameters.batch_size,
+            )
         config.size_on_disk = config.get_gzipped_model_size()
+        config.codebook_size_on_disk = config.get_codebook_model_size()
+        config.int8_size_on_disk = config.get_int8_model_size()
+        self.record_load_times(config)
         config.save()
 
+    def record_load_times(self, config: NetworkTraining):
+        """
+        Stores how long loading the saved model takes. If it can not be loaded again, the error
+        is recorded in the final metrics instead of failing the finished training.
+
+        Args:
+            config (NetworkTraining): The training with the saved model.
+        """
+        try:
+            load_times = config.measure_load_times()
+        except (OSError, ValueError, TypeError, NotImplementedError) as exc:
+            logger.warning(f"Could not load the saved model again: {exc}")
+            config.final_metrics.metrics[0]["metrics"]["load_error"] = str(exc)
+            config.final_metrics.save()
+            load_times = {}
+        config.keras_load_time = load_times.get("keras", 0)
+        config.codebook_load_time = load_times.get("codebook", 0)
+
     def build_model_from_config(self) -> None:
         """
         Builds a neural network model based on the provided configuration.
@@ -150,6 +180,10 @@ class NeuralNetwork:
             model = self.training_config.network_model.clustering_options.build_clustered_model(
                 model
             )
+        if self.training_config.network_model.quantization_options:
+            model = self.training_config.network_model.quantization_options.build_quantized_model(
+                model
+            )
         model.compile(**self.training_config.hyper_parameters.get_as_dict())
         logger.success("Model is initiated.")
         model.summary()
@@ -171,6 +205,9 @@ class NeuralNetwork:
             self.test_dataset,
             self.eval_dataset,
         ) = self.training_config.dataset.get_data()
+        self.training_config.record_dataset_cache(
+            self.training_config.dataset.cache_statistics
+        )
 
         logger.success("Data is loaded.")
 
@@ -203,8 +240,18 @@ class NeuralNetwork:
             )
         )
 
-        self.model.fit(
-            self.train_dataset.shuffle(60000).batch(batch_size),
+        train_model = self.model
+        train_dataset = self.train_dataset
+        distillation = self.get_distillation()
+        if distillation:
+            logger.info(f"Distilling {distillation.teacher_name} into the network")
+            train_model = distillation.build_distiller(
+                self.model, self.training_config.hyper_parameters.get_as_dict()
+            )
+            train_dataset = distillation.get_training_data(self.train_dataset)
+
+        train_model.fit(
+            train_dataset.shuffle(60000).batch(batch_size),
             epochs=epochs,
             validation_data=self.test_dataset.batch(batch_size),
             callbacks=callbacks,
@@ -217,6 +264,9 @@ class NeuralNetwork:
             workers=fit_parameters.workers,
             use_multiprocessing=fit_parameters.use_multiprocessing,
         )
+        quantization_options = self.training_config.network_model.quantization_options
+        if quantization_options and quantization_options.needs_fine_tuning(self.model):
+            self.fine_tune_quantized(quantization_options, batch_size)
         self.training_config.save_model_on_disk(self.model)
         if self.training_config.gpu.startswith("GPU"):
             self.training_config.memory_usage = tf.config.experimental.get_memory_info(
@@ -231,6 +281,51 @@ class NeuralNetwork:
 
         logger.success("Finished training of neural network.")
 
+    def get_export_model(self):
+        """
+        Returns the trained model without pruning and clustering wrappers.
+        """
+        export_model = self.training_config.network_model.get_export_model(self.model)
+        if self.training_config.network_model.clustering_options:
+            export_model = self.training_config.network_model.clustering_options.get_cluster_export_model(
+                export_model
+            )
+        return export_model
+
+    def get_distillation(self):
+        """
+        Returns the distillation of the training, None if it is a plain training.
+        """
+        return Distillation.objects.filter(student=self.training_config).first()
+
+    def fine_tune_quantized(self, quantization_options, batch_size):
+        """
+        Quantizes the trained pruned or clustered model and fine tunes it with quantization
+        aware training, keeping its sparsity and clusters.
+
+        Args:
+            quantization_options (QuantizableNetwork): The quantization options of the model.
+            batch_size (int): Batch size of the fine tuning.
+
+        Returns:
+            None
+        """
+        network_model = self.training_config.network_model
+        clustering_options = network_model.clustering_options
+        model = quantization_options.build_fine_tune_model(
+            self.get_export_model(),
+            pruned=bool(network_model.pruning_method),
+            clustered=bool(clustering_options and clustering_options.use_clustering),
+        )
+        model.compile(**self.training_config.hyper_parameters.get_as_dict())
+        logger.info("Started quantization aware fine tuning of the network...")
+        model.fit(
+            self.train_dataset.shuffle(60000).batch(batch_size),
+            epochs=quantization_options.fine_tune_epochs,
+            validation_data=self.test_dataset.batch(batch_size),
+        )
+        self.model = model
+
     def validate(self):
         """
         Perform network validation using the test dataset.
@@ -295,17 +390,13 @@ class NeuralNetwork:
         Raises:
             None.
         """
-        # sleep for one second to cool donw the gpu
-        # energy measurement returns the average over the last second,
-        # so make sure the training does not affect this metric
-        time.sleep(1)
+        # the export may benchmark the model, it runs before the device settles
+        predict_model = self.get_export_model()
+        # wait until the device cooled down from the training,
+        # so that the training does not affect the energy measurement
+        settle_time = wait_until_settled(self.training_config.gpu)
         timing_callback = TimingCallback()
         batch_size = 1
-        predict_model = self.training_config.network_model.get_export_model(self.model)
-        if self.training_config.network_model.clustering_options:
-            predict_model = self.training_config.network_model.clustering_options.get_cluster_export_model(
-                predict_model
-            )
         final_model_size = int(
             np.sum([K.count_params(w) for w in predict_model.trainable_weights])
         )
@@ -321,7 +412,11 @@ class NeuralNetwork:
             + self.training_config.evaluation_parameters.get_callbacks(
                 self.training_config
             )
-            + [EvaluationBaseCallback(self.training_config, final_sparsity)],
+            + [
+                EvaluationBaseCallback(
+                    self.training_config, final_sparsity, settle_time=settle_time
+                )
+            ],
         )
         predict_layer = list(predictions.keys())[-1]
         return predictions[predict_layer]
@@ -0,0 +1,69 @@
+import traceback
+
+from loguru import logger
+
+from celery import shared_task
+from helper_scripts.database import lock_safe_db_operation
+from helper_scripts.ingestion import ingest
+from neural_architecture.models.dataset import LocalDataset
+
+# the progress on the model is only saved in steps of it, to spare the database
+PROGRESS_STEP = 0.05
+
+
+@shared_task(bind=True)
+def ingest_local_dataset(self, local_dataset_id):
+    """
+    Validates an uploaded LocalDataset, infers its schema and statistics and converts it into
+    compressed TFRecord shards next to the upload. The progress is recorded on the model and
+    the task state.
+
+    Args:
+        local_dataset_id (int): The ID of the LocalDataset.
+    """
+    local_dataset = LocalDataset.objects.get(pk=local_dataset_id)
+    local_dataset.status = "ingesting"
+    local_dataset.progress = 0
+    lock_safe_db_operation(
+        lambda: local_dataset.save(update_fields=["status", "progress"])
+    )
+
+    def record_progress(progress):
+        self.update_state(
+            state="PROGRESS",
+            meta={
+                "local_dataset_id": local_dataset_id,
+                "current": progress,
+                "total": 1,
+            },
+        )
+        if progress - local_dataset.progress >= PROGRESS_STEP:
+            local_dataset.progress = progress
+            lock_safe_db_operation(
+                lambda: local_dataset.save(update_fields=["progress"])
+            )
+
+    try:
+        shards_path = f"{local_dataset.file.path}.shards"
+        metadata = ingest(
+            local_dataset.file.path,
+            shards_path,
+            local_dataset.label_column,
+            progress=record_progress,
+        )
+        local_dataset.schema = metadata["schema"]
+        local_dataset.statistics = metadata["statistics"]
+        local_dataset.splits = metadata["splits"]
+        local_dataset.shards_path = shards_path
+        local_dataset.status = "ready"
+        local_dataset.progress = 1
+        lock_safe_db_operation(lambda: local_dataset.save())
+        self.update_state(state="SUCCESS")
+    except Exception as error:
+        logger.error("Failure while ingesting the dataset: " + traceback.format_exc())
+        local_dataset.status = "failed"
+        local_dataset.error = str(error)
+        lock_safe_db_operation(
+            lambda: local_dataset.save(update_fields=["status", "error"])
+        )
+        self.update_state(state="FAILED")
@@ -0,0 +1,947 @@
+import gc
+import os
+import tempfile
+import time
+from unittest import mock
+
+import keras
+import numpy as np
+import scipy.sparse
+import tensorflow as tf
+import tensorflow_model_optimization as tfmot
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from sklearn import datasets
+
+from helper_scripts import power_sampler
+from helper_scripts.array_cache import array_dataset, load_arrays, save_arrays
+from helper_scripts.codebook_format import (
+    decode_varints,
+    encode_varints,
+    load_codebook_model,
+    run_length_decode,
+    run_length_encode,
+    save_codebook_model,
+)
+from helper_scripts.compaction import compact_model, compact_pruned_model
+from helper_scripts.dataset_cache import DatasetCache
+from helper_scripts.distillation import (
+    Distiller,
+    cache_teacher_logits,
+    compare_models,
+    with_teacher_logits,
+)
+from helper_scripts.energy_attribution import (
+    EnergyProfiler,
+    energy_profiler,
+    integrate_power,
+)
+from helper_scripts.energy_counter import RaplEnergyCounter, get_energy_counter
+from helper_scripts.ingestion import ingest, read_ingested
+from helper_scripts.power_sampler import (
+    FakePowerSource,
+    PowerSampler,
+    PowerSourceUnavailableError,
+    StreamingCommandPowerSource,
+    acquire_power_sampler,
+    release_power_sampler,
+)
+from helper_scripts.pruning import PruningBookkeeping, collect_prunable_layers
+from helper_scripts.quantization import (
+    export_int8_model,
+    has_optimization_wrappers,
+    is_quantized_model,
+    quantize_model,
+    strip_quantization,
+)
+from helper_scripts.sparse_inference import (
+    SparseDense,
+    densify_model,
+    sparsify_model,
+)
+from inference.helper_scripts.tflite import convert_to_tflite
+from neural_architecture.helper_scripts.architecture import calculate_flops
+from neural_architecture.helper_scripts.model_analysis import (
+    analyse_layers,
+    analyse_model,
+    architecture_fingerprint,
+)
+from neural_architecture.models.architecture import NetworkConfiguration
+from neural_architecture.models.dataset import (
+    Dataset,
+    DatasetLoader,
+    LocalDataset,
+    SkLearnDatasetLoader,
+)
+from neural_architecture.NetworkCallbacks.energy_callback import EnergyCallback
+from neural_architecture.neural_net import NeuralNetwork
+from plugins.interfaces.dataset import DatasetLoaderInterface
+from plugins.interfaces.pruning_method import PruningInterface
+
+
+class PowerSamplerTestCase(SimpleTestCase):
+    def test_window_queries(self):
+        sampler = PowerSampler("CPU:0", FakePowerSource())
+        for timestamp, value in [(1.0, 10.0), (2.0, 20.0), (3.0, 30.0), (4.0, 40.0)]:
+            sampler.append(timestamp, value)
+
+        self.assertEqual(sampler.get_measurements(2.0, 3.0), [20.0, 30.0])
+        self.assertEqual(sampler.average_power(1.5, 4.0), 30.0)
+        # a window without readings falls back to the latest reading before its end
+        self.assertEqual(sampler.get_measurements(3.2, 3.8), [30.0])
+        self.assertEqual(sampler.get_latest(), 40.0)
+
+    def test_ring_buffer_is_bounded(self):
+        sampler = PowerSampler("CPU:0", FakePowerSource(), buffer_size=3)
+        for timestamp in range(10):
+            sampler.append(float(timestamp), float(timestamp))
+        self.assertEqual(sampler.get_measurements(), [7.0, 8.0, 9.0])
+
+    def test_sampling_thread_reads_fake_source(self):
+        sampler = PowerSampler(
+            "CPU:0", FakePowerSource([5.0, 15.0], poll_interval=0.001)
+        )
+        start = time.monotonic()
+        sampler.start()
+        self.assertTrue(sampler.wait_for_sample())
+        time.sleep(0.05)
+        sampler.stop()
+
+        self.assertFalse(sampler.is_running)
+        measurements = sampler.get_measurements(start, time.monotonic())
+        self.assertGreater(len(measurements), 1)
+        self.assertTrue(set(measurements) <= {5.0, 15.0})
+
+    def test_wait_until_settled(self):
+        # the power decays from 200 W to the idle power of 50 W
+        values = iter([200.0, 150.0, 100.0, 70.0] + [50.0] * 10000)
+        sampler = PowerSampler(
+            "GPU:0", FakePowerSource(lambda: next(values), poll_interval=0.005)
+        )
+        sampler.idle_power = 50.0
+        sampler.start()
+        settle_time = sampler.wait_until_settled(window=0.05, tolerance=0.1, timeout=5)
+        sampler.stop()
+        self.assertLess(settle_time, 5)
+        self.assertTrue(sampler.is_settled(0.05, 0.1, 50.0))
+
+    def test_settle_timeout(self):
+        sampler = PowerSampler(
+            "GPU:0", FakePowerSource([100.0, 10.0], poll_interval=0.005)
+        )
+        sampler.start()
+        settle_time = sampler.wait_until_settled(
+            window=0.05, tolerance=0.1, timeout=0.2
+        )
+        sampler.stop()
+        self.assertGreaterEqual(settle_time, 0.2)
+
+    def test_runs_share_sampler_of_device(self):
+        first = acquire_power_sampler("GPU:7", FakePowerSource(1.0))
+        second = acquire_power_sampler("GPU:7", FakePowerSource(2.0))
+        self.assertIs(first, second)
+
+        release_power_sampler("GPU:7")
+        self.assertTrue(first.is_running)
+        release_power_sampler("GPU:7")
+        self.assertFalse(first.is_running)
+
+    def test_unavailable_source_is_not_registered(self):
+        source = StreamingCommandPowerSource(["/nonexistent/power-tool"])
+        with self.assertRaises(PowerSourceUnavailableError):
+            acquire_power_sampler("GPU:8", source)
+        self.assertNotIn("GPU:8", power_sampler._samplers)
+
+        with mock.patch.object(
+            power_sampler, "get_power_source", return_value=source
+        ), mock.patch.object(power_sampler, "SETTLE_WINDOW", 0.01):
+            self.assertEqual(power_sampler.wait_until_settled("GPU:8"), 0.01)
+        self.assertNotIn("GPU:8", power_sampler._samplers)
+
+
+class RaplEnergyCounterTestCase(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = self.directory.name
+        self.write_zone("intel-rapl:0", 1000, 2000)
+        self.write_zone("intel-rapl:1", 500, 2000)
+        # subzones are part of their package and must not be counted
+        self.write_zone("intel-rapl:0:0", 700, 2000)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_zone(self, name, energy, max_energy_range):
+        path = os.path.join(self.root, name)
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, "energy_uj"), "w", encoding="utf-8") as file:
+            file.write(f"{energy}\n")
+        with open(
+            os.path.join(path, "max_energy_range_uj"), "w", encoding="utf-8"
+        ) as file:
+            file.write(f"{max_energy_range}\n")
+
+    def test_energy_of_packages(self):
+        counter = RaplEnergyCounter(self.root)
+        self.assertEqual(
+            [zone.name for zone in counter.zones], ["intel-rapl:0", "intel-rapl:1"]
+        )
+        start = counter.read()
+        self.write_zone("intel-rapl:0", 1600, 2000)
+        self.write_zone("intel-rapl:1", 900, 2000)
+        self.write_zone("intel-rapl:0:0", 1500, 2000)
+        self.assertAlmostEqual(counter.read() - start, 1000 / 1e6)
+
+    def test_wraparound(self):
+        counter = RaplEnergyCounter(self.root)
+        start = counter.read()
+        # 1000 -> 2000 -> 0 -> 300
+        self.write_zone("intel-rapl:0", 300, 2000)
+        self.assertAlmostEqual(counter.read() - start, 1301 / 1e6)
+
+    def test_unavailable_counters(self):
+        self.assertIsNone(get_energy_counter("GPU:0", self.root))
+        self.assertIsNone(
+            get_energy_counter("CPU:0", os.path.join(self.root, "missing"))
+        )
+        self.assertIsInstance(get_energy_counter("CPU:0", self.root), RaplEnergyCounter)
+
+
+class EnergyAttributionTestCase(SimpleTestCase):
+    def test_integrate_power(self):
+        timestamps = [0.0, 1.0, 2.0, 3.0]
+        power = [10.0, 20.0, 20.0, 0.0]
+        energy = integrate_power(
+            timestamps, power, [0.0, 0.5, 1.0, -1.0, 3.0], [3.0, 1.5, 1.0, 0.0, 4.0]
+        )
+        # 15 + 20 + 10; ramp 15 -> 20 plus constant 20; empty; held before; held after
+        self.assertEqual(energy.tolist(), [45.0, 18.75, 0.0, 10.0, 0.0])
+        self.assertTrue(np.isnan(integrate_power([], [], [0.0], [1.0])).all())
+
+    def test_batches_of_energy_counter(self):
+        class StepCounter:
+            # every read adds 2 joules
+            energy = 0.0
+
+            def read(self):
+                self.energy += 2.0
+                return self.energy
+
+        profiler = EnergyProfiler(energy_counter=StepCounter(), idle_power=0.0)
+        profiler.begin_phase("predict")
+        for _ in range(3):
+            profiler.begin_batch("predict")
+            profiler.end_batch("predict", size=4)
+        metrics = profiler.attribute("predict")
+
+        self.assertEqual(metrics["predict_batch_energy [J]"], 2.0)
+        self.assertEqual(metrics["predict_batches_energy_net [J]"], 6.0)
+        self.assertEqual(metrics["predict_energy [J]"], 14.0)
+        self.assertEqual(metrics["predict_energy_per_sample [J]"], 0.5)
+        self.assertEqual(profiler.attribute("train"), {})
+
+    def test_profiler_without_power_source(self):
+        source = StreamingCommandPowerSource(["/nonexistent/power-tool"])
+        with mock.patch.object(power_sampler, "get_power_source", return_value=source):
+            with energy_profiler("GPU:9") as profiler:
+                self.assertIsNone(profiler)
+        self.assertNotIn("GPU:9", power_sampler._samplers)
+
+    @mock.patch(
+        "neural_architecture.NetworkCallbacks.energy_callback.IDLE_POWER_MEASUREMENT_DURATION",
+        0,
+    )
+    def test_callback_releases_sampler_at_phase_end(self):
+        model = keras.Sequential([keras.Input(shape=(3,)), keras.layers.Dense(2)])
+        model.compile(optimizer="sgd", loss="mse")
+        x, y = np.ones((8, 3)), np.ones((8, 2))
+        callback = EnergyCallback(mock.Mock(gpu="GPU:7"))
+        held_during_training = []
+
+        class Probe(keras.callbacks.Callback):
+            def on_epoch_end(self, epoch, logs=None):
+                held_during_training.append("GPU:7" in power_sampler._samplers)
+
+        source = FakePowerSource(10.0, poll_interval=0.001)
+        with mock.patch.object(power_sampler, "get_power_source", return_value=source):
+            model.fit(
+                x,
+                y,
+                epochs=2,
+                validation_data=(x, y),
+                callbacks=[callback, Probe()],
+                verbose=0,
+            )
+            self.assertEqual(held_during_training, [True, True])
+            self.assertNotIn("GPU:7", power_sampler._samplers)
+
+            model.predict(x, callbacks=[callback], verbose=0)
+            self.assertIsNone(callback.sampler)
+            self.assertNotIn("GPU:7", power_sampler._samplers)
+
+    @mock.patch(
+        "neural_architecture.NetworkCallbacks.energy_callback.IDLE_POWER_MEASUREMENT_DURATION",
+        0,
+    )
+    def test_callback_without_power_source(self):
+        model = keras.Sequential([keras.Input(shape=(3,)), keras.layers.Dense(2)])
+        callback = EnergyCallback(mock.Mock(gpu="GPU:9"))
+        source = StreamingCommandPowerSource(["/nonexistent/power-tool"])
+        with mock.patch.object(power_sampler, "get_power_source", return_value=source):
+            model.predict(np.ones((4, 3)), callbacks=[callback], verbose=0)
+        self.assertIsNone(callback.sampler)
+        self.assertFalse(callback.power_source_available)
+        self.assertNotIn("GPU:9", power_sampler._samplers)
+
+
+class CompactionTestCase(SimpleTestCase):
+    def _branched_model(self):
+        inputs = keras.Input(shape=(8, 8, 3))
+        left = keras.layers.Conv2D(6, 3, activation="relu", name="left")(inputs)
+        right = keras.layers.Conv2D(6, 3, name="right")(inputs)
+        merged = keras.layers.Add()([left, right])
+        other = keras.layers.Conv2D(4, 3, name="other")(inputs)
+        x = keras.layers.Concatenate()([merged, other])
+        x = keras.layers.MaxPooling2D()(x)
+        x = keras.layers.Flatten()(x)
+        x = keras.layers.Dense(5, activation="relu", name="hidden")(x)
+        outputs = keras.layers.Dense(2, name="output")(x)
+        return keras.Model(inputs, outputs)
+
+    @staticmethod
+    def _prune(layer, channels):
+        weights = layer.get_weights()
+        weights[0][..., channels] = 0
+        weights[1][channels] = 0
+        layer.set_weights(weights)
+
+    def test_compacts_zero_channels(self):
+        model = self._branched_model()
+        # channel 1 is only removable from the add if both branches are zero
+        self._prune(model.get_layer("left"), [0, 1])
+        self._prune(model.get_layer("right"), [0])
+        self._prune(model.get_layer("other"), [3])
+        self._prune(model.get_layer("hidden"), [2])
+
+        compacted, removed = compact_model(model)
+        self.assertEqual(removed, {"left": 1, "right": 1, "other": 1, "hidden": 1})
+        self.assertLess(compacted.count_params(), model.count_params())
+        inputs = np.random.default_rng(1).standard_normal((4, 8, 8, 3))
+        np.testing.assert_allclose(
+            model.predict_on_batch(inputs),
+            compacted.predict_on_batch(inputs),
+            rtol=1e-5,
+            atol=1e-5,
+        )
+
+    def test_keeps_models_that_can_not_be_compacted(self):
+        inputs = keras.Input(shape=(4,))
+        shared = keras.layers.Dense(4)
+        model = keras.Model(inputs, shared(shared(inputs)))
+        self._prune(shared, [0])
+
+        export_model, report = compact_pruned_model(model)
+        self.assertIs(export_model, model)
+        self.assertIn("error", report)
+
+    def test_export_model_is_compacted_once(self):
+        model = self._branched_model()
+        self._prune(model.get_layer("hidden"), [2])
+        network_model = NetworkConfiguration(compact_export_model=True)
+        with mock.patch.object(
+            NetworkConfiguration, "pruning_method", True
+        ), mock.patch(
+            "neural_architecture.models.model_optimization.compact_pruned_model",
+            wraps=compact_pruned_model,
+        ) as compact:
+            export_model = network_model.get_export_model(model)
+            self.assertIs(network_model.get_export_model(model), export_model)
+            self.assertEqual(compact.call_count, 1)
+            # the latency is only measured on request, outside of the export
+            self.assertNotIn("speedup", network_model.compaction_report)
+            network_model.measure_compaction_latency(model)
+        self.assertIn("speedup", network_model.compaction_report)
+
+
+class SparseInferenceTestCase(SimpleTestCase):
+    def test_sparse_dense_layers(self):
+        inputs = keras.Input(shape=(3, 16))
+        x = keras.layers.Dense(32, activation="relu", name="sparse")(inputs)
+        outputs = keras.layers.Dense(4, name="dense")(x)
+        model = keras.Model(inputs, outputs)
+        layer = model.get_layer("sparse")
+        kernel, bias = layer.get_weights()
+        kernel[np.random.default_rng(0).random(kernel.shape) < 0.9] = 0
+        layer.set_weights([kernel, bias])
+
+        # the crossover only depends on the machine, 0.8 puts the layers on both sides
+        with mock.patch(
+            "helper_scripts.sparse_inference.measure_crossover", return_value=0.8
+        ):
+            sparse_model, report = sparsify_model(model, min_sparsity=0.5)
+        self.assertEqual(report["sparse_layers"], 1)
+        self.assertEqual([layer["sparse"] for layer in report["layers"]], [True, False])
+        self.assertIsInstance(sparse_model.get_layer("sparse"), SparseDense)
+        self.assertEqual(
+            len(sparse_model.get_layer("sparse").kernel_values.numpy()),
+            np.count_nonzero(kernel),
+        )
+
+        samples = np.random.default_rng(1).standard_normal((5, 3, 16))
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "sparse.keras")
+            sparse_model.save(file_path, save_format="keras")
+            loaded = keras.models.load_model(file_path)
+        dense_model = densify_model(loaded)
+        self.assertIs(type(dense_model.get_layer("sparse")), keras.layers.Dense)
+        for other in [loaded, dense_model]:
+            np.testing.assert_allclose(
+                model.predict_on_batch(samples),
+                other.predict_on_batch(samples),
+                rtol=1e-5,
+                atol=1e-5,
+            )
+
+
+class CodebookFormatTestCase(SimpleTestCase):
+    def test_run_length_encoding(self):
+        values = [0, 1, 127, 128, 300, 2**35]
+        self.assertEqual(decode_varints(encode_varints(values)).tolist(), values)
+        for mask in [[True, True, False, True], [False] * 200 + [True], []]:
+            self.assertEqual(
+                run_length_decode(run_length_encode(mask)).tolist(), list(mask)
+            )
+
+    def test_round_trip_of_clustered_model(self):
+        model = keras.Sequential(
+            [
+                keras.Input(shape=(6, 6, 1)),
+                keras.layers.Conv2D(8, 3, activation="relu"),
+                keras.layers.Flatten(),
+                keras.layers.Dense(64),
+            ]
+        )
+        rng = np.random.default_rng(0)
+        centroids = rng.standard_normal(16).astype(np.float32)
+        kernel = centroids[rng.integers(0, 16, (128, 64))]
+        # pruned units give long runs of zeros
+        kernel[:, 16:48] = 0
+        model.layers[-1].set_weights([kernel, np.zeros(64, dtype=np.float32)])
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "model.nasocb")
+            size = save_codebook_model(model, file_path)
+            loaded = load_codebook_model(file_path)
+        # 4 bit indices of the nonzero kernel weights dominate the file
+        self.assertLess(size, kernel.nbytes / 4)
+        for weights, loaded_weights in zip(model.get_weights(), loaded.get_weights()):
+            np.testing.assert_array_equal(weights, loaded_weights)
+
+    def test_failed_reload_is_recorded(self):
+        config = mock.Mock()
+        config.measure_load_times.side_effect = OSError("model file is missing")
+        config.final_metrics.metrics = [{"metrics": {"loss": 0.5}}]
+
+        NeuralNetwork().record_load_times(config)
+        self.assertEqual(
+            config.final_metrics.metrics[0]["metrics"],
+            {"loss": 0.5, "load_error": "model file is missing"},
+        )
+        config.final_metrics.save.assert_called_once()
+        self.assertEqual(config.keras_load_time, 0)
+        self.assertEqual(config.codebook_load_time, 0)
+
+
+class QuantizationTestCase(SimpleTestCase):
+    def test_quantization_aware_model_is_exported_as_int8(self):
+        inputs = keras.Input(shape=(64,))
+        outputs = keras.layers.Dense(128, activation="relu")(inputs)
+        outputs = keras.layers.LayerNormalization()(outputs)
+        model = keras.Model(inputs, keras.layers.Dense(4)(outputs))
+        self.assertFalse(has_optimization_wrappers(model))
+
+        quantized_model = quantize_model(model, include_last_layer=False)
+        self.assertTrue(is_quantized_model(quantized_model))
+        quantized_model.compile("adam", "mse")
+        rng = np.random.default_rng(0)
+        quantized_model.fit(
+            rng.random((32, 64)), rng.random((32, 4)), epochs=1, verbose=0
+        )
+
+        float_model = strip_quantization(quantized_model)
+        self.assertFalse(is_quantized_model(float_model))
+        with tempfile.TemporaryDirectory() as directory:
+            float_model.save(os.path.join(directory, "model.keras"))
+            loaded = keras.models.load_model(os.path.join(directory, "model.keras"))
+            size = export_int8_model(
+                quantized_model, os.path.join(directory, "model_int8.tflite")
+            )
+        for weights, loaded_weights in zip(
+            float_model.get_weights(), loaded.get_weights()
+        ):
+            np.testing.assert_array_equal(weights, loaded_weights)
+        self.assertLess(size, len(convert_to_tflite(float_model, "float32")) / 2)
+
+
+class MedianPruning(keras.layers.Wrapper, PruningInterface):
+    """
+    Prunes the kernel weights of a dense layer below the median magnitude.
+    """
+
+    def __init__(self, to_prune, **kwargs):
+        super().__init__(to_prune, **kwargs)
+
+    def build(self, input_shape):
+        super().build(input_shape)
+        self.mask = self.add_weight(
+            "mask", shape=self.layer.kernel.shape, initializer="ones", trainable=False
+        )
+
+    def call(self, inputs):
+        return self.layer(inputs)
+
+    def weight_mask_op(self):
+        self.layer.kernel.assign(self.layer.kernel * self.mask)
+
+    @property
+    def sparsity(self):
+        return 1 - float(tf.reduce_mean(self.mask))
+
+    def conditional_mask_update(self):
+        magnitudes = np.abs(self.layer.kernel.numpy())
+        self.mask.assign((magnitudes >= np.median(magnitudes)).astype(np.float32))
+
+    def strip_pruning(self):
+        return self.layer
+
+
+class DistillationTestCase(SimpleTestCase):
+    def test_student_learns_from_cached_teacher_logits(self):
+        rng = np.random.default_rng(0)
+        inputs = rng.standard_normal((256, 8)).astype(np.float32)
+        labels = (inputs[:, 0] > 0).astype(np.int64)
+        dataset = tf.data.Dataset.from_tensor_slices((inputs, labels))
+        teacher = keras.Sequential(
+            [keras.Input(shape=(8,)), keras.layers.Dense(2, activation="softmax")]
+        )
+        kernel = np.zeros((8, 2), dtype=np.float32)
+        kernel[0] = [-5, 5]
+        teacher.set_weights([kernel, np.zeros(2, dtype=np.float32)])
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "cache", "logits.npy")
+            logits = cache_teacher_logits(teacher, dataset, file_path)
+            # the second student reads the cache without running the teacher
+            np.testing.assert_array_equal(
+                cache_teacher_logits(None, dataset, file_path), logits
+            )
+            training_data = with_teacher_logits(dataset, logits).shuffle(256)
+
+            student = keras.Sequential([keras.Input(shape=(8,)), keras.layers.Dense(2)])
+            distiller = Distiller(student, temperature=2.0, alpha=0.0)
+            distiller.compile(
+                optimizer=keras.optimizers.Adam(0.05),
+                loss=keras.losses.SparseCategoricalCrossentropy(from_logits=True),
+            )
+            history = distiller.fit(training_data.batch(32), epochs=10, verbose=0)
+        losses = history.history["distillation_loss"]
+        self.assertLess(losses[-1], losses[0] / 2)
+        predictions = np.argmax(student.predict(inputs, verbose=0), axis=-1)
+        self.assertGreater(np.mean(predictions == labels), 0.9)
+
+    def test_plugin_pruned_student_is_distilled(self):
+        rng = np.random.default_rng(0)
+        inputs = rng.standard_normal((64, 8)).astype(np.float32)
+        logits = rng.standard_normal((64, 2)).astype(np.float32)
+        dataset = with_teacher_logits(
+            tf.data.Dataset.from_tensor_slices((inputs, np.zeros(64, np.int64))),
+            logits,
+        )
+        pruned_layer = MedianPruning(keras.layers.Dense(2))
+        student = keras.Sequential([keras.Input(shape=(8,)), pruned_layer])
+        distiller = Distiller(student)
+        distiller.compile(
+            optimizer="adam",
+            loss=keras.losses.SparseCategoricalCrossentropy(from_logits=True),
+        )
+        self.assertEqual(collect_prunable_layers(distiller), [pruned_layer])
+
+        bookkeeping = PruningBookkeeping(distiller)
+        distiller.fit(
+            dataset.batch(16),
+            epochs=2,
+            verbose=0,
+            callbacks=[
+                keras.callbacks.LambdaCallback(
+                    on_epoch_end=lambda *_: bookkeeping.update()
+                )
+            ],
+        )
+        self.assertAlmostEqual(
+            bookkeeping.layer_sparsities(update_masks=False)[pruned_layer.name], 0.5
+        )
+        self.assertEqual(np.count_nonzero(pruned_layer.layer.kernel.numpy()), 8)
+
+    def test_models_are_compared_without_power_source(self):
+        dataset = tf.data.Dataset.from_tensor_slices(
+            (np.ones((8, 4), dtype=np.float32), np.zeros(8, dtype=np.int64))
+        )
+        model = keras.Sequential([keras.Input(shape=(4,)), keras.layers.Dense(2)])
+        source = StreamingCommandPowerSource(["/nonexistent/power-tool"])
+        with mock.patch(
+            "helper_scripts.energy_attribution.get_energy_counter", return_value=None
+        ), mock.patch.object(power_sampler, "get_power_source", return_value=source):
+            results = compare_models(
+                {"student": model},
+                dataset,
+                "CPU:0",
+                4,
+                warmup=1,
+                iterations=2,
+                trials=1,
+            )
+        self.assertEqual(results["student"]["parameters"], 10)
+        self.assertIn("latency_p50 [ms]", results["student"])
+        self.assertNotIn("energy_per_sample [J]", results["student"])
+
+    def test_stale_logits_are_recomputed(self):
+        inputs = np.ones((8, 2), dtype=np.float32)
+        # filtering makes the cardinality unknown, like datasets read from a cache
+        dataset = tf.data.Dataset.from_tensor_slices((inputs, np.zeros(8))).filter(
+            lambda *_: True
+        )
+        teacher = keras.Sequential([keras.Input(shape=(2,)), keras.layers.Dense(3)])
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "logits.npy")
+            np.save(file_path, np.zeros((4, 3), dtype=np.float32))
+            self.assertEqual(len(cache_teacher_logits(teacher, dataset, file_path)), 8)
+
+
+class PruningBookkeepingTestCase(SimpleTestCase):
+    def test_sparsity_is_reduced_per_layer(self):
+        model = tfmot.sparsity.keras.prune_low_magnitude(
+            keras.Sequential(
+                [
+                    keras.Input(shape=(8,)),
+                    keras.layers.Dense(16),
+                    keras.layers.Dense(4),
+                ]
+            )
+        )
+        first, second = model.layers
+        first.pruning_vars[0][1].assign(np.repeat([[0.0] * 12 + [1.0] * 4], 8, axis=0))
+        second.pruning_vars[0][1].assign(np.ones((16, 4)))
+
+        bookkeeping = PruningBookkeeping(model)
+        sparsities = bookkeeping.layer_sparsities()
+        self.assertAlmostEqual(sparsities[first.name], 0.75)
+        self.assertAlmostEqual(sparsities[second.name], 0.0)
+        trainable = sum(np.prod(w.shape) for w in model.trainable_weights)
+        self.assertAlmostEqual(bookkeeping.update(), 96 / trainable, places=6)
+
+    def test_layers_without_weights_are_skipped(self):
+        model = tfmot.sparsity.keras.prune_low_magnitude(
+            keras.Sequential(
+                [
+                    keras.Input(shape=(8, 8, 1)),
+                    keras.layers.Conv2D(4, 3),
+                    keras.layers.MaxPooling2D(),
+                    keras.layers.Flatten(),
+                    keras.layers.Dropout(0.5),
+                    keras.layers.Dense(2),
+                ]
+            )
+        )
+        bookkeeping = PruningBookkeeping(model)
+        self.assertEqual(len(bookkeeping.tfmot_layers), 2)
+        sparsities = bookkeeping.layer_sparsities()
+        self.assertEqual(
+            set(sparsities), {layer.name for layer in bookkeeping.tfmot_layers}
+        )
+        self.assertEqual(bookkeeping.update(), 0.0)
+
+
+class ModelAnalysisTestCase(SimpleTestCase):
+    def test_layers_are_counted(self):
+        inputs = keras.Input(shape=(8, 8, 3))
+        outputs = keras.layers.Conv2D(4, 3, padding="same", use_bias=False)(inputs)
+        outputs = keras.layers.Reshape((16, 16))(outputs)
+        outputs = keras.layers.LSTM(5)(outputs)
+        shared = keras.Sequential([keras.Input(shape=(5,)), keras.layers.Dense(2)])
+        outputs = keras.layers.Add()([shared(outputs), shared(outputs)])
+        model = keras.Model(inputs, outputs)
+
+        analysis = analyse_model(model, batch_size=2)
+        conv_macs = 8 * 8 * 4 * 3 * 9
+        lstm_macs = 16 * 4 * 5 * (16 + 5)
+        dense_macs = 2 * 5 * 2
+        self.assertEqual(analysis["macs"], 2 * (conv_macs + lstm_macs + dense_macs))
+        self.assertEqual(analysis["params"], model.count_params())
+        self.assertTrue(all(row["covered"] for row in analysis["layers"]))
+
+    def test_sparsity_and_cache(self):
+        model = tfmot.sparsity.keras.prune_low_magnitude(
+            keras.Sequential([keras.Input(shape=(10,)), keras.layers.Dense(20)])
+        )
+        dense_flops = calculate_flops(model, 1)
+        self.assertEqual(dense_flops, 2 * 200 + 20)
+        self.assertEqual(calculate_flops(model, 1, {model.layers[0].name: 0.5}), 220)
+        self.assertEqual(
+            architecture_fingerprint(model),
+            architecture_fingerprint(keras.models.clone_model(model)),
+        )
+        self.assertIs(analyse_layers(model), analyse_layers(model))
+
+
+class ArangeDatasetLoader(DatasetLoaderInterface):
+    def get_info(self, name="", *args, **kwargs):
+        return {}
+
+    def get_data(self, name="", *args, **kwargs):
+        inputs = np.arange(40, dtype=np.float32).reshape(10, 4)
+        return tuple(
+            tf.data.Dataset.from_tensor_slices((inputs[part], np.arange(10)[part]))
+            for part in [slice(0, 6), slice(6, 8), slice(8, 10)]
+        )
+
+    def get_element_size(self, *args, **kwargs):
+        return (4,)
+
+    def get_size(self, *args, **kwargs):
+        return 10
+
+    def get_datasets(self, *args, **kwargs):
+        return ["arange"]
+
+
+class StreamingArangeDatasetLoader(ArangeDatasetLoader):
+    streaming = True
+
+    def get_data(self, name="", *args, **kwargs):
+        raise AssertionError("streaming loaders are read from their generators")
+
+    def get_element_spec(self, name="", *args, **kwargs):
+        return (tf.TensorSpec((4,), tf.float32), tf.TensorSpec((), tf.int64))
+
+    def generate(self, name="", split="train", *args, **kwargs):
+        start, stop = {"train": (0, 30), "test": (30, 35), "eval": (35, 40)}[split]
+        for index in range(start, stop):
+            yield np.full(4, index, dtype=np.float32), index
+
+
+class DatasetCacheTestCase(SimpleTestCase):
+    def test_lru_eviction_skips_used_entries(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = DatasetCache(directory, 10**9)
+            splits = tuple(
+                tf.data.Dataset.from_tensor_slices(np.arange(size, dtype=np.float32))
+                for size in [8, 2, 2]
+            )
+            first, _, statistics = cache.get_or_build("first", lambda: (splits, {}))
+            self.assertEqual(statistics["misses"], 1)
+            cache.get_or_build("second", lambda: (splits, {}))
+            self.assertEqual(list(first[0].as_numpy_iterator()), list(range(8)))
+
+            # the datasets of the second entry are not used anymore
+            cache.max_size = 1
+            self.assertEqual(cache.evict(), ["second"])
+            del first
+            gc.collect()
+            self.assertEqual(cache.evict(), ["first"])
+
+    def test_dataset_is_loaded_from_cache(self):
+        dataset = Dataset(
+            name="arange",
+            dataset_loader=DatasetLoader(
+                module_name="neural_architecture.tests",
+                class_name="ArangeDatasetLoader",
+            ),
+        )
+        with tempfile.TemporaryDirectory() as directory, mock.patch(
+            "neural_architecture.models.dataset.get_dataset_cache",
+            return_value=DatasetCache(directory, 10**9),
+        ):
+            train, test, _ = dataset.get_data()
+            self.assertEqual(dataset.cache_statistics["misses"], 1)
+            with mock.patch.object(
+                ArangeDatasetLoader, "get_data", side_effect=AssertionError
+            ):
+                cached_train, cached_test, _ = dataset.get_data()
+            self.assertEqual(dataset.cache_statistics["hits"], 1)
+            self.assertEqual(dataset.get_element_size(), (4,))
+            for expected, cached in [(train, cached_train), (test, cached_test)]:
+                for (x, y), (cached_x, cached_y) in zip(expected, cached):
+                    np.testing.assert_array_equal(x, cached_x)
+                    np.testing.assert_array_equal(y, cached_y)
+
+    def test_integer_element_size_is_cached(self):
+        dataset = Dataset(
+            name="arange",
+            dataset_loader=DatasetLoader(
+                module_name="neural_architecture.tests",
+                class_name="ArangeDatasetLoader",
+            ),
+        )
+        with tempfile.TemporaryDirectory() as directory, mock.patch(
+            "neural_architecture.models.dataset.get_dataset_cache",
+            return_value=DatasetCache(directory, 10**9),
+        ), mock.patch.object(ArangeDatasetLoader, "get_element_size", return_value=4):
+            dataset.get_data()
+            with mock.patch.object(
+                ArangeDatasetLoader, "get_data", side_effect=AssertionError
+            ):
+                dataset.get_data()
+            self.assertEqual(dataset.cache_statistics["hits"], 1)
+            self.assertEqual(dataset.get_element_size(), (4,))
+            self.assertEqual(dataset.get_size(), 10)
+
+    def test_streaming_dataset_is_sharded(self):
+        dataset = Dataset(
+            name="arange",
+            dataset_loader=DatasetLoader(
+                module_name="neural_architecture.tests",
+                class_name="StreamingArangeDatasetLoader",
+            ),
+        )
+        with tempfile.TemporaryDirectory() as directory, mock.patch(
+            "neural_architecture.models.dataset.get_dataset_cache",
+            return_value=DatasetCache(directory, 10**9),
+        ):
+            dataset.get_data()
+            train, test, _ = dataset.get_data()
+            self.assertEqual(dataset.cache_statistics["hits"], 1)
+            entry = os.path.join(directory, dataset.cache_statistics["key"], "train")
+            self.assertEqual(len(os.listdir(entry)), 8)
+            # the interleaved shards keep the order of the generator
+            self.assertEqual(
+                [label for _, label in train.as_numpy_iterator()], list(range(30))
+            )
+            self.assertEqual(
+                test.element_spec[0], tf.TensorSpec((4,), tf.float32, name=None)
+            )
+
+
+class ArrayCacheTestCase(SimpleTestCase):
+    def test_sklearn_arrays_are_memory_mapped(self):
+        loader = SkLearnDatasetLoader()
+        name = "Handwritten digits (calssifation)"
+        digits = datasets.load_digits()
+        with tempfile.TemporaryDirectory() as directory:
+            splits = loader.get_data(name, data_dir=directory)
+            data = np.concatenate(
+                [
+                    np.stack([x for x, _ in split.as_numpy_iterator()])
+                    for split in splits
+                ]
+            )
+            np.testing.assert_array_equal(data, digits.data)
+            self.assertEqual(loader.element_size, (64,))
+
+            # the info and later loads come from the converted arrays
+            with mock.patch.object(datasets, "load_digits", side_effect=AssertionError):
+                self.assertEqual(
+                    loader.get_info(name, data_dir=directory)["length"], 1797
+                )
+                train, _, _ = loader.get_data(name, data_dir=directory)
+            _, target = next(train.as_numpy_iterator())
+            self.assertEqual(target, digits.target[0])
+
+    def test_sparse_rows_are_densified(self):
+        matrix = scipy.sparse.random(300, 20, density=0.1, format="csr", random_state=0)
+        with tempfile.TemporaryDirectory() as directory:
+            save_arrays(os.path.join(directory, "sparse"), {"data": matrix})
+            arrays = load_arrays(os.path.join(directory, "sparse"))
+            rows = array_dataset((arrays["data"],), 10, 290, chunk_size=64)
+            np.testing.assert_array_equal(
+                np.stack([row for (row,) in rows.as_numpy_iterator()]),
+                matrix.toarray()[10:290],
+            )
+
+
+class DatasetIngestionTestCase(SimpleTestCase):
+    def test_csv_is_converted_into_shards(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "upload.csv")
+            with open(path, "w", encoding="utf-8") as file:
+                file.write("size,colour,label\n")
+                for index in range(20):
+                    file.write(
+                        f"{index},{'red' if index % 3 else 'blue'},{index % 2}\n"
+                    )
+                file.write("20,,1\n")
+            progress = []
+            metadata = ingest(
+                path, os.path.join(directory, "shards"), progress=progress.append
+            )
+
+            self.assertEqual(metadata["schema"]["label"], "label")
+            self.assertEqual(metadata["rows"], 20)
+            self.assertEqual(metadata["splits"]["test"], [16, 18])
+            self.assertEqual(metadata["statistics"]["colour"]["missing"], 1)
+            self.assertEqual(
+                metadata["statistics"]["colour"]["categories"], ["blue", "red"]
+            )
+            self.assertAlmostEqual(metadata["statistics"]["size"]["mean"], 9.5)
+            self.assertEqual(progress[-1], 1.0)
+
+            train, test, _ = read_ingested(os.path.join(directory, "shards"))
+            features, labels = zip(*train.as_numpy_iterator())
+            np.testing.assert_array_equal(features[4], [4, 1])
+            self.assertEqual(list(labels), [index % 2 for index in range(16)])
+            self.assertEqual(len(list(test)), 2)
+
+    @mock.patch("helper_scripts.ingestion.MAX_CATEGORIES", 5)
+    def test_high_cardinality_columns_are_dropped(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "upload.csv")
+            with open(path, "w", encoding="utf-8") as file:
+                file.write("id,size,colour,label\n")
+                for index in range(20):
+                    file.write(f"row{index},{index},{'ab'[index % 2]},{index % 2}\n")
+            metadata = ingest(path, os.path.join(directory, "shards"))
+
+            self.assertEqual(metadata["schema"]["dropped_columns"], ["id"])
+            self.assertEqual(
+                [column["name"] for column in metadata["schema"]["columns"]],
+                ["size", "colour", "label"],
+            )
+            self.assertNotIn("id", metadata["statistics"])
+            train, _, _ = read_ingested(os.path.join(directory, "shards"))
+            features, _ = next(train.as_numpy_iterator())
+            np.testing.assert_array_equal(features, [0, 0])
+
+            with open(path, "w", encoding="utf-8") as file:
+                file.write("size,label\n")
+                for index in range(20):
+                    file.write(f"{index},class{index}\n")
+            with self.assertRaises(ValueError):
+                ingest(path, os.path.join(directory, "shards"))
+
+    def test_invalid_upload_is_rejected(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "upload.csv")
+            with open(path, "w", encoding="utf-8") as file:
+                file.write("size,label\n1,0\n")
+            with self.assertRaises(ValueError):
+                ingest(path, os.path.join(directory, "shards"), label_column="target")
+
+
+class LocalDatasetUploadTestCase(TestCase):
+    def test_upload_queues_ingestion(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            MEDIA_ROOT=directory
+        ), mock.patch(
+            "neural_architecture.tasks.ingest_local_dataset.apply_async"
+        ) as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                local_dataset = LocalDataset.objects.create(
+                    name="upload",
+                    file=SimpleUploadedFile("upload.csv", b"size,label\n1,0\n"),
+                )
+        apply_async.assert_called_once_with(args=(local_dataset.id,), queue=None)
+
+    def test_ingestion_task_is_registered(self):
+        from naso.celery import app
+
+        app.loader.import_default_modules()
+        self.assertIn("neural_architecture.tasks.ingest_local_dataset", app.tasks)
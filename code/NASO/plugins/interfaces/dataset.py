@@ -2,6 +2,21 @@ from abc import ABC, abstractmethod
 
 
 class DatasetLoaderInterface(ABC):
+    # increase it when the preprocessing changes, so datasets of the dataset cache are rebuilt
+    preprocessing_version = 1
+    # whether the preprocessed datasets may be cached on disk and shared between runs
+    cacheable = True
+    # whether the loader yields its splits from `generate` instead of returning them from
+    # `get_data`, so they never have to fit in memory
+    streaming = False
+
+    def get_split_spec(self) -> str:
+        """
+        Describes how the dataset is split into train, test and evaluation data, it is part of
+        the key of the dataset cache.
+        """
+        return ""
+
     def get_sample_images(self, name="", num_examples=9):
         """
         This creates a picture that represents the dataset visually.
@@ -10,6 +25,39 @@ class DatasetLoaderInterface(ABC):
         """
         return name
 
+    def get_element_spec(self, name="", *args, **kwargs):
+        """
+        Declares the structure, shapes and dtypes of the elements of the dataset, without loading
+        it. Streaming loaders must declare it.
+
+        Args:
+            name (str): The name of the dataset.
+            *args: Additional positional arguments.
+            **kwargs: Additional keyword arguments, the same as those of `get_data`.
+
+        Returns:
+            The element spec, e.g. a tuple of `tf.TensorSpec` of inputs and labels, or None if
+            it is unknown before the data is loaded.
+        """
+        return None
+
+    def generate(self, name="", split="train", *args, **kwargs):
+        """
+        Yields the elements of a split one at a time, e.g. from files read in chunks. Streaming
+        loaders implement it, their splits are written to sharded files once and read from there
+        in parallel.
+
+        Args:
+            name (str): The name of the dataset.
+            split (str): One of `train`, `test` and `eval`.
+            *args: Additional positional arguments.
+            **kwargs: Additional keyword arguments, the same as those of `get_data`.
+
+        Yields:
+            The elements of the split, matching `get_element_spec`.
+        """
+        raise NotImplementedError(f"{self.__class__.__name__} does not stream its data")
+
     @abstractmethod
     def get_info(self, name="", *args, **kwargs):
         """
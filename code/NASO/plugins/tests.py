@@ -2,12 +2,22 @@ import json
 from io import BytesIO
 from unittest.mock import MagicMock, patch
 
+import numpy as np
 from django.contrib import messages
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
 from django.urls import reverse
 
 from plugins.forms.plugin_form import PluginForm
 from plugins.models.plugins import Plugin
+from sample_plugins.v1_0.simsa_pruner.benchmark import (
+    pairwise_selection,
+    random_kernel,
+)
+from sample_plugins.v1_0.simsa_pruner.plugin import (
+    filter_vectors,
+    select_filters,
+    similarity_matrix,
+)
 
 
 class NewPluginTestCase(TestCase):
@@ -65,3 +75,16 @@ class NewPluginTestCase(TestCase):
         self.assertIsInstance(response.context["form"], PluginForm)
         self.assertIn("version", response.context["form"].errors)
         self.assertFalse(Plugin.objects.filter(name=self.plugin_data["name"]).exists())
+
+
+class SimilarityPruningTestCase(SimpleTestCase):
+    def test_vectorised_selection_matches_pairwise_loop(self):
+        weights = random_kernel(24, 4)
+        filters = filter_vectors(weights)
+        for metric, threshold in [("COS", 0.9), ("EUC", 0.95), ("IoU", 0.95)]:
+            similarity = similarity_matrix(filters, metric)
+            np.testing.assert_allclose(similarity, similarity.T)
+            self.assertEqual(
+                select_filters(similarity, threshold),
+                pairwise_selection(weights, metric, threshold),
+            )
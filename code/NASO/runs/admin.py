@@ -1,6 +1,7 @@
 # Register your models here.
 from django.contrib import admin
 
+from runs.models.distillation import Distillation
 from runs.models.training import (
     CallbackFunction,
     FitParameters,
@@ -12,3 +13,4 @@ admin.site.register(NetworkTraining)
 admin.site.register(TrainingMetric)
 admin.site.register(CallbackFunction)
 admin.site.register(FitParameters)
+admin.site.register(Distillation)
@@ -2,6 +2,7 @@ from crispy_forms.helper import FormHelper
 from crispy_forms.layout import HTML, Column, Field, Layout, Row
 from django import forms
 
+from neural_architecture.models.autokeras import AutoKerasRun
 from neural_architecture.models.dataset import DatasetLoader
 from neural_architecture.models.model_optimization import (
     PruningMethodTypes,
@@ -9,6 +10,7 @@ from neural_architecture.models.model_optimization import (
     PruningScheduleTypes,
 )
 from neural_architecture.models.types import CallbackType, LossType, MetricType
+from runs.models.training import NetworkTraining
 from workers.models.celery_workers import CeleryWorker
 
 
@@ -249,6 +251,105 @@ class ClusterableForm(forms.Form):
         )
 
 
+class QuantizableForm(forms.Form):
+    enable_quantization = forms.BooleanField(
+        required=False, initial=False, label="Quantization aware training"
+    )
+    quantization_fine_tune_epochs = forms.IntegerField(
+        required=False,
+        initial=1,
+        min_value=1,
+        label="Fine tuning epochs",
+        help_text="Epochs of the quantization aware fine tuning of pruned or clustered models.",
+    )
+
+    def get_quantization_fields(self):
+        self.fields["enable_quantization"].widget.attrs[
+            "onchange"
+        ] = "toggleQuantization(this)"
+        return Layout(
+            Row(
+                HTML(
+                    """
+                    <h2>Quantization</h2>
+                    """
+                ),
+                css_class="border-top pt-3",
+            ),
+            Row(
+                Column(
+                    Field(
+                        "enable_quantization",
+                        css_class="form-check-input",
+                        wrapper_class="form-check offset-0",
+                    ),
+                    css_class="col-3",
+                ),
+                Column(
+                    Field(
+                        "quantization_fine_tune_epochs",
+                    ),
+                    css_class="col-4 d-none",
+                ),
+            ),
+        )
+
+
+class DistillationForm(forms.Form):
+    teacher_run = forms.ModelChoiceField(
+        label="Teacher run",
+        queryset=NetworkTraining.objects.all(),
+        required=False,
+        help_text="A finished run with a saved model, the new network is trained as student.",
+    )
+    teacher_autokeras_run = forms.ModelChoiceField(
+        label="Teacher AutoKeras run",
+        queryset=AutoKerasRun.objects.all(),
+        required=False,
+        help_text="A finished search, its best model is the teacher.",
+    )
+    distillation_temperature = forms.FloatField(
+        required=False, initial=4.0, min_value=0.1, label="Temperature"
+    )
+    distillation_alpha = forms.FloatField(
+        required=False,
+        initial=0.1,
+        min_value=0,
+        max_value=1,
+        label="Label loss weight",
+        help_text="The distillation loss is weighted with 1 - this weight.",
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get("teacher_run") and cleaned_data.get(
+            "teacher_autokeras_run"
+        ):
+            raise forms.ValidationError("Choose either a teacher run or AutoKeras run.")
+        return cleaned_data
+
+    def get_distillation_fields(self):
+        return Layout(
+            Row(
+                HTML(
+                    """
+                    <h2>Distillation</h2>
+                    """
+                ),
+                css_class="border-top pt-3",
+            ),
+            Row(
+                Column(Field("teacher_run", css_class="select2"), css_class="col-3"),
+                Column(
+                    Field("teacher_autokeras_run", css_class="select2"),
+                    css_class="col-3",
+                ),
+                Column(Field("distillation_temperature"), css_class="col-3"),
+                Column(Field("distillation_alpha"), css_class="col-3"),
+            ),
+        )
+
+
 class PrunableForm(forms.Form):
     enable_pruning = forms.BooleanField(required=False, initial=False)
     pruning_method = forms.ModelChoiceField(
@@ -17,10 +17,22 @@ from neural_architecture.models.types import (
     OptimizerType,
     TensorFlowModelType,
 )
-from runs.forms.base import BaseRunWithCallback, ClusterableForm, PrunableForm
+from runs.forms.base import (
+    BaseRunWithCallback,
+    ClusterableForm,
+    DistillationForm,
+    PrunableForm,
+    QuantizableForm,
+)
 
 
-class NewRunForm(BaseRunWithCallback, PrunableForm, ClusterableForm):
+class NewRunForm(
+    BaseRunWithCallback,
+    PrunableForm,
+    ClusterableForm,
+    QuantizableForm,
+    DistillationForm,
+):
     optimizer = forms.ModelChoiceField(
         label="Optimizer",
         queryset=OptimizerType.objects.all(),
@@ -188,6 +200,8 @@ class NewRunForm(BaseRunWithCallback, PrunableForm, ClusterableForm):
             self.gpu_field(),
             self.get_pruning_fields(),
             self.get_clustering_fields(),
+            self.get_quantization_fields(),
+            self.get_distillation_fields(),
             Row(
                 Column(Field("save_model"), css_class="col-2"),
                 Column(
@@ -276,7 +290,9 @@ class NewRunForm(BaseRunWithCallback, PrunableForm, ClusterableForm):
         return optimizer_choices
 
 
-class NewAutoKerasRunForm(BaseRunWithCallback, PrunableForm, ClusterableForm):
+class NewAutoKerasRunForm(
+    BaseRunWithCallback, PrunableForm, ClusterableForm, QuantizableForm
+):
     tuner = forms.ModelChoiceField(
         label="Tuner",
         required=False,
@@ -409,6 +425,7 @@ class NewAutoKerasRunForm(BaseRunWithCallback, PrunableForm, ClusterableForm):
             self.dataloader_html(),
             self.get_pruning_fields(),
             self.get_clustering_fields(),
+            self.get_quantization_fields(),
             self.gpu_field(multiple=False),
             Submit("customer-general-edit", "Training starten"),
         )
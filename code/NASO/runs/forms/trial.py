@@ -1,10 +1,17 @@
 from crispy_forms.layout import HTML, Column, Field, Layout, Row, Submit
 from django import forms
 
-from runs.forms.base import BaseRunWithCallback, ClusterableForm, PrunableForm
+from runs.forms.base import (
+    BaseRunWithCallback,
+    ClusterableForm,
+    PrunableForm,
+    QuantizableForm,
+)
 
 
-class RerunTrialForm(BaseRunWithCallback, PrunableForm, ClusterableForm):
+class RerunTrialForm(
+    BaseRunWithCallback, PrunableForm, ClusterableForm, QuantizableForm
+):
     epochs = forms.IntegerField(
         label="Epochen",
         initial=10,
@@ -38,6 +45,7 @@ class RerunTrialForm(BaseRunWithCallback, PrunableForm, ClusterableForm):
             self.dataloader_html(),
             self.get_pruning_fields(),
             self.get_clustering_fields(),
+            self.get_quantization_fields(),
             self.gpu_field(),
             Submit("customer-general-edit", "Training starten"),
         )
@@ -0,0 +1,70 @@
+# Generated by Django 4.2.13 on 2026-10-18 11:20
+
+import numpy as np
+from django.db import migrations, models
+
+# the old measurement loop stored one reading every 2 seconds without timestamps
+LEGACY_SAMPLING_INTERVAL_NS = 2_000_000_000
+POWER_SAMPLE_DTYPE = np.dtype([("time", "<i8"), ("power", "<f4")])
+
+
+def pack_power_measurements(power_measurements):
+    """
+    Converts the comma separated power measurements to the packed series and its aggregates.
+    """
+    if not power_measurements:
+        return b"", {}
+    power = np.array([float(value) for value in power_measurements.split(",")])
+    samples = np.empty(len(power), dtype=POWER_SAMPLE_DTYPE)
+    samples["time"] = np.arange(len(power)) * LEGACY_SAMPLING_INTERVAL_NS
+    samples["power"] = power
+    statistics = {
+        "count": len(power),
+        "sum": float(np.sum(power)),
+        "min": float(np.min(power)),
+        "max": float(np.max(power)),
+    }
+    for percentile, value in zip([50, 90, 99], np.percentile(power, [50, 90, 99])):
+        statistics[f"p{percentile}"] = float(value)
+    return samples.tobytes(), statistics
+
+
+def migrate_power_measurements(apps, schema_editor):
+    network_training = apps.get_model("runs", "NetworkTraining")
+    for run in network_training.objects.exclude(power_measurements=""):
+        run.power_series, run.power_statistics = pack_power_measurements(
+            run.power_measurements
+        )
+        run.save(update_fields=["power_series", "power_statistics"])
+
+
+def unmigrate_power_measurements(apps, schema_editor):
+    network_training = apps.get_model("runs", "NetworkTraining")
+    for run in network_training.objects.exclude(power_series=b""):
+        samples = np.frombuffer(bytes(run.power_series), dtype=POWER_SAMPLE_DTYPE)
+        run.power_measurements = ",".join(str(value) for value in samples["power"])
+        run.save(update_fields=["power_measurements"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("runs", "0034_networktraining_evaluation_data"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="networktraining",
+            name="power_series",
+            field=models.BinaryField(default=b""),
+        ),
+        migrations.AddField(
+            model_name="networktraining",
+            name="power_statistics",
+            field=models.JSONField(default=dict),
+        ),
+        migrations.RunPython(migrate_power_measurements, unmigrate_power_measurements),
+        migrations.RemoveField(
+            model_name="networktraining",
+            name="power_measurements",
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.13 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("runs", "0035_networktraining_power_series"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tensorflowmodel",
+            name="compact_export_model",
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name="tensorflowmodel",
+            name="compaction_report",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
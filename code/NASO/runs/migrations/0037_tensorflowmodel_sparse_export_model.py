@@ -0,0 +1,17 @@
+# Generated by Django 4.2.13 on 2026-10-18 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("runs", "0036_tensorflowmodel_compact_export_model"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tensorflowmodel",
+            name="sparse_export_model",
+            field=models.BooleanField(default=False),
+        ),
+    ]
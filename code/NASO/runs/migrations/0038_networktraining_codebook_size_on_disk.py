@@ -0,0 +1,27 @@
+# Generated by Django 4.2.13 on 2026-10-18 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("runs", "0037_tensorflowmodel_sparse_export_model"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="networktraining",
+            name="codebook_size_on_disk",
+            field=models.IntegerField(default=-1),
+        ),
+        migrations.AddField(
+            model_name="networktraining",
+            name="codebook_load_time",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name="networktraining",
+            name="keras_load_time",
+            field=models.FloatField(default=0),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.13 on 2026-10-18 16:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("neural_architecture", "0060_quantizablenetwork"),
+        ("runs", "0038_networktraining_codebook_size_on_disk"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tensorflowmodel",
+            name="quantization_options",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="neural_architecture.quantizablenetwork",
+            ),
+        ),
+        migrations.AddField(
+            model_name="networktraining",
+            name="int8_size_on_disk",
+            field=models.IntegerField(default=-1),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.13 on 2026-10-18 17:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("neural_architecture", "0060_quantizablenetwork"),
+        ("runs", "0039_tensorflowmodel_quantization_options"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Distillation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("temperature", models.FloatField(default=4.0)),
+                ("alpha", models.FloatField(default=0.1)),
+                ("comparison", models.JSONField(blank=True, default=dict)),
+                (
+                    "student",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="distillation",
+                        to="runs.networktraining",
+                    ),
+                ),
+                (
+                    "teacher_autokeras_run",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="distilled_students",
+                        to="neural_architecture.autokerasrun",
+                    ),
+                ),
+                (
+                    "teacher_run",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="distilled_students",
+                        to="runs.networktraining",
+                    ),
+                ),
+            ],
+        ),
+    ]
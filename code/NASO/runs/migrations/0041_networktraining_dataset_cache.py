@@ -0,0 +1,17 @@
+# Generated by Django 4.2.13 on 2026-10-18 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("runs", "0040_distillation"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="networktraining",
+            name="dataset_cache",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
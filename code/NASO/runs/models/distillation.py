@@ -0,0 +1,114 @@
+import autokeras
+import keras
+from decouple import config
+from django.db import models
+
+from helper_scripts.database import lock_safe_db_operation
+from helper_scripts.distillation import (
+    Distiller,
+    cache_teacher_logits,
+    compare_models,
+    with_teacher_logits,
+)
+from neural_architecture.models.autokeras import AutoKerasRun
+from runs.models.training import NetworkTraining
+
+
+class Distillation(models.Model):
+    """
+    Turns a network training into the distillation of a finished run. The student is the network
+    of the training, the teacher the saved model of a network training or the best model of an
+    AutoKeras run. Both are trained and evaluated on the dataset of the student training.
+
+    Attributes:
+        student (NetworkTraining): The training of the student.
+        teacher_run (NetworkTraining): The teacher, if it is a network training.
+        teacher_autokeras_run (AutoKerasRun): The teacher, if it is an AutoKeras run.
+        temperature (float): Temperature of the softened outputs.
+        alpha (float): Weight of the loss of the labels, the distillation loss gets 1 - alpha.
+        comparison (dict): Parameters, accuracy, latency and energy per sample of the teacher and
+            the student on the evaluation dataset.
+    """
+
+    student = models.OneToOneField(
+        NetworkTraining, on_delete=models.deletion.CASCADE, related_name="distillation"
+    )
+    teacher_run = models.ForeignKey(
+        NetworkTraining,
+        on_delete=models.deletion.SET_NULL,
+        null=True,
+        related_name="distilled_students",
+    )
+    teacher_autokeras_run = models.ForeignKey(
+        AutoKerasRun,
+        on_delete=models.deletion.SET_NULL,
+        null=True,
+        related_name="distilled_students",
+    )
+    temperature = models.FloatField(default=4.0)
+    alpha = models.FloatField(default=0.1)
+    comparison = models.JSONField(default=dict, blank=True)
+
+    _teacher = None
+
+    @property
+    def teacher_name(self) -> str:
+        if self.teacher_autokeras_run:
+            return str(self.teacher_autokeras_run)
+        return str(self.teacher_run)
+
+    def get_teacher_file(self) -> str:
+        if self.teacher_autokeras_run:
+            return self.teacher_autokeras_run.model.get_best_model()
+        if self.teacher_run and self.teacher_run.model_file:
+            return self.teacher_run.model_file
+        raise ValueError("The teacher of the distillation has no saved model")
+
+    def load_teacher(self):
+        if not self._teacher:
+            self._teacher = keras.models.load_model(
+                self.get_teacher_file(), custom_objects=autokeras.CUSTOM_OBJECTS
+            )
+        return self._teacher
+
+    def get_logits_cache_file(self) -> str:
+        """
+        The teacher logits are cached per teacher and dataset, so all students of a teacher
+        share them.
+        """
+        if self.teacher_autokeras_run:
+            teacher = f"autokeras_{self.teacher_autokeras_run.id}"
+        else:
+            teacher = f"tensorflow_{self.teacher_run.id}"
+        return (
+            f"{config('TENSORFLOW_MODEL_PATH')}distillation/"
+            f"{teacher}_dataset_{self.student.dataset.id}_logits.npy"
+        )
+
+    def build_distiller(self, student, compile_arguments: dict):
+        distiller = Distiller(student, self.temperature, self.alpha)
+        distiller.compile(**compile_arguments)
+        return distiller
+
+    def get_training_data(self, train_dataset):
+        """
+        Returns the training data with the cached teacher logits. The teacher is only run if
+        there are no cached logits for the dataset yet.
+        """
+        logits = cache_teacher_logits(
+            self.load_teacher(), train_dataset, self.get_logits_cache_file()
+        )
+        return with_teacher_logits(train_dataset, logits)
+
+    def compare(self, student, dataset, batch_size: int = 32) -> dict:
+        """
+        Measures teacher and student on the same batches and stores the results.
+        """
+        self.comparison = compare_models(
+            {"teacher": self.load_teacher(), "student": student},
+            dataset,
+            self.student.gpu,
+            batch_size,
+        )
+        lock_safe_db_operation(lambda: self.save(update_fields=["comparison"]))
+        return self.comparison
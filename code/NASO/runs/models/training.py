@@ -1,11 +1,20 @@
 import math
 
+import numpy as np
 from django.core.exceptions import ValidationError
 from django.db import models
 from safedelete.models import SafeDeleteModel
 
+from helper_scripts.database import lock_safe_db_operation
+from helper_scripts.dataset_cache import merge_cache_statistics
 from helper_scripts.git import get_current_git_hash
 from helper_scripts.importing import get_object
+from helper_scripts.power_series import (
+    downsample_power_samples,
+    pack_power_samples,
+    unpack_power_samples,
+    update_power_statistics,
+)
 from naso.settings import APP_VERSION
 from neural_architecture.models.architecture import NetworkConfiguration, NetworkModel
 from neural_architecture.models.dataset import Dataset
@@ -295,12 +304,18 @@ class Run(SafeDeleteModel):
     worker = models.CharField(max_length=70)
     compute_device = models.CharField(max_length=20, default="")
 
-    power_measurements = models.TextField()
+    # packed (timestamp_ns, watts) records, see helper_scripts.power_series
+    power_series = models.BinaryField(default=b"")
+    # count, sum, min, max and percentiles of the power series, updated on every append
+    power_statistics = models.JSONField(default=dict)
 
     memory_usage = models.FloatField(default=0)
 
     size_on_disk = models.IntegerField(default=0)
 
+    # hits, misses and load time of the dataset cache, see helper_scripts.dataset_cache
+    dataset_cache = models.JSONField(default=dict, blank=True)
+
     class Meta:
         abstract = True
 
@@ -314,28 +329,63 @@ class Run(SafeDeleteModel):
             self.git_hash = get_current_git_hash()
         super().save(*args, **kwargs)
 
+    def append_power_samples(self, samples):
+        """
+        Appends readings to the power series and updates its aggregates. The run is not saved.
+
+        Args:
+            samples (list[tuple[int, float]]): (unix timestamp in ns, watts) tuples sorted by time.
+        """
+        if len(samples) == 0:
+            return
+        self.power_series = bytes(self.power_series) + pack_power_samples(samples)
+        power = self.get_power_samples()["power"]
+        self.power_statistics = update_power_statistics(
+            self.power_statistics, power[-len(samples) :], power
+        )
+
+    def record_dataset_cache(self, statistics: dict):
+        """
+        Adds the statistics of a lookup in the dataset cache and saves them.
+        """
+        if not statistics:
+            return
+        self.dataset_cache = merge_cache_statistics(self.dataset_cache, statistics)
+        lock_safe_db_operation(lambda: self.save(update_fields=["dataset_cache"]))
+
+    def has_power_measurements(self):
+        return self.power_statistics.get("count", 0) > 0
+
+    def get_power_samples(self) -> np.ndarray:
+        """
+        Returns the power series as structured array with the fields `time` (ns) and `power` (W).
+        """
+        return unpack_power_samples(self.power_series)
+
+    def get_power_window(self, start=None, end=None, points=500):
+        """
+        Returns the power series between start and end (seconds after the first reading)
+        downsampled to at most `points` values, see `downsample_power_samples`.
+        """
+        return downsample_power_samples(self.get_power_samples(), start, end, points)
+
     def get_power_measurements(self):
-        if self.power_measurements == "":
-            return []
-        return [float(power) for power in self.power_measurements.split(",")]
+        return self.get_power_samples()["power"].tolist()
 
     def get_average_power_consumption(self):
-        if self.power_measurements == "":
+        if not self.has_power_measurements():
             return "NaN"
-        measurements = [float(power) for power in self.power_measurements.split(",")]
-        return sum(measurements) / len(measurements)
+        return self.power_statistics["sum"] / self.power_statistics["count"]
 
     def get_min_power_consumption(self):
-        if self.power_measurements == "":
+        if not self.has_power_measurements():
             return 0
-        measurements = [float(power) for power in self.power_measurements.split(",")]
-        return min(measurements)
+        return self.power_statistics["min"]
 
     def get_max_power_consumption(self):
-        if self.power_measurements == "":
+        if not self.has_power_measurements():
             return 0
-        measurements = [float(power) for power in self.power_measurements.split(",")]
-        return max(measurements)
+        return self.power_statistics["max"]
 
 
 class NetworkTraining(Run):
@@ -371,6 +421,12 @@ class NetworkTraining(Run):
         "TrainingMetric",
         related_name="tensorflow_prediction_metrics",
     )
+    # size and load time of the codebook format of pruned or clustered models, next to the zip
+    codebook_size_on_disk = models.IntegerField(default=-1)
+    codebook_load_time = models.FloatField(default=0)
+    keras_load_time = models.FloatField(default=0)
+    # size of the int8 TFLite model of quantization aware trained models
+    int8_size_on_disk = models.IntegerField(default=-1)
 
     def __str__(self):
         return self.model_name
@@ -402,6 +458,15 @@ class NetworkTraining(Run):
     def get_gzipped_model_size(self):
         return self.network_model.get_gzipped_model_size()
 
+    def get_codebook_model_size(self):
+        return self.network_model.get_codebook_model_size()
+
+    def get_int8_model_size(self):
+        return self.network_model.get_int8_model_size()
+
+    def measure_load_times(self):
+        return self.network_model.measure_load_times()
+
     def save_model_on_disk(self, model):
         self.network_model.save_model_on_disk(model)
 
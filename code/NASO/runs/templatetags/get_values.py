@@ -1,7 +1,15 @@
+import json
+import math
+
 from django import template
+from django.utils.safestring import mark_safe
 
 register = template.Library()
 
+# characters that could end the script tag or start an HTML entity inside of it,
+# json.dumps escapes all other non ASCII characters already
+_SCRIPT_ESCAPES = {ord(">"): "\\u003E", ord("<"): "\\u003C", ord("&"): "\\u0026"}
+
 
 @register.simple_tag
 def get_attribute_tag(obj, attr_name):
@@ -28,3 +36,22 @@ def get_metric(obj, attr_name):
 def addstr(arg1, arg2):
     """concatenate arg1 & arg2"""
     return str(arg1) + str(arg2)
+
+
+def _finite(value):
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(item) for item in value]
+    return value
+
+
+@register.filter
+def js_value(value):
+    """
+    Renders a value as a JavaScript literal inside a script tag. NaN and infinite numbers,
+    e.g. the confidence interval of a single benchmark trial, become null.
+    """
+    return mark_safe(json.dumps(_finite(value), default=str).translate(_SCRIPT_ESCAPES))
@@ -1,10 +1,13 @@
+import json
 from unittest.mock import MagicMock, patch
 
-from django.test import RequestFactory, TestCase
+from django.test import RequestFactory, SimpleTestCase, TestCase
 
+from api.helper_scripts.run import get_power_window
 from neural_architecture.models.autokeras import AutoKerasRun
 from runs.forms.trial import RerunTrialForm
-from runs.models.training import CallbackFunction, Metric
+from runs.models.training import CallbackFunction, Metric, NetworkTraining
+from runs.templatetags.get_values import js_value
 from runs.views.trial import TrialView
 
 
@@ -61,3 +64,67 @@ class TrialViewTestCase(TestCase):
         self.assertIsInstance(response.context_data["form"], RerunTrialForm)
         self.assertEqual(response.context_data["metric_configs"], [])
         self.assertEqual(response.context_data["callback_configs"], [])
+
+
+class PowerSeriesTestCase(SimpleTestCase):
+    def test_statistics_are_updated_on_append(self):
+        run = NetworkTraining()
+        self.assertEqual(run.get_average_power_consumption(), "NaN")
+        self.assertEqual(run.get_max_power_consumption(), 0)
+
+        run.append_power_samples([(0, 10.0), (1_000_000_000, 30.0)])
+        run.append_power_samples([(2_000_000_000, 20.0)])
+
+        self.assertEqual(run.get_power_measurements(), [10.0, 30.0, 20.0])
+        self.assertEqual(run.get_average_power_consumption(), 20.0)
+        self.assertEqual(run.get_min_power_consumption(), 10.0)
+        self.assertEqual(run.get_max_power_consumption(), 30.0)
+        self.assertEqual(run.power_statistics["p50"], 20.0)
+        self.assertEqual(len(run.power_series), 3 * 12)
+
+    def test_power_window_is_downsampled(self):
+        run = NetworkTraining()
+        run.append_power_samples(
+            [(second * 1_000_000_000, float(second)) for second in range(100)]
+        )
+
+        window = run.get_power_window(points=10)
+        self.assertEqual(len(window["time"]), 10)
+        self.assertEqual(window["min"][0], 0.0)
+        self.assertEqual(window["max"][-1], 99.0)
+
+        window = run.get_power_window(start=10, end=19, points=5)
+        self.assertEqual(window["time"][0], 10.0)
+        self.assertEqual(window["min"][0], 10.0)
+        self.assertEqual(window["max"][-1], 19.0)
+        self.assertAlmostEqual(sum(window["power"]) / 5, 14.5)
+
+    @patch("api.helper_scripts.run.POWER_WINDOW_MAX_POINTS", 20)
+    def test_power_window_parameters_are_validated(self):
+        run = NetworkTraining()
+        run.append_power_samples(
+            [(second * 1_000_000_000, float(second)) for second in range(100)]
+        )
+        factory = RequestFactory()
+
+        for parameters in [
+            {"points": "many"},
+            {"points": "0"},
+            {"start": "soon"},
+            {"end": "nan"},
+            {"start": "20", "end": "10"},
+        ]:
+            response = get_power_window(factory.get("/", parameters), run)
+            self.assertEqual(response.status_code, 400, parameters)
+
+        response = get_power_window(factory.get("/", {"points": "1000000"}), run)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(response.content)["time"]), 20)
+
+
+class JsValueTestCase(SimpleTestCase):
+    def test_non_finite_values_are_null(self):
+        self.assertEqual(js_value(float("nan")), "null")
+        self.assertEqual(js_value([1.5, float("inf")]), "[1.5, null]")
+        self.assertEqual(js_value("</script>"), '"\\u003C/script\\u003E"')
+        self.assertEqual(js_value({"a&b": 1}), '{"a\\u0026b": 1}')
@@ -24,6 +24,7 @@ from neural_architecture.models.model_optimization import (
     PruningMethod,
     PruningPolicy,
     PruningSchedule,
+    QuantizableNetwork,
 )
 from neural_architecture.models.templates import (
     AutoKerasNetworkTemplate,
@@ -31,6 +32,7 @@ from neural_architecture.models.templates import (
 )
 from neural_architecture.neural_net import run_neural_net
 from runs.forms.new_run_form import NewAutoKerasRunForm, NewRunForm
+from runs.models.distillation import Distillation
 from runs.models.training import (
     CallbackFunction,
     EvaluationParameters,
@@ -424,6 +426,16 @@ class NewRun(TemplateView):
                     )
                     clustering_options.save()
                     network_model.clustering_options = clustering_options
+                if form.cleaned_data["enable_quantization"]:
+                    quantization_options = QuantizableNetwork(
+                        use_quantization=True,
+                        fine_tune_epochs=form.cleaned_data[
+                            "quantization_fine_tune_epochs"
+                        ]
+                        or 1,
+                    )
+                    quantization_options.save()
+                    network_model.quantization_options = quantization_options
                 if form.cleaned_data["enable_pruning"]:
                     (
                         method_arguments,
@@ -494,6 +506,24 @@ class NewRun(TemplateView):
                     training.worker = queue
 
                     training.save()
+                    if (
+                        form.cleaned_data["teacher_run"]
+                        or form.cleaned_data["teacher_autokeras_run"]
+                    ):
+                        Distillation.objects.create(
+                            student=training,
+                            teacher_run=form.cleaned_data["teacher_run"],
+                            teacher_autokeras_run=form.cleaned_data[
+                                "teacher_autokeras_run"
+                            ],
+                            temperature=form.cleaned_data["distillation_temperature"]
+                            or 4.0,
+                            alpha=(
+                                0.1
+                                if form.cleaned_data["distillation_alpha"] is None
+                                else form.cleaned_data["distillation_alpha"]
+                            ),
+                        )
                     if old_trainingmetric_queryset:
                         for source_instance in old_trainingmetric_queryset:
                             new_instance = TrainingMetric.objects.create(
@@ -926,6 +956,14 @@ class NewAutoKerasRun(TemplateView):
                 )
                 clustering_options.save()
                 model.clustering_options = clustering_options
+            if form.cleaned_data["enable_quantization"]:
+                quantization_options = QuantizableNetwork(
+                    use_quantization=True,
+                    fine_tune_epochs=form.cleaned_data["quantization_fine_tune_epochs"]
+                    or 1,
+                )
+                quantization_options.save()
+                model.quantization_options = quantization_options
 
             if form.cleaned_data["enable_pruning"]:
                 (
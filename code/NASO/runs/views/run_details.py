@@ -3,13 +3,26 @@ from django.shortcuts import redirect
 from django.urls import reverse_lazy
 from django.views.generic.base import TemplateView, View
 
+from inference.models.inference import Inference
 from naso.celery import get_celery_task_state
 from naso.models.page import PageSetup
 from neural_architecture.models.autokeras import AutoKerasRun
 from runs.forms.update_runs import UpdateAutokerasRun, UpdateNetworkTrainingRun
+from runs.models.distillation import Distillation
 from runs.models.training import NetworkTraining
 
 
+def get_layer_profile(run: NetworkTraining) -> dict:
+    """
+    Returns the latest layer profile of the inferences of the saved model of the run, if any.
+    """
+    for inference in Inference.objects.filter(network_training=run).order_by("-id"):
+        metric = inference.get_layer_profile_metric()
+        if metric:
+            return metric.metrics[0]
+    return None
+
+
 class TrainingProgress(View):
     """
     A view class for retrieving the training progress of a task.
@@ -72,6 +85,8 @@ class RunDetails(TemplateView):
         """
         run = NetworkTraining.objects.get(pk=kwargs["pk"])
         self.context["run"] = run
+        self.context["distillation"] = Distillation.objects.filter(student=run).first()
+        self.context["layer_profile"] = get_layer_profile(run)
         self.page.title = run.model_name
         self.page.actions = []
         self.page.add_pageaction(
@@ -6,6 +6,8 @@ from decouple import config
 from django.urls import reverse_lazy
 from django.views.generic.base import TemplateView
 
+from helper_scripts.codebook_format import CODEBOOK_EXTENSION
+from helper_scripts.quantization import INT8_EXTENSION
 from naso.models.page import PageSetup
 from neural_architecture.models.autokeras import AutoKerasRun
 from runs.models.training import NetworkTraining
@@ -66,9 +68,10 @@ def harddelete_run(id: int, run_type: str):
         if len(run.model_file) > 0:
             if os.path.exists(run.model_file):
                 os.remove(run.model_file)
-            zip_path = os.path.splitext(run.model_file)[0] + ".zip"
-            if os.path.exists(zip_path):
-                os.remove(zip_path)
+            for extension in [".zip", CODEBOOK_EXTENSION, INT8_EXTENSION]:
+                path = os.path.splitext(run.model_file)[0] + extension
+                if os.path.exists(path):
+                    os.remove(path)
         run.delete(force_policy=safedelete.models.HARD_DELETE)
         return True
     elif run_type == "autokeras":
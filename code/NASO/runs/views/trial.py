@@ -15,6 +15,7 @@ from neural_architecture.models.model_optimization import (
     PruningMethod,
     PruningPolicy,
     PruningSchedule,
+    QuantizableNetwork,
 )
 from neural_architecture.models.types import OptimizerType
 from neural_architecture.neural_net import run_neural_net
@@ -222,6 +223,14 @@ class TrialView(TemplateView):
                 )
                 clustering_options.save()
                 network_config.clustering_options = clustering_options
+            if form.cleaned_data["enable_quantization"]:
+                quantization_options = QuantizableNetwork(
+                    use_quantization=True,
+                    fine_tune_epochs=form.cleaned_data["quantization_fine_tune_epochs"]
+                    or 1,
+                )
+                quantization_options.save()
+                network_config.quantization_options = quantization_options
 
             if form.cleaned_data["enable_pruning"]:
                 (
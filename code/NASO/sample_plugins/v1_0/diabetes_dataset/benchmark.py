@@ -0,0 +1,122 @@
+"""
+Compares the vectorised windows of the OhioDiabetesDatasets plugin against the per-row loop
+they replaced, and reading the csv files of all patients against the parsed cache.
+
+Run from the NASO directory with
+`python -m sample_plugins.v1_0.diabetes_dataset.benchmark`.
+"""
+import os
+import shutil
+import tempfile
+import time
+from os import listdir
+
+import django
+import numpy as np
+import pandas as pd
+
+
+def loop_windows(
+    df, sequence_length, prediction_length, num_examples=None, interpolation="spline"
+):
+    """
+    The former window loop of `OhioDiabetesDatasets._prepare_dataset`.
+    """
+    df["_ts"] = pd.to_datetime(df["_ts"], format="%d-%m-%Y %H:%M:%S")
+    df = df.sort_values(by="_ts")
+    df.set_index("_ts", inplace=True)
+    if interpolation:
+        df_resampled = df.resample("5min", origin="start").asfreq()
+        df_resampled.interpolate(method="time").ffill().bfill()
+
+    def is_consecutive(timestamps, freq="5min"):
+        expected = pd.date_range(
+            start=timestamps[0], periods=len(timestamps), freq=freq
+        )
+        return all(timestamps == expected)
+
+    X, y = [], []
+    for i in range(len(df) - sequence_length - prediction_length + 1):
+        if interpolation or is_consecutive(df.index[i : i + sequence_length]):
+            X.append(df["_value"].iloc[i : i + sequence_length].values)
+            y.append(
+                df["_value"]
+                .iloc[i + sequence_length : i + sequence_length + prediction_length]
+                .values
+            )
+            if num_examples and len(X) >= num_examples:
+                break
+    X, y = np.array(X, dtype=np.float64), np.array(y, dtype=np.float64)
+    return X.reshape((-1, sequence_length, 1)), y.reshape((-1, prediction_length, 1))
+
+
+def run_benchmark(sequence_lengths=(3, 5, 7), interpolations=("spline", None)):
+    from sample_plugins.v1_0.diabetes_dataset.plugin import OhioDiabetesDatasets
+
+    loader = OhioDiabetesDatasets()
+    loader.dataset_path = os.path.join(os.path.dirname(__file__), "data")
+    loader.parsed_path = tempfile.mkdtemp()
+    files = sorted(
+        file for file in listdir(loader.dataset_path) if file.endswith(".csv")
+    )
+
+    start = time.perf_counter()
+    frames = [pd.read_csv(os.path.join(loader.dataset_path, file)) for file in files]
+    csv_time = time.perf_counter() - start
+    loader._read_csvs(files)
+    start = time.perf_counter()
+    loader._read_csvs(files)
+    cached_time = time.perf_counter() - start
+    shutil.rmtree(loader.parsed_path)
+    print(
+        f"{len(files)} csv files: {csv_time:.3f} s parsed, {cached_time:.3f} s cached, "
+        f"speedup {csv_time / cached_time:.1f}"
+    )
+
+    rows = []
+    for sequence_length in sequence_lengths:
+        for interpolation in interpolations:
+            loop_time, vectorised_time, identical = 0.0, 0.0, True
+            for frame in frames:
+                start = time.perf_counter()
+                expected = loop_windows(
+                    frame.copy(),
+                    sequence_length,
+                    loader.prediction_length,
+                    interpolation=interpolation,
+                )
+                loop_time += time.perf_counter() - start
+
+                start = time.perf_counter()
+                dataset = loader._prepare_dataset(
+                    frame.copy(), sequence_length, interpolation=interpolation
+                )
+                vectorised_time += time.perf_counter() - start
+                X, y = dataset.batch(len(expected[0])).get_single_element()
+                identical = (
+                    identical
+                    and np.array_equal(X, expected[0])
+                    and np.array_equal(y, expected[1])
+                )
+            rows.append(
+                {
+                    "sequence_length": sequence_length,
+                    "interpolation": interpolation,
+                    "loop [s]": loop_time,
+                    "vectorised [s]": vectorised_time,
+                    "speedup": loop_time / vectorised_time,
+                    "identical": identical,
+                }
+            )
+            print(
+                f"sequence {sequence_length} interpolation {str(interpolation):6s}: "
+                f"{loop_time:8.3f} s loop, {vectorised_time:8.3f} s vectorised, "
+                f"speedup {rows[-1]['speedup']:6.1f}, identical windows {identical}"
+            )
+    return rows
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "naso.settings")
+    django.setup()
+    run_benchmark()
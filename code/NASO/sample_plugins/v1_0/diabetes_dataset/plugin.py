@@ -1,4 +1,6 @@
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from functools import reduce
 from os import listdir
 from os.path import isfile, join
@@ -7,6 +9,7 @@ import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import tensorflow as tf
+from numpy.lib.stride_tricks import sliding_window_view
 
 from random import randrange
 from datasets.helper_scripts.normalizations import compute_mean_and_std, z_normalize_ds
@@ -71,6 +74,12 @@ class OhioDiabetesDatasets(DatasetLoaderInterface):
     element_size = 0
     info: dict = {}
     prediction_length = 9
+    # the parsed csv files, see _read_csv. None if DATASET_CACHE_SIZE disables the cache
+    parsed_path = (
+        os.path.join(settings.DATASET_CACHE_PATH, "ohio_diabetes")
+        if settings.DATASET_CACHE_SIZE > 0
+        else None
+    )
 
     def get_info(self, name, *args, **kwargs):
         return {"description": "This is a diabetes dataset from university of Ohio."}
@@ -170,12 +179,8 @@ class OhioDiabetesDatasets(DatasetLoaderInterface):
             num_examples = 1
             training_files = training_files[:num_individuals]
             testing_files = testing_files[:2]
-        training_df_list = [
-            pd.read_csv(join(self.dataset_path, file)) for file in training_files
-        ]
-        testing_df_list = [
-            pd.read_csv(join(self.dataset_path, file)) for file in testing_files
-        ]
+        training_df_list = self._read_csvs(training_files)
+        testing_df_list = self._read_csvs(testing_files)
 
         train_dataset = [
             self._prepare_dataset(
@@ -204,6 +209,48 @@ class OhioDiabetesDatasets(DatasetLoaderInterface):
             eval_dataset = z_normalize_ds(eval_dataset, mean, std)
         return (train_dataset, test_dataset, eval_dataset)
 
+    def _read_csv(self, file: str) -> pd.DataFrame:
+        """
+        Reads the csv file of a patient. The timestamps and values of the parsed frame are kept
+        as NumPy arrays in the dataset cache directory and read instead, as long as the csv file
+        is not changed.
+        """
+        path = join(self.dataset_path, file)
+        if not self.parsed_path:
+            return self._parse_csv(path)
+        cache_path = join(self.parsed_path, f"{file}.npz")
+        if os.path.exists(cache_path) and os.path.getmtime(
+            cache_path
+        ) >= os.path.getmtime(path):
+            with np.load(cache_path, allow_pickle=False) as arrays:
+                return pd.DataFrame(
+                    {"_ts": arrays["timestamps"], "_value": arrays["values"]}
+                )
+        df = self._parse_csv(path)
+        os.makedirs(self.parsed_path, exist_ok=True)
+        temporary_path = f"{cache_path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(temporary_path, "wb") as cache_file:
+            np.savez(
+                cache_file,
+                timestamps=df["_ts"].to_numpy(),
+                values=df["_value"].to_numpy(),
+            )
+        os.replace(temporary_path, cache_path)
+        return df
+
+    def _parse_csv(self, path: str) -> pd.DataFrame:
+        df = pd.read_csv(path, usecols=["_ts", "_value"])
+        # parsing the timestamps again in _prepare_dataset keeps them unchanged
+        df["_ts"] = pd.to_datetime(df["_ts"], format="%d-%m-%Y %H:%M:%S")
+        return df
+
+    def _read_csvs(self, files: list) -> list:
+        """
+        Reads the csv files of the patients in parallel, in the order of the files.
+        """
+        with ThreadPoolExecutor() as executor:
+            return list(executor.map(self._read_csv, files))
+
     def shape_dataset(self, data, size=None):
         if not size:
             size = self.prediction_length
@@ -238,24 +285,23 @@ class OhioDiabetesDatasets(DatasetLoaderInterface):
             # Optional: If you want to fill the remaining NaNs at the start/end, you can use:
             df_interpolated = df_interpolated.ffill().bfill()
 
-        def is_consecutive(timestamps, freq="5min"):
-            expected = pd.date_range(
-                start=timestamps[0], periods=len(timestamps), freq=freq
-            )
-            return all(timestamps == expected)
-
-        X, y = [], []
-        for i in range(len(df) - sequence_length - prediction_length + 1):
-            if interpolation or is_consecutive(df.index[i : i + sequence_length]):
-                X.append(df["_value"].iloc[i : i + sequence_length].values)
-                y.append(
-                    df["_value"]
-                    .iloc[i + sequence_length : i + sequence_length + prediction_length]
-                    .values
-                )
-                if num_examples and len(X) >= num_examples:
-                    break
-        X, y = np.array(X, dtype=np.float64), np.array(y, dtype=np.float64)
+        # every window of inputs and predictions, as views into the values
+        values = df["_value"].to_numpy()
+        window_length = sequence_length + prediction_length
+        if len(values) >= window_length:
+            windows = sliding_window_view(values, window_length)
+        else:
+            windows = np.empty((0, window_length), dtype=values.dtype)
+        starts = np.arange(len(windows))
+        if not interpolation and len(windows):
+            # the inputs of a window have to be exactly 5 minutes apart
+            steps = np.diff(df.index.to_numpy()) == np.timedelta64(5, "m")
+            consecutive = sliding_window_view(steps, sequence_length - 1).all(axis=1)
+            starts = starts[consecutive[: len(windows)]]
+        if num_examples:
+            starts = starts[:num_examples]
+        X = windows[starts, :sequence_length].astype(np.float64)
+        y = windows[starts, sequence_length:].astype(np.float64)
         X = self.shape_dataset(X, sequence_length)
         y = self.shape_dataset(y)
         dataset = tf.data.Dataset.from_tensor_slices((X, y))
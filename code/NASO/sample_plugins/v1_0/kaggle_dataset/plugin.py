@@ -8,6 +8,7 @@ import pandas as pd
 import tensorflow as tf
 from sklearn.preprocessing import StandardScaler
 
+from helper_scripts.dataset_cache import SPLITS
 from naso import settings
 from neural_architecture.models.dataset import DatasetLoader
 from plugins.interfaces.commands import InstallerInterface
@@ -65,6 +66,10 @@ class CaliforniaHousingDataset(DatasetLoaderInterface):
     dataset_list = ["California Housing", "DeepSat (SAT-6)"]
     size = 0
     element_size = 0
+    # the splits are streamed from the csv files in chunks of rows
+    streaming = True
+    chunk_size = 1000
+    deepsat_rows = 20000
 
     def get_info(self, name, *args, **kwargs):
         datasets_found = kaggle.api.dataset_list(search=name)
@@ -85,12 +90,23 @@ class CaliforniaHousingDataset(DatasetLoaderInterface):
         Returns:
             tuple: A tuple containing the train and test datasets.
         """
+        self._download(name)
+
+        if name == "California Housing":
+            self.element_size = 9
+            return self.get_california_housing()
+        elif name == "DeepSat (SAT-6)":
+            self.element_size = (28, 28, 4)
+            return self.get_deepsat()
+        return (None, None, None)
+
+    def _download(self, name: str):
         datasets_found = kaggle.api.dataset_list(search=name)
         if len(datasets_found) == 0:
             raise Exception("Dataset can not be found on Kaggle")
 
         dataset = datasets_found[0]
-        self.dataset_path += str(dataset.id)
+        self.dataset_path = CaliforniaHousingDataset.dataset_path + str(dataset.id)
         if not os.path.exists(self.dataset_path):
             os.makedirs(self.dataset_path, exist_ok=True)
             print("Downloading dataset files")
@@ -98,13 +114,70 @@ class CaliforniaHousingDataset(DatasetLoaderInterface):
                 dataset.ref, path=self.dataset_path, unzip=True
             )
 
+    def get_element_spec(self, name: str, *args, **kwargs):
+        """
+        Declares the elements of the datasets, (features, label) pairs of float32.
+        """
         if name == "California Housing":
             self.element_size = 9
-            return self.get_california_housing()
-        elif name == "DeepSat (SAT-6)":
+            return (
+                tf.TensorSpec((9,), tf.float32),
+                tf.TensorSpec((), tf.float32),
+            )
+        if name == "DeepSat (SAT-6)":
             self.element_size = (28, 28, 4)
-            return self.get_deepsat()
-        return (None, None, None)
+            return (
+                tf.TensorSpec((28, 28, 4), tf.float32),
+                tf.TensorSpec((6,), tf.float32),
+            )
+        return None
+
+    def generate(self, name: str, split: str = "train", *args, **kwargs):
+        """
+        Yields the (features, label) pairs of a split.
+
+        Args:
+            name (str): The name of the dataset.
+            split (str): One of `train`, `test` and `eval`.
+        """
+        self._download(name)
+        if name == "California Housing":
+            # the features are standardized over the whole file, it is small enough
+            data, labels = self._prep_dataframe(
+                pd.read_csv(self.dataset_path + "/housing.csv")
+            )[SPLITS.index(split)]
+            yield from zip(data, labels)
+        elif name == "DeepSat (SAT-6)":
+            yield from self._generate_deepsat(split)
+
+    def _generate_deepsat(self, split: str):
+        half = int(self.deepsat_rows * 0.5)
+        file_name, skip_rows, rows, max_value = {
+            "train": ("train", 0, self.deepsat_rows, 2555),
+            "test": ("test", 0, half, 255),
+            "eval": ("test", half, half, 255),
+        }[split]
+        read_options = {
+            "skiprows": skip_rows,
+            "nrows": rows,
+            "header": None,
+            "chunksize": self.chunk_size,
+        }
+        count = 0
+        for x_chunk, y_chunk in zip(
+            pd.read_csv(f"{self.dataset_path}/X_{file_name}_sat6.csv", **read_options),
+            pd.read_csv(f"{self.dataset_path}/y_{file_name}_sat6.csv", **read_options),
+        ):
+            x = (
+                x_chunk.values.reshape((-1, 28, 28, 4))
+                .clip(0, max_value)
+                .astype("float32")
+            )
+            y = y_chunk.values.astype("float32")
+            yield from zip(x, y)
+            count += len(x)
+        if split == "train":
+            self.size = count
 
     def get_california_housing(self):
         df = pd.read_csv(self.dataset_path + "/housing.csv")
@@ -153,7 +226,7 @@ class CaliforniaHousingDataset(DatasetLoaderInterface):
         return ""
 
     def get_deepsat(self):
-        n = 20000
+        n = self.deepsat_rows
         x_train_df = pd.read_csv(
             self.dataset_path + "/X_train_sat6.csv", nrows=n, header=None
         )
@@ -0,0 +1,116 @@
+"""
+Compares the vectorised filter similarity of the SimilarityPruning plugin against the pairwise
+implementation it replaced, which dispatched separate TF ops for every pair of filters.
+
+Run from the NASO directory with
+`python -m sample_plugins.v1_0.simsa_pruner.benchmark`.
+"""
+import os
+import time
+
+import django
+import numpy as np
+import tensorflow as tf
+
+
+def pairwise_similarity(weight1, weight2, metric: str):
+    if metric == "COS":
+        similarity = tf.reduce_sum(tf.multiply(weight1, weight2)) / (
+            tf.norm(weight1) * tf.norm(weight2) + 1e-9
+        )
+    elif metric == "EUC":
+        similarity = tf.nn.relu(
+            1 - tf.norm(weight1 - weight2) / (tf.norm(weight1) * tf.norm(weight2))
+        )
+    else:
+        intersection = tf.reduce_sum(tf.minimum(weight1, weight2))
+        union = tf.reduce_sum(tf.maximum(weight1, weight2))
+        similarity = intersection / (union + 1e-9)
+    return abs(similarity)
+
+
+def pairwise_selection(weights, metric: str, threshold: float) -> tuple[list, list]:
+    """
+    The former selection loop of `SimilarityPruning.calc_similarity_matrix`.
+    """
+    threshold = tf.constant(threshold)
+    num_filters = weights.shape[-1]
+    pruned_filters = []
+    kept_filters = [0]
+    for i in range(num_filters):
+        if i in pruned_filters:
+            continue
+        if i not in kept_filters:
+            kept_filters.append(i)
+        for j in range(i + 1, num_filters):
+            if j in pruned_filters:
+                continue
+            similarity = pairwise_similarity(
+                weights[:, :, :, i], weights[:, :, :, j], metric
+            )
+            if tf.math.greater_equal(similarity, threshold):
+                pruned_filters.append(j)
+                if j in kept_filters:
+                    kept_filters.remove(j)
+            elif j not in kept_filters and j not in pruned_filters:
+                kept_filters.append(j)
+    return pruned_filters, kept_filters
+
+
+def random_kernel(num_filters: int, channels: int, seed: int = 0) -> tf.Variable:
+    """
+    Returns a 3x3 conv kernel where a quarter of the filters are noisy copies of others, so that
+    both branches of the selection are taken.
+    """
+    rng = np.random.default_rng(seed)
+    kernel = rng.standard_normal((3, 3, channels, num_filters)).astype(np.float32)
+    copies = rng.choice(num_filters, num_filters // 4, replace=False)
+    sources = rng.choice(num_filters, num_filters // 4)
+    kernel[..., copies] = kernel[..., sources] + 0.01 * rng.standard_normal(
+        (3, 3, channels, len(copies))
+    ).astype(np.float32)
+    return tf.Variable(kernel)
+
+
+def run_benchmark(filter_counts=(64, 256, 512), channels: int = 64, threshold=0.9):
+    from sample_plugins.v1_0.simsa_pruner.plugin import (
+        filter_vectors,
+        select_filters,
+        similarity_matrix,
+    )
+
+    rows = []
+    for num_filters in filter_counts:
+        weights = random_kernel(num_filters, channels)
+        for metric in ["COS", "EUC", "IoU"]:
+            start = time.perf_counter()
+            expected = pairwise_selection(weights, metric, threshold)
+            pairwise_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            result = select_filters(
+                similarity_matrix(filter_vectors(weights), metric), threshold
+            )
+            vectorised_time = time.perf_counter() - start
+            rows.append(
+                {
+                    "filters": num_filters,
+                    "metric": metric,
+                    "pairwise [s]": pairwise_time,
+                    "vectorised [s]": vectorised_time,
+                    "speedup": pairwise_time / vectorised_time,
+                    "identical": result == expected,
+                }
+            )
+            print(
+                f"{num_filters:4d} filters {metric:3s}: {pairwise_time:8.3f} s pairwise, "
+                f"{vectorised_time:8.4f} s vectorised, speedup {rows[-1]['speedup']:7.1f}, "
+                f"identical decisions {rows[-1]['identical']}"
+            )
+    return rows
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "naso.settings")
+    django.setup()
+    run_benchmark()
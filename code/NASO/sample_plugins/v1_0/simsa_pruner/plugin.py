@@ -3,6 +3,7 @@ import re
 
 import numpy as np
 import tensorflow as tf
+from scipy.spatial.distance import pdist, squareform
 from tensorflow_model_optimization.python.core.keras import compat as tf_compat
 from tensorflow_model_optimization.python.core.sparsity.keras.prune_registry import (
     PruneRegistry,
@@ -74,6 +75,90 @@ def _to_snake_case(name: str) -> str:
     return "private" + insecure
 
 
+def filter_vectors(weights) -> np.ndarray:
+    """
+    Returns the filters of a conv kernel as the rows of a matrix, shape (filters, weights).
+    """
+    weights = np.asarray(weights)
+    return weights.reshape(-1, weights.shape[-1]).T
+
+
+def similarity_matrix(filters: np.ndarray, metric: str) -> np.ndarray:
+    """
+    Computes the absolute similarity of all pairs of filters at once.
+
+    COS is the Gram matrix normalised by the norms of both filters. EUC is
+    relu(1 - ||a - b|| / (||a|| ||b||)), with the distances taken from the Gram matrix as well.
+    IoU is sum(min(a, b)) / sum(max(a, b)), computed from the L1 distances of all pairs.
+
+    Args:
+        filters (np.ndarray): The filters as rows, see `filter_vectors`.
+        metric (str): One of COS, EUC or IoU.
+
+    Returns:
+        np.ndarray: The symmetric (filters, filters) similarity matrix.
+    """
+    filters = np.asarray(filters, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if metric in ("COS", "EUC"):
+            gram = filters @ filters.T
+            squared_norms = np.diag(gram)
+            norms = np.sqrt(squared_norms)
+            norm_products = np.outer(norms, norms)
+            if metric == "COS":
+                # adding small epsilon to avoid division by zero
+                similarity = gram / (norm_products + 1e-9)
+            else:
+                distances = np.sqrt(
+                    np.maximum(
+                        squared_norms[:, None] + squared_norms[None, :] - 2 * gram, 0
+                    )
+                )
+                similarity = np.maximum(1 - distances / norm_products, 0)
+        elif metric == "IoU":
+            # min(a, b) = (a + b - |a - b|) / 2 and max(a, b) = (a + b + |a - b|) / 2, so
+            # only the L1 distances of all pairs are needed
+            sums = filters.sum(axis=1)
+            pair_sums = sums[:, None] + sums[None, :]
+            l1_distances = squareform(pdist(filters, "cityblock"))
+            intersection = (pair_sums - l1_distances) / 2
+            union = (pair_sums + l1_distances) / 2
+            similarity = intersection / (union + 1e-9)
+        else:
+            raise ValueError(f"Unsupported metric type '{metric}'")
+    return np.abs(similarity)
+
+
+def select_filters(similarity: np.ndarray, threshold: float) -> tuple[list, list]:
+    """
+    Greedy keep/prune selection over the similarity matrix. The filters are visited in order;
+    every filter that is not pruned yet prunes all later filters that are not pruned yet and at
+    least `threshold` similar to it. The pruned filters are tracked as a boolean mask, so each
+    filter costs one vectorised row operation.
+
+    Args:
+        similarity (np.ndarray): The (filters, filters) similarity matrix.
+        threshold (float): Minimum similarity of a pruned filter.
+
+    Returns:
+        tuple: The pruned filters in the order they were pruned and the kept filters in
+            ascending order.
+    """
+    num_filters = len(similarity)
+    similar = similarity >= np.float32(threshold)
+    pruned = np.zeros(num_filters, dtype=bool)
+    pruned_filters = []
+    for i in range(num_filters):
+        if pruned[i]:
+            continue
+        newly_pruned = similar[i] & ~pruned
+        newly_pruned[: i + 1] = False
+        indices = np.flatnonzero(newly_pruned)
+        pruned[indices] = True
+        pruned_filters.extend(indices.tolist())
+    return pruned_filters, np.flatnonzero(~pruned).tolist()
+
+
 class SimilarityPruning(Wrapper, PruningInterface):
     _sparsity = 0
     _weights = None
@@ -108,27 +193,6 @@ class SimilarityPruning(Wrapper, PruningInterface):
         self._similiarity_measure = similarity_metric
         self._track_trackable(to_prune, name="layer")
 
-    def _calc_similarity(self, weight1, weight2):
-        # calc the simiarity based on the given metric
-        similarity = 0
-        if self._similiarity_measure == "COS":
-            dot_product = tf.reduce_sum(tf.multiply(weight1, weight2))
-            norm_weight1 = tf.norm(weight1)
-            norm_weight2 = tf.norm(weight2)
-            similarity = dot_product / (
-                norm_weight1 * norm_weight2 + 1e-9
-            )  # Adding small epsilon to avoid division by zero
-        elif self._similiarity_measure == "EUC":
-            # this gives the euclidian simliary = 1 - distance
-            similarity = tf.nn.relu(
-                1 - tf.norm(weight1 - weight2) / (tf.norm(weight1) * tf.norm(weight2))
-            )
-        elif self._similiarity_measure == "IoU":
-            intersection = tf.reduce_sum(tf.minimum(weight1, weight2))
-            union = tf.reduce_sum(tf.maximum(weight1, weight2))
-            similarity = intersection / (union + 1e-9)
-        return abs(similarity)
-
     def build(self, input_shape):
         super().build(input_shape)
         if self._is_conv_layer:
@@ -211,37 +275,16 @@ class SimilarityPruning(Wrapper, PruningInterface):
         return self.layer.call(x, **kwargs)
 
     def calc_similarity_matrix(self, weights):
-        similarity_mask = np.full(
-            weights.shape, 1, dtype=np.float32
-        )  # multiply by big number because we are not setting the whole matrix
+        similarity_mask = np.full(weights.shape, 1, dtype=np.float32)
         if self._is_conv_layer:
             num_filters = weights.shape[-1]
-
-            self._pruned_filters = []
-            self._kept_filters = [0]
-            for i in range(num_filters):
-                if i in self._pruned_filters:
-                    continue
-                if i not in self._kept_filters:
-                    self._kept_filters.append(i)
-                for j in range(i + 1, num_filters):
-                    if j in self._pruned_filters:
-                        continue
-                    if self._is_conv_layer:
-                        similarity = self._calc_similarity(
-                            weights[:, :, :, i], weights[:, :, :, j]
-                        )
-                        if tf.math.greater_equal(similarity, self._threshold):
-                            self._pruned_filters.append(j)
-                            if j in self._kept_filters:
-                                self._kept_filters.remove(j)
-                            similarity_mask[:, :, :, j] = 0
-                        else:
-                            if (
-                                j not in self._kept_filters
-                                and j not in self._pruned_filters
-                            ):
-                                self._kept_filters.append(j)
+            similarity = similarity_matrix(
+                filter_vectors(weights), self._similiarity_measure
+            )
+            self._pruned_filters, self._kept_filters = select_filters(
+                similarity, float(self._threshold)
+            )
+            similarity_mask[..., self._pruned_filters] = 0
 
             print(
                 f"{self.layer.name} has {num_filters} many filters, {len(self._pruned_filters)} of which are pruned"
@@ -9,6 +9,10 @@ function toggleClustering() {
     $('#div_id_centroids_init').parent().toggleClass('d-none');
 }
 
+function toggleQuantization() {
+    $('#div_id_quantization_fine_tune_epochs').parent().toggleClass('d-none');
+}
+
 function showPruning() {
     $('#div_id_pruning_method').parent().removeClass('d-none');
     $('#div_id_pruning_scheduler').parent().removeClass('d-none');